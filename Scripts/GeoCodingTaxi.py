@@ -1,41 +1,51 @@
 """
 Script to get the longitude & latitude data from the city name
 @author: nasekyung
+
+Usage:
+    python GeoCodingTaxi.py taxi+_zone_lookup.csv GeoInfo.csv
 """
 
-from geopy.geocoders import Nominatim
-import pandas as pd
+import argparse
+import sys
+
 
+def GeoCoding(path, user_agent="specify_your_app_name_here"):
+    import pandas as pd
+    from geopy.geocoders import Nominatim
 
-def GeoCoding(path):
-    filepath = path
     Geolist = []
-    Geodata = pd.read_csv(filepath, "rb", delimiter = ",")
+    Geodata = pd.read_csv(path, delimiter = ",")
+    geolocator = Nominatim(user_agent=user_agent, timeout=1000)
     for i in range(len(Geodata)):
-        geolocator = Nominatim(user_agent="specify_your_app_name_here", timeout=1000)
         city_name = str(Geodata["Zone"][i])
         County = str(Geodata["Borough"][i])
         State = "USA"
         print(city_name, County)
         
-        if geolocator.geocode(city_name) != None:
-            location = geolocator.geocode(str(city_name + " " + County + " "+ State))
-            print(location)
-            if location:
-                latitude = location.latitude
-                longitude = location.longitude
-                
-                Geolist.append([i+1, latitude, longitude, location])
-            else:
-                Geolist.append([i+1, 0,0, location])               
-            
+        location = geolocator.geocode(str(city_name + " " + County + " "+ State))
+        print(location)
+        if location:
+            Geolist.append([i+1, location.latitude, location.longitude, location.address])
         else:
-            Geolist.append([i+1, 0,0, location])
+            Geolist.append([i+1, 0, 0, None])
     
     return Geolist
-    
 
-GeoInfoList = GeoCoding("your_filepath/taxi+_zone_lookup.csv")
-test_GeoInfo = pd.DataFrame(GeoInfoList, columns = ["Index", "Latitude", "Longtitude"])
 
-test_GeoInfo.to_csv("your_filepath/GeoInfo_test3.csv")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Geocode taxi zones with Nominatim")
+    parser.add_argument("lookup_csv", help="taxi+_zone_lookup.csv")
+    parser.add_argument("output_csv")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    GeoInfoList = GeoCoding(args.lookup_csv)
+    GeoInfo = pd.DataFrame(GeoInfoList, columns = ["Index", "Latitude", "Longtitude", "Location"])
+    GeoInfo.to_csv(args.output_csv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,65 +1,109 @@
 """
 Created on Thu Aug 15 07:17:00 2019
 @author: nasekyung
+
+Hourly pickup aggregation of a year of green taxi CSV files, saved as one
+CSV per pickup month.
+
+Usage:
+    python PySparkCalculation.py --data-path data/green_tripdata_ --output-path out/ --year 2018
 """
 
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import udf
-import datetime
+import argparse
+import sys
 
-import pandas
-import numpy
-import matplotlib.pyplot as plt
+
+MONTHS = ["01", "02", "03", "04", "05", "06", "07", "08", "09", "10", "11", "12"]
 
 
 ## Start Spark Session 
-spark = SparkSession \
-    .builder \
-    .appName("Wrangling Data NY Taxi") \
-    .getOrCreate()
+def create_spark_session():
+    from pyspark.sql import SparkSession
 
+    return SparkSession \
+        .builder \
+        .appName("Wrangling Data NY Taxi") \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
+        .getOrCreate()
 
-## Set the year & month that you want to load & calculate 
-taxi_type = "yellow"
-year = "2018"    
-MonthList = ["01", "02", "03", "04", "05", "06", "07", "08", "09","10", "11", "12"]
 
+def calculate_pickups(spark, data_path, year, months=MONTHS):
+    """Hourly pickup totals per zone of the given months, as a pandas DataFrame"""
 
-## Read the path that has the data saved (I used local path, but it can be database connections
-for i in range(len(MonthList)):
-    month = str(MonthList[i])
-    path2 = "your_data_path_"+year+"-"+month+".csv"
-    
-    NYGreentaxi = spark.read.csv(path2, header = True)
-    NYGreentaxi.createOrReplaceTempView("NYGreentaxi"+year+month+"_table")
-    
-    NYGreentaxi.printSchema()
-    NYGreentaxi.take(1)
+    ## Read the path that has the data saved (local path, but it can be database connections)
+    ## All months are read together: files contain trips of adjacent months, so
+    ## every trip is grouped into its true pickup hour, whichever file it is in
+    paths = [data_path + year + "-" + month + ".csv" for month in months]
 
+    NYGreentaxi = spark.read.csv(paths, header = True)
+    NYGreentaxi.createOrReplaceTempView("NYGreentaxi"+year+"_table")
 
     ## Extract pickup data and do some calculation 
+    ## Hours are grouped by an integer key (hours since 1970, as
+    ## time_keys.spark_hour_key_sql in Superset_Dashboard) instead of the
+    ## 13-character string; the display string is derived on the aggregated rows
     pu_sql = spark.sql(
             """
-            SELECT SUBSTRING(lpep_pickup_datetime, 1,13) AS Pickup_Time, 
+            SELECT CAST(datediff(to_date(lpep_pickup_datetime), DATE '1970-01-01') * 24
+                        + hour(lpep_pickup_datetime) AS INT) AS Pickup_Hour_Key,
             PULocationID AS Pickup_Location,
             SUM(total_amount) AS Total_Amount,
             AVG(total_amount) AS AVG_Total_Amount,
             SUM(trip_distance) AS Total_Trip_Distance,
             AVG(trip_distance) AS AVG_Trip_Distance,
             SUM(passenger_count) AS Total_Passenger_Count,
-            AVG(passenger_count) AS Total_Passenger_Count,
+            AVG(passenger_count) AS AVG_Passenger_Count,
             SUM(fare_amount) AS Fare_Amount,
             SUM(Extra) AS Extra,
             SUM(tip_amount) AS tip_amount,
             SUM(tolls_amount) AS tolls_amount,
             COUNT(VendorID) AS number
-            FROM NYGreentaxi{}{}_table
+            FROM NYGreentaxi{}_table
             WHERE lpep_pickup_datetime IS NOT NULL
-            and SUBSTRING(lpep_pickup_datetime, 1,7) = '{}-{}'
-            GROUP BY SUBSTRING(lpep_pickup_datetime, 1,13), PULocationID
-            ORDER BY Pickup_Time, Pickup_Location
-            """.format(year, month, year, month)
-            )
-    
-    ## Save the data calculated in a CSV format
-    pu_sql.toPandas().to_csv("your_data_path" + year + month + taxi_type + "_NY_pickup.csv")
+            GROUP BY 1, PULocationID
+            ORDER BY Pickup_Hour_Key, Pickup_Location
+            """.format(year)
+            ).toPandas()
+
+    import pandas as pd
+
+    pu_sql["Pickup_Hour"] = pd.to_datetime(pu_sql["Pickup_Hour_Key"], unit="h")
+    pu_sql.insert(0, "Pickup_Time", pu_sql["Pickup_Hour"].dt.strftime("%Y-%m-%d %H"))
+    return pu_sql
+
+
+def save_monthly(pu_sql, output_path, year, taxi_type, months=MONTHS):
+    """Save the calculated data in CSV format, one file per true pickup month"""
+
+    ## Only the months that were read: late trips of other months would overwrite
+    ## the files written by that month's run with a handful of rows
+    ## (partition_upsert.py in Superset_Dashboard merges them)
+    written = {year + "-" + month for month in months}
+    for month_key, month_rows in pu_sql.groupby(pu_sql["Pickup_Time"].str[:7]):
+        if month_key not in written:
+            continue
+        month_rows.to_csv(output_path + month_key.replace("-", "") + taxi_type + "_NY_pickup.csv")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hourly pickup aggregation of a year of taxi CSV files")
+    parser.add_argument("--data-path", required=True,
+                        help="Prefix of the monthly files (<data-path><year>-<month>.csv)")
+    parser.add_argument("--output-path", required=True, help="Prefix of the monthly output CSV files")
+    parser.add_argument("--year", default="2018")
+    parser.add_argument("--taxi-type", default="green")
+    parser.add_argument("--months", nargs="+", default=MONTHS)
+    args = parser.parse_args(argv)
+
+    spark = create_spark_session()
+    try:
+        save_monthly(calculate_pickups(spark, args.data_path, args.year, args.months),
+                     args.output_path, args.year, args.taxi_type, args.months)
+    finally:
+        spark.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
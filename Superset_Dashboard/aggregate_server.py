@@ -0,0 +1,354 @@
+"""
+Low-Latency Read-Only Aggregate Serving API
+Trino spends seconds planning and scheduling even a 24-row query, which is
+most of the latency of every dashboard and internal tool request. This
+module serves the hourly aggregates (nyc_taxi_aggregated) from a local,
+memory-mapped Arrow IPC snapshot over plain HTTP:
+
+    GET /kpi?start=2024-01-01&end=2024-02-01&taxi_type=yellow&zone=132
+    GET /timeseries?measure=revenue&grain=day&start=...&end=...&zone=...
+    GET /top?measure=trips&n=10&start=...&end=...
+    GET /health
+
+The Parquet output is converted once per aggregate version into a snapshot
+sorted by Pickup_Hour_Key, Pickup_Location (nulls filled, one record batch),
+so a time range is a binary search plus a zero-copy slice of the mapped
+file. A stable argsort by Pickup_Location with per-zone offsets is the
+secondary index: a zone's rows for a time range are one contiguous run of
+it. A background thread fingerprints the Parquet files (path, size, mtime)
+and swaps in a new snapshot when the pipeline writes a new version; requests
+in flight keep the snapshot they started with.
+
+Usage:
+    python aggregate_server.py --data ~/nyc_taxi_data/processed/nyc_taxi_aggregated --port 8765
+
+Requirements: pip install pyarrow numpy
+"""
+
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from time_keys import HOUR_KEY_COLUMN, hour_key, hour_key_to_datetime
+
+NUM_LOCATIONS = 265
+LOCATION_COLUMN = "Pickup_Location"
+TYPE_COLUMN = "taxi_type"
+
+# API measure name -> additive aggregate column (skew_aggregation.HOURLY_MEASURES)
+MEASURES: Dict[str, str] = {
+    "trips": "number",
+    "revenue": "Total_Amount",
+    "distance": "Total_Trip_Distance",
+    "passengers": "Total_Passenger_Count",
+    "fares": "Fare_Amount",
+    "extras": "Extra",
+    "tips": "tip_amount",
+    "tolls": "tolls_amount",
+}
+
+SNAPSHOT_PREFIX = "aggregates-"
+DEFAULT_PORT = 8765
+DEFAULT_RELOAD_INTERVAL = 30
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+# ============================================
+# Snapshots
+# ============================================
+
+def aggregate_version(path: str) -> str:
+    """Fingerprint of the Parquet files under path (changes whenever the pipeline rewrites any)"""
+    digest = hashlib.sha1()
+    for name in sorted(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True)):
+        stat = os.stat(name)
+        digest.update(f"{os.path.relpath(name, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def build_snapshot(parquet_path: str, snapshot_path: str) -> int:
+    """
+    Write the sorted Arrow IPC snapshot of an aggregate dataset
+
+    Rows without an hour key cannot be addressed by time and are skipped;
+    missing LocationIDs (2009-2016 coordinates) become 0 and NULL measures 0.
+
+    Returns:
+        Rows written
+    """
+    dataset = ds.dataset(parquet_path, format="parquet", partitioning="hive")
+    columns = [HOUR_KEY_COLUMN, LOCATION_COLUMN, TYPE_COLUMN, *MEASURES.values()]
+    table = dataset.to_table(columns=columns, filter=ds.field(HOUR_KEY_COLUMN).is_valid())
+
+    table = pa.table({
+        HOUR_KEY_COLUMN: pc.cast(table[HOUR_KEY_COLUMN], pa.int32()),
+        LOCATION_COLUMN: pc.cast(pc.fill_null(table[LOCATION_COLUMN], 0), pa.int16()),
+        TYPE_COLUMN: pc.cast(table[TYPE_COLUMN], pa.string()),
+        **{column: pc.fill_null(pc.cast(table[column], pa.float64()), 0.0)
+           for column in MEASURES.values()},
+    })
+    table = table.sort_by([(HOUR_KEY_COLUMN, "ascending"), (LOCATION_COLUMN, "ascending")])
+    table = table.combine_chunks()
+
+    tmp_path = f"{snapshot_path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+    os.replace(tmp_path, snapshot_path)
+    return table.num_rows
+
+
+def _numpy(column: pa.ChunkedArray) -> np.ndarray:
+    """View of a null-free numeric column (zero-copy for the single-batch snapshot)"""
+    if column.num_chunks == 1:
+        return column.chunk(0).to_numpy(zero_copy_only=False)
+    return column.to_numpy()
+
+
+class AggregateSnapshot:
+    """A memory-mapped aggregate snapshot with its time and LocationID indexes"""
+
+    def __init__(self, path: str, version: str):
+        self.path = path
+        self.version = version
+        self.loaded_at = datetime.datetime.now().isoformat(timespec="seconds")
+        self.table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+        # Primary index: the file is sorted by hour key
+        self.keys = _numpy(self.table[HOUR_KEY_COLUMN])
+        # Secondary index: row ids ordered by zone (then hour), offsets per zone
+        locations = _numpy(self.table[LOCATION_COLUMN])
+        self.location_order = np.argsort(locations, kind="stable").astype(np.int64)
+        self.location_offsets = np.searchsorted(locations[self.location_order],
+                                                np.arange(NUM_LOCATIONS + 2))
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def rows(self, start_key: Optional[int] = None, end_key: Optional[int] = None,
+             zone: Optional[int] = None, taxi_type: Optional[str] = None) -> pa.Table:
+        """Rows with start_key <= Pickup_Hour_Key < end_key, optionally of one zone / taxi type"""
+        start_key = np.iinfo(np.int32).min if start_key is None else start_key
+        end_key = np.iinfo(np.int32).max if end_key is None else end_key
+
+        if zone is None:
+            lo, hi = np.searchsorted(self.keys, [start_key, end_key])
+            rows = self.table.slice(lo, hi - lo)
+        else:
+            if not 0 <= zone <= NUM_LOCATIONS:
+                raise ValueError(f"zone must be a LocationID in 0..{NUM_LOCATIONS}")
+            ids = self.location_order[self.location_offsets[zone]:self.location_offsets[zone + 1]]
+            lo, hi = np.searchsorted(self.keys[ids], [start_key, end_key])
+            rows = self.table.take(pa.array(ids[lo:hi]))
+
+        if taxi_type is not None:
+            rows = rows.filter(pc.equal(rows[TYPE_COLUMN], taxi_type))
+        return rows
+
+
+class SnapshotStore:
+    """Keeps the current snapshot of an aggregate dataset, rebuilding it on new versions"""
+
+    def __init__(self, data_path: str, cache_dir: Optional[str] = None):
+        self.data_path = os.path.abspath(os.path.expanduser(data_path))
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(self.data_path), ".serving")
+        self.current: Optional[AggregateSnapshot] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Load a new snapshot if the aggregates changed; returns whether it swapped"""
+        with self._lock:
+            if self.data_path.endswith(".arrow"):
+                version = str(os.stat(self.data_path).st_mtime_ns)
+                snapshot_path = self.data_path
+            else:
+                version = aggregate_version(self.data_path)
+                snapshot_path = os.path.join(self.cache_dir, f"{SNAPSHOT_PREFIX}{version}.arrow")
+            if self.current is not None and self.current.version == version:
+                return False
+
+            if not os.path.exists(snapshot_path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                started = time.perf_counter()
+                rows = build_snapshot(self.data_path, snapshot_path)
+                print_info(f"Built snapshot {version}: {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+            # Readers hold their own reference; the old mapping is released with its last request
+            self.current = AggregateSnapshot(snapshot_path, version)
+            self._remove_stale(keep=snapshot_path)
+            print_success(f"Serving aggregate version {version} ({len(self.current):,} rows)")
+            return True
+
+    def _remove_stale(self, keep: str):
+        for path in glob.glob(os.path.join(self.cache_dir, f"{SNAPSHOT_PREFIX}*.arrow")):
+            if path != keep:
+                os.remove(path)  # unlinking a mapped file is safe on POSIX
+
+    def watch(self, interval: float) -> threading.Thread:
+        """Poll for new aggregate versions in a daemon thread"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print_error(f"Reload failed, still serving {self.current.version}: {e}")
+
+        thread = threading.Thread(target=loop, name="aggregate-reload", daemon=True)
+        thread.start()
+        return thread
+
+
+# ============================================
+# Queries
+# ============================================
+
+def kpis(rows: pa.Table) -> Dict[str, float]:
+    """Dashboard KPIs of a row selection"""
+    totals = {name: float(_numpy(rows[column]).sum()) if rows.num_rows else 0.0
+              for name, column in MEASURES.items()}
+    trips = totals["trips"]
+    totals["avg_fare"] = totals["revenue"] / trips if trips else None
+    totals["avg_distance"] = totals["distance"] / trips if trips else None
+    return totals
+
+
+def timeseries(rows: pa.Table, measure: str = "trips", grain: str = "hour") -> List[Dict]:
+    """A measure per hour or day (rows arrive sorted by hour for time-range selections)"""
+    keys = _numpy(rows[HOUR_KEY_COLUMN]).astype(np.int64)
+    if grain == "day":
+        keys = keys // 24 * 24
+    elif grain != "hour":
+        raise ValueError("grain must be 'hour' or 'day'")
+    periods, inverse = np.unique(keys, return_inverse=True)
+    values = np.bincount(inverse, weights=_numpy(rows[MEASURES[measure]]), minlength=len(periods))
+    return [{"time": hour_key_to_datetime(key).isoformat(), "value": float(value)}
+            for key, value in zip(periods, values)]
+
+
+def top_zones(rows: pa.Table, measure: str = "trips", n: int = 10) -> List[Dict]:
+    """The n pickup zones with the largest measure"""
+    values = np.bincount(_numpy(rows[LOCATION_COLUMN]).astype(np.int64),
+                         weights=_numpy(rows[MEASURES[measure]]), minlength=NUM_LOCATIONS + 1)
+    order = np.argsort(values)[::-1][:n]
+    return [{"zone": int(zone), "value": float(values[zone])} for zone in order if values[zone]]
+
+
+# ============================================
+# HTTP
+# ============================================
+
+def _parse_params(query: str) -> Tuple[Dict, Dict]:
+    """(selection kwargs of AggregateSnapshot.rows, other params)"""
+    params = {name: values[-1] for name, values in parse_qs(query).items()}
+    selection = {
+        "start_key": hour_key(params.pop("start")) if "start" in params else None,
+        "end_key": hour_key(params.pop("end")) if "end" in params else None,
+        "zone": int(params.pop("zone")) if "zone" in params else None,
+        "taxi_type": params.pop("taxi_type", None),
+    }
+    measure = params.get("measure", "trips")
+    if measure not in MEASURES:
+        raise ValueError(f"measure must be one of {sorted(MEASURES)}")
+    return selection, params
+
+
+class AggregateRequestHandler(BaseHTTPRequestHandler):
+    store: SnapshotStore = None
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        snapshot = self.store.current
+        try:
+            if url.path == "/health":
+                body = {"version": snapshot.version, "rows": len(snapshot),
+                        "loaded_at": snapshot.loaded_at}
+            else:
+                selection, params = _parse_params(url.query)
+                rows = snapshot.rows(**selection)
+                measure = params.get("measure", "trips")
+                if url.path == "/kpi":
+                    body = kpis(rows)
+                elif url.path == "/timeseries":
+                    body = timeseries(rows, measure, params.get("grain", "hour"))
+                elif url.path == "/top":
+                    body = top_zones(rows, measure, int(params.get("n", 10)))
+                else:
+                    return self._send(404, {"error": f"Unknown endpoint {url.path}"}, started)
+        except ValueError as e:
+            return self._send(400, {"error": str(e)}, started)
+        self._send(200, body, started, snapshot.version)
+
+    def _send(self, status: int, body, started: float, version: Optional[str] = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-Elapsed-Ms", f"{(time.perf_counter() - started) * 1000:.2f}")
+        if version:
+            self.send_header("X-Aggregate-Version", version)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the hourly aggregates over HTTP")
+    parser.add_argument("--data", required=True,
+                        help="nyc_taxi_aggregated directory (or an Arrow IPC snapshot)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-dir", help="Snapshot directory (default: <data>/../.serving)")
+    parser.add_argument("--reload-interval", type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help="Seconds between checks for a new aggregate version (0 = never)")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.data, args.cache_dir)
+    try:
+        store.refresh()
+    except (OSError, pa.ArrowException) as e:
+        print_error(f"Failed to load {args.data}: {e}")
+        return 1
+    if args.reload_interval > 0:
+        store.watch(args.reload_interval)
+
+    AggregateRequestHandler.store = store
+    server = ThreadingHTTPServer((args.host, args.port), AggregateRequestHandler)
+    print_info(f"Listening on http://{args.host}:{args.port} (/kpi, /timeseries, /top, /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Hourly Aggregation Job for NYC Taxi Trip Files
+The Spark job behind STEP 4 of quick_start_data_pipeline.sh (formerly the
+process_data.py heredoc the script wrote at runtime). It reads every trip
+file of a year through the harmonization layer, tags data-quality
+rejections, aggregates trips per taxi type, source file, hour and pickup
+zone, and writes
+
+    nyc_taxi_aggregated       hourly aggregate (taxi_type / Pickup_Month partitions)
+    nyc_taxi_aggregate_state  mergeable per-file state (partition_upsert.py)
+    nyc_taxi_rejections       rejected rows per rule, file and hour (taxi_type / Source_File partitions)
+    nyc_taxi_od_*             origin-destination matrices (NYC_TAXI_OD=0 skips)
+    nyc_taxi_quarantine       sample rejected rows (NYC_TAXI_QUARANTINE)
+    nyc_taxi_sample           stratified sample (NYC_TAXI_SAMPLE)
+
+pyspark is imported only when the job runs, so the module can be imported
+(and --help shown) without it.
+
+Usage:
+    python aggregate_trips.py <raw_dir> <output_dir> <year> <taxi_type> [<taxi_type> ...]
+
+Requirements: pip install pyspark
+"""
+
+import argparse
+import glob
+import os
+import sys
+from typing import List, Optional, Sequence
+
+from pipeline_metrics import report_rows
+
+CATALOG_ENV = "NYC_TAXI_CATALOG"
+ZONES_ENV = "NYC_TAXI_ZONES"
+
+
+def find_trip_files(raw_dir: str, year: str, taxi_types: Sequence[str],
+                    catalog_path: Optional[str] = None) -> List[str]:
+    """Trip files of these types and this year, Parquet preferred over CSV"""
+    files = []
+    for taxi_type in taxi_types:
+        pattern = f"{raw_dir}/{taxi_type}_tripdata_{year}-*.{{parquet,csv}}"
+        type_files = glob.glob(pattern.replace('{parquet,csv}', 'parquet'))
+        # Skip CSVs that have already been converted to Parquet
+        type_files += [f for f in glob.glob(pattern.replace('{parquet,csv}', 'csv'))
+                       if os.path.splitext(f)[0] + '.parquet' not in type_files]
+
+        # Consult the file catalog (if built) and skip catalogued files that cannot
+        # contain pickups in the requested year; files that are new or changed
+        # since the last scan are always kept
+        if catalog_path and os.path.exists(catalog_path):
+            from trip_file_catalog import TripFileCatalog
+            with TripFileCatalog(catalog_path) as catalog:
+                candidates = set(catalog.select_files(taxi_type, start=f"{year}-01-01",
+                                                      end=f"{int(year) + 1}-01-01"))
+                type_files = [f for f in type_files
+                              if os.path.abspath(f) in candidates or catalog.needs_update(os.path.abspath(f))]
+
+        if not type_files:
+            print(f"No files found matching pattern: {pattern}")
+        files += type_files
+    return files
+
+
+def create_spark_session():
+    from pyspark.sql import SparkSession
+
+    return SparkSession.builder \
+        .appName("NYC Taxi Processing") \
+        .config("spark.driver.memory", "4g") \
+        .config("spark.sql.sources.partitionOverwriteMode", "dynamic") \
+        .config("spark.sql.session.timeZone", "UTC") \
+        .getOrCreate()
+
+
+def aggregate_files(spark, files: Sequence[str], output_dir: str, year: str) -> int:
+    """
+    Run the aggregation over the given files
+
+    Returns:
+        Rows written to nyc_taxi_aggregated (0 if no partition was rebuilt)
+    """
+    from pyspark.sql.functions import date_format, input_file_name
+
+    from data_quality import (QUARANTINE_ENV, REJECTION_KEYS, RULE_COLUMN, print_rejection_summary,
+                              rejection_summary, split_rejections, tag_rejections, write_quarantine)
+    from od_matrix import OD_ENV, od_aggregate, write_od_levels
+    from partition_upsert import (SOURCE_COLUMN, STATE_DIR, delete_source_partitions, in_home_month,
+                                  merged_partitions, ready_partitions, source_file_key, write_state)
+    from schema_harmonization import read_harmonized
+    from skew_aggregation import HOURLY_KEYS, SKEW_ENV, hourly_aggregate, tune_shuffle_partitions
+    from stratified_sampling import SAMPLE_ENV, STRATUM_COLUMNS, add_stratum_columns, stratified_sample
+    from time_keys import hour_key, spark_hour_key_sql, spark_hour_timestamp
+
+    # Size shuffle partitions to this run's input instead of the fixed 200
+    partitions = tune_shuffle_partitions(spark, sum(os.path.getsize(f) for f in files))
+    print(f"Shuffle partitions: {partitions}")
+
+    # Read every file through the era-aware harmonization layer: one multi-path
+    # scan per schema era, so 2009-era and modern files share one flat plan
+    print(f"Processing {len(files)} files")
+
+    # Data-quality rules are evaluated in the same scan: every row is tagged with
+    # the first rule it violates, rejected rows aggregate into their own groups
+    # and are split off afterwards as per-rule/file/hour counts
+    tagged = tag_rejections(read_harmonized(spark, files).withColumn("source_file", input_file_name()))
+    tagged = tagged.withColumn(SOURCE_COLUMN, source_file_key("source_file"))
+
+    trips = tagged.selectExpr(
+        "taxi_type",
+        SOURCE_COLUMN,
+        f"{spark_hour_key_sql('pickup_datetime')} as Pickup_Hour_Key",
+        "pickup_location as Pickup_Location",
+        "dropoff_location as Dropoff_Location",
+        "total_amount as Total_Amount",
+        "trip_distance as Trip_Distance",
+        "passenger_count as Passenger_Count",
+        "fare_amount as Fare_Amount",
+        "extra as Extra",
+        "tip_amount",
+        "tolls_amount",
+        *REJECTION_KEYS
+    )
+
+    # One aggregation over all trip types, keyed by taxi_type and source file;
+    # heavy pickup zones (airports, Midtown) are salted so they do not leave a
+    # few straggler tasks
+    aggregated = hourly_aggregate(trips, keys=["taxi_type", SOURCE_COLUMN] + HOURLY_KEYS + REJECTION_KEYS,
+                                  skew=os.environ.get(SKEW_ENV, "static"))
+    file_state, rejections = split_rejections(
+        aggregated, rejection_keys=("taxi_type", SOURCE_COLUMN, "Pickup_Hour_Key"))
+
+    # Summarized from the persisted aggregate: a clean run writes no rejection
+    # files, so there would be nothing to read back. Counts are partitioned by
+    # source file; every file of this run has its old partition removed first,
+    # because a file that is now clean writes none and dynamic overwrite would
+    # keep its stale counts
+    rejections_path = f"{output_dir}/nyc_taxi_rejections"
+    print_rejection_summary(rejection_summary(rejections))
+    run_sources = [tuple(row) for row in aggregated.select("taxi_type", SOURCE_COLUMN).distinct().collect()]
+    delete_source_partitions(spark, rejections_path, run_sources)
+    rejections.write.mode("overwrite").partitionBy("taxi_type", SOURCE_COLUMN).parquet(rejections_path)
+    print(f"Rejection counts saved to {rejections_path}")
+
+    quarantine_rows = int(os.environ.get(QUARANTINE_ENV, "0"))
+    if quarantine_rows > 0:
+        write_quarantine(tagged, f"{output_dir}/nyc_taxi_quarantine", per_rule=quarantine_rows)
+
+    # Sparse pickup -> dropoff matrices per hour, rolled up per day and month
+    # (COO rows, one per non-empty zone pair); reuses the projected trip columns,
+    # so it costs a second pass over them but not a wider read
+    if os.environ.get(OD_ENV, "1") != "0":
+        # Only the home month of each file (and this run's year): OD months are
+        # overwritten whole, so late trips must not replace an adjacent month
+        # that was processed in another run
+        od_trips = trips.filter(trips[RULE_COLUMN].isNull() & in_home_month()
+                                & trips["Pickup_Hour_Key"].between(hour_key(f"{year}-01-01"),
+                                                                   hour_key(f"{int(year) + 1}-01-01") - 1))
+        od_paths = write_od_levels(od_aggregate(od_trips), output_dir)
+        print(f"OD matrices saved to {', '.join(od_paths.values())}")
+        # Counted from the persisted aggregate, so the exclusion is visible
+        # without another pass over the trips
+        late_trips = file_state.filter(~in_home_month()).groupBy().sum("number").collect()[0][0] or 0
+        if late_trips:
+            print(f"OD matrices exclude {late_trips:,} trips outside their file's month "
+                  f"(the hourly aggregate state keeps them)")
+
+    # Opt-in stratified sample (hour x weekday x pickup zone, per trip type) with
+    # per-row weights, for prototyping dashboards on a small table with known
+    # accuracy; like the quarantine it reads the trip files a second time
+    sample_rate = float(os.environ.get(SAMPLE_ENV, "0"))
+    if sample_rate > 0:
+        valid_trips = tagged.filter(tagged[RULE_COLUMN].isNull()).drop(*REJECTION_KEYS, "source_file")
+        sample, strata = stratified_sample(add_stratum_columns(valid_trips), sample_rate,
+                                           strata=["taxi_type"] + STRATUM_COLUMNS)
+        sample_path = f"{output_dir}/nyc_taxi_sample"
+        sample.write.mode("overwrite").partitionBy("taxi_type").parquet(sample_path)
+        strata.write.mode("overwrite").parquet(f"{output_dir}/nyc_taxi_sample_strata")
+        print(f"Stratified sample saved to {sample_path}")
+
+    # Every trip lands in its true hour, whichever file it came from: the
+    # per-file state replaces this run's files only, then each month it touches
+    # is rebuilt by merging the state of all files that contributed to it
+    state_path = f"{output_dir}/{STATE_DIR}"
+    file_state = file_state.withColumn(
+        "Pickup_Month", date_format(spark_hour_timestamp("Pickup_Hour_Key"), "yyyy-MM"))
+    touched = write_state(spark, file_state, state_path)
+    ready, waiting = ready_partitions(spark, state_path, touched)
+    for taxi_type, month in waiting:
+        print(f"Keeping late {taxi_type} trips for {month} in state until its file is processed")
+    combined = merged_partitions(spark, state_path, ready)
+    if combined is None:
+        print("No aggregate partitions to rebuild")
+        return 0
+    print(f"Rebuilding {len(ready)} partitions: {', '.join(f'{t}/{m}' for t, m in ready)}")
+
+    # Hours are grouped by integer key; the timestamp and the legacy display
+    # string are derived from it on the (far fewer) aggregated rows
+    combined = combined.withColumn("Pickup_Hour", spark_hour_timestamp("Pickup_Hour_Key")) \
+        .withColumn("Pickup_Time", date_format("Pickup_Hour", "yyyy-MM-dd HH"))
+
+    # Denormalize pickup borough/zone so dashboards never join taxi_zones
+    zones_csv = os.environ.get(ZONES_ENV)
+    if zones_csv and os.path.exists(zones_csv):
+        from taxi_zones import ZoneDimension
+        zones = ZoneDimension.from_csv(zones_csv)
+        combined = zones.attach_spark(combined, "Pickup_Location", prefix="Pickup_")
+
+    # Save as one dataset partitioned by taxi_type and month; dynamic overwrite
+    # replaces only the rebuilt partitions, so other months are kept
+    output_path = f"{output_dir}/nyc_taxi_aggregated"
+    combined.write.mode("overwrite").partitionBy("taxi_type", "Pickup_Month").parquet(output_path)
+
+    rows = combined.count()
+    print(f"Saved {rows} rows to {output_path}")
+    return rows
+
+
+def run(raw_dir: str, output_dir: str, year: str, taxi_types: Sequence[str]) -> int:
+    """Find the year's files and aggregate them; returns a process exit code"""
+    print(f"Processing {', '.join(taxi_types)} taxi data for {year}")
+    files = find_trip_files(raw_dir, year, taxi_types, os.environ.get(CATALOG_ENV))
+    if not files:
+        return 1
+
+    spark = create_spark_session()
+    try:
+        report_rows(rows_out=aggregate_files(spark, files, output_dir, year))
+    finally:
+        spark.stop()
+    return 0
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aggregate a year of trip files into hourly aggregates")
+    parser.add_argument("raw_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("year")
+    parser.add_argument("taxi_types", nargs="+", metavar="taxi_type")
+    args = parser.parse_args(argv)
+    return run(args.raw_dir, args.output_dir, args.year, args.taxi_types)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,469 @@
+"""
+Async Superset Helper for Provisioning Many NYC Taxi Dashboards
+Same surface as SupersetHelper, built on asyncio + aiohttp so that one
+dashboard per borough/fleet customer can be provisioned concurrently
+
+Author: Based on NYC Taxi project by Sekyung Na
+Date: October 2025
+Requirements: pip install aiohttp requests
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from superset_config_helper import get_nyc_taxi_chart_specs
+
+
+class AsyncSupersetHelper:
+    """Async client for the Apache Superset API with a concurrency limit"""
+
+    def __init__(self,
+                 superset_url: str,
+                 username: str,
+                 password: str,
+                 max_concurrency: int = 10):
+        """
+        Initialize async Superset API client
+
+        The client does not log in here; use it as an async context manager
+        (``async with AsyncSupersetHelper(...) as superset``) or call
+        ``await superset.login()`` before issuing requests.
+
+        Args:
+            superset_url: Base URL of Superset instance (e.g., 'http://localhost:8088')
+            username: Superset username
+            password: Superset password
+            max_concurrency: Maximum number of in-flight API requests
+        """
+        self.base_url = superset_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.access_token = None
+        self.refresh_token = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._auth_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying HTTP session"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _auth_headers(self) -> Dict:
+        return {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
+        }
+
+    async def login(self) -> bool:
+        """Authenticate with Superset and obtain access and refresh tokens"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+
+        login_url = f"{self.base_url}/api/v1/security/login"
+
+        payload = {
+            "username": self.username,
+            "password": self.password,
+            "provider": "db",
+            "refresh": True
+        }
+
+        try:
+            async with self.session.post(login_url, json=payload) as response:
+                response.raise_for_status()
+                data = await response.json()
+
+            self.access_token = data.get("access_token")
+            self.refresh_token = data.get("refresh_token")
+
+            print("✓ Successfully authenticated with Superset")
+            return True
+
+        except aiohttp.ClientError as e:
+            print(f"✗ Authentication failed: {e}")
+            return False
+
+    async def _refresh_access_token(self, stale_token: Optional[str]) -> bool:
+        """
+        Exchange the refresh token for a new access token
+
+        Concurrent requests that hit a 401 at the same time share one refresh:
+        whoever gets the lock first refreshes, the others see the token has
+        already changed and simply retry.
+        """
+        async with self._auth_lock:
+            if self.access_token != stale_token:
+                return True
+
+            if not self.refresh_token:
+                return await self.login()
+
+            url = f"{self.base_url}/api/v1/security/refresh"
+            headers = {"Authorization": f"Bearer {self.refresh_token}"}
+
+            try:
+                async with self.session.post(url, headers=headers) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                self.access_token = data.get("access_token")
+                return True
+            except aiohttp.ClientError:
+                # Refresh token expired as well - start over
+                return await self.login()
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        """
+        Send an authenticated request, refreshing the token once on a 401
+
+        Raises:
+            aiohttp.ClientResponseError: If the request fails
+        """
+        url = f"{self.base_url}{path}"
+
+        async with self._semaphore:
+            for attempt in range(2):
+                token = self.access_token
+                async with self.session.request(method, url, json=payload,
+                                                headers=self._auth_headers()) as response:
+                    if response.status == 401 and attempt == 0:
+                        await self._refresh_access_token(token)
+                        continue
+                    if response.status >= 400:
+                        body = await response.text()
+                        raise aiohttp.ClientResponseError(
+                            response.request_info,
+                            response.history,
+                            status=response.status,
+                            message=body
+                        )
+                    return await response.json()
+
+    async def get_csrf_token(self):
+        """Get CSRF token for POST requests"""
+        data = await self._request("GET", "/api/v1/security/csrf_token/")
+        return data["result"]
+
+    async def create_database_connection(self,
+                                         database_name: str,
+                                         sqlalchemy_uri: str,
+                                         expose_in_sqllab: bool = True) -> Optional[int]:
+        """
+        Create a database connection in Superset
+
+        Args:
+            database_name: Name for the database connection
+            sqlalchemy_uri: SQLAlchemy connection URI (e.g., 'trino://user@host:port/catalog')
+            expose_in_sqllab: Whether to expose in SQL Lab
+
+        Returns:
+            Database ID if successful, None otherwise
+        """
+        payload = {
+            "database_name": database_name,
+            "sqlalchemy_uri": sqlalchemy_uri,
+            "expose_in_sqllab": expose_in_sqllab,
+            "allow_ctas": False,
+            "allow_cvas": False,
+            "allow_dml": False,
+            "allow_multi_schema_metadata_fetch": True,
+            "allow_run_async": True,
+            "cache_timeout": 3600
+        }
+
+        try:
+            data = await self._request("POST", "/api/v1/database/", payload)
+            db_id = data["id"]
+            print(f"✓ Created database connection: {database_name} (ID: {db_id})")
+            return db_id
+
+        except aiohttp.ClientError as e:
+            print(f"✗ Failed to create database connection: {e}")
+            return None
+
+    async def list_databases(self) -> List[Dict]:
+        """List all database connections"""
+        data = await self._request("GET", "/api/v1/database/")
+        return data["result"]
+
+    async def create_dataset(self,
+                             database_id: int,
+                             schema: str,
+                             table_name: str,
+                             description: str = "") -> Optional[int]:
+        """
+        Create a dataset (table) in Superset
+
+        Args:
+            database_id: ID of the database connection
+            schema: Schema name
+            table_name: Table name
+            description: Optional description
+
+        Returns:
+            Dataset ID if successful, None otherwise
+        """
+        payload = {
+            "database": database_id,
+            "schema": schema,
+            "table_name": table_name,
+            "description": description
+        }
+
+        try:
+            data = await self._request("POST", "/api/v1/dataset/", payload)
+            dataset_id = data["id"]
+            print(f"✓ Created dataset: {schema}.{table_name} (ID: {dataset_id})")
+            return dataset_id
+
+        except aiohttp.ClientError as e:
+            print(f"✗ Failed to create dataset: {e}")
+            return None
+
+    async def list_datasets(self) -> List[Dict]:
+        """List all datasets"""
+        data = await self._request("GET", "/api/v1/dataset/")
+        return data["result"]
+
+    async def create_chart(self,
+                           dataset_id: int,
+                           chart_name: str,
+                           viz_type: str,
+                           params: Dict,
+                           description: str = "") -> Optional[int]:
+        """
+        Create a chart in Superset
+
+        Args:
+            dataset_id: ID of the dataset
+            chart_name: Name for the chart
+            viz_type: Visualization type (e.g., 'big_number', 'line', 'bar', 'table')
+            params: Chart parameters/configuration
+            description: Optional description
+
+        Returns:
+            Chart ID if successful, None otherwise
+        """
+        payload = {
+            "slice_name": chart_name,
+            "viz_type": viz_type,
+            "datasource_id": dataset_id,
+            "datasource_type": "table",
+            "params": json.dumps(params),
+            "description": description
+        }
+
+        try:
+            data = await self._request("POST", "/api/v1/chart/", payload)
+            chart_id = data["id"]
+            print(f"✓ Created chart: {chart_name} (ID: {chart_id})")
+            return chart_id
+
+        except aiohttp.ClientError as e:
+            print(f"✗ Failed to create chart: {e}")
+            return None
+
+    async def create_dashboard(self,
+                               dashboard_title: str,
+                               description: str = "",
+                               published: bool = True) -> Optional[int]:
+        """
+        Create a dashboard in Superset
+
+        Args:
+            dashboard_title: Title for the dashboard
+            description: Optional description
+            published: Whether to publish the dashboard
+
+        Returns:
+            Dashboard ID if successful, None otherwise
+        """
+        payload = {
+            "dashboard_title": dashboard_title,
+            "description": description,
+            "published": published,
+            "json_metadata": json.dumps({
+                "color_scheme": "",
+                "label_colors": {},
+                "shared_label_colors": {},
+                "expanded_slices": {}
+            }),
+            "position_json": json.dumps({})
+        }
+
+        try:
+            data = await self._request("POST", "/api/v1/dashboard/", payload)
+            dashboard_id = data["id"]
+            print(f"✓ Created dashboard: {dashboard_title} (ID: {dashboard_id})")
+            return dashboard_id
+
+        except aiohttp.ClientError as e:
+            print(f"✗ Failed to create dashboard: {e}")
+            return None
+
+
+# ==============================================
+# Concurrent Dashboard Provisioning
+# ==============================================
+
+async def setup_nyc_taxi_dashboard_async(superset: AsyncSupersetHelper,
+                                         database_id: int,
+                                         dashboard_title: str,
+                                         schema_name: str = "nyc_taxi",
+                                         table_name: str = "nyc_taxi_aggregated") -> Optional[Dict]:
+    """
+    Create one NYC Taxi dashboard (dataset, charts, dashboard)
+
+    Charts are created concurrently once the dataset exists.
+
+    Args:
+        superset: AsyncSupersetHelper instance (already logged in)
+        database_id: ID of an existing database connection
+        dashboard_title: Title for the dashboard
+        schema_name: Schema name in Trino
+        table_name: Table or view backing this dashboard
+
+    Returns:
+        Dictionary with created IDs, or None if the dataset could not be created
+    """
+    dataset_id = await superset.create_dataset(
+        database_id=database_id,
+        schema=schema_name,
+        table_name=table_name,
+        description="NYC Taxi aggregated data by hour and location"
+    )
+
+    if not dataset_id:
+        return None
+
+    chart_results = await asyncio.gather(*[
+        superset.create_chart(
+            dataset_id=dataset_id,
+            chart_name=chart_name,
+            viz_type=viz_type,
+            params=config,
+            description=description
+        )
+        for chart_name, viz_type, config, description in get_nyc_taxi_chart_specs()
+    ])
+
+    dashboard_id = await superset.create_dashboard(
+        dashboard_title=dashboard_title,
+        description="Comprehensive analytics for NYC taxi trips - pickup patterns, revenue analysis, and location insights",
+        published=True
+    )
+
+    return {
+        "database_id": database_id,
+        "dataset_id": dataset_id,
+        "chart_ids": [chart_id for chart_id in chart_results if chart_id],
+        "dashboard_id": dashboard_id
+    }
+
+
+async def provision_dashboards(superset: AsyncSupersetHelper,
+                               trino_uri: str,
+                               tenants: Dict[str, str],
+                               schema_name: str = "nyc_taxi") -> Dict[str, Optional[Dict]]:
+    """
+    Provision one dashboard per tenant concurrently
+
+    A single shared database connection is created first; every tenant then
+    gets its own dataset, charts and dashboard. The client's concurrency limit
+    bounds the number of in-flight requests, so total time is roughly that of
+    the slowest tenant rather than the sum over all tenants.
+
+    Args:
+        superset: AsyncSupersetHelper instance (already logged in)
+        trino_uri: Trino connection URI
+        tenants: Mapping of dashboard title -> table/view name for that tenant
+        schema_name: Schema name in Trino
+
+    Returns:
+        Mapping of dashboard title -> result dictionary (None on failure)
+    """
+    db_id = await superset.create_database_connection(
+        database_name="NYC Taxi Trino",
+        sqlalchemy_uri=trino_uri
+    )
+
+    if not db_id:
+        print("Failed to create database connection. Exiting.")
+        return {}
+
+    titles = list(tenants)
+    results = await asyncio.gather(*[
+        setup_nyc_taxi_dashboard_async(
+            superset,
+            database_id=db_id,
+            dashboard_title=title,
+            schema_name=schema_name,
+            table_name=tenants[title]
+        )
+        for title in titles
+    ], return_exceptions=True)
+
+    provisioned = {}
+    for title, result in zip(titles, results):
+        if isinstance(result, Exception):
+            print(f"✗ Failed to provision {title}: {result}")
+            provisioned[title] = None
+        else:
+            provisioned[title] = result
+
+    return provisioned
+
+
+# ==============================================
+# Example Usage
+# ==============================================
+
+async def main():
+    """Example: one dashboard per borough"""
+
+    # Configuration
+    SUPERSET_URL = "http://localhost:8088"  # Change to your Superset URL
+    USERNAME = "admin"  # Change to your username
+    PASSWORD = "admin"  # Change to your password
+    MAX_CONCURRENCY = 10
+
+    # Trino connection details
+    TRINO_HOST = "localhost"
+    TRINO_PORT = 8080
+    TRINO_CATALOG = "hive"
+    TRINO_SCHEMA = "nyc_taxi"
+    TRINO_USER = "admin"
+
+    trino_uri = f"trino://{TRINO_USER}@{TRINO_HOST}:{TRINO_PORT}/{TRINO_CATALOG}"
+
+    # One view per borough, e.g. nyc_taxi_aggregated_manhattan
+    boroughs = ["Manhattan", "Brooklyn", "Queens", "Bronx", "Staten Island"]
+    tenants = {
+        f"NYC Taxi - {borough}": f"nyc_taxi_aggregated_{borough.lower().replace(' ', '_')}"
+        for borough in boroughs
+    }
+
+    start = time.perf_counter()
+    async with AsyncSupersetHelper(SUPERSET_URL, USERNAME, PASSWORD,
+                                   max_concurrency=MAX_CONCURRENCY) as superset:
+        results = await provision_dashboards(superset, trino_uri, tenants, TRINO_SCHEMA)
+    elapsed = time.perf_counter() - start
+
+    ok = sum(1 for result in results.values() if result and result["dashboard_id"])
+    print(f"\n✓ Provisioned {ok}/{len(tenants)} dashboards in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
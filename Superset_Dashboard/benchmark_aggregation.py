@@ -0,0 +1,580 @@
+"""
+NYC Taxi Aggregation Benchmark Suite
+Runs the hourly Pickup_Time x PULocationID aggregation (the same query as
+pu_sql in PySparkCalculation.py and the groupBy in aggregate_trips.py) on every
+locally available engine and data size, records the results to a JSON
+history file and flags regressions against a stored baseline
+
+Usage:
+    python benchmark_aggregation.py --sizes 1000000 10000000
+    python benchmark_aggregation.py --engines pandas duckdb --update-baseline
+
+Input files are generated with generate_synthetic_trips.py and cached in
+--data-dir, so repeated runs measure the same rows.
+
+Requirements: pip install numpy pandas pyarrow (optional: duckdb polars pyspark)
+"""
+
+import argparse
+import datetime
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Engine name -> module that must be importable for it to run
+ENGINE_MODULES = {
+    "pandas": "pandas",
+    "pyarrow": "pyarrow",
+    "duckdb": "duckdb",
+    "polars": "polars",
+    "pyspark": "pyspark",
+}
+
+DEFAULT_SIZES = [1_000_000, 10_000_000]
+DEFAULT_HISTORY = "benchmark_history.json"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.10
+
+# Columns read by the aggregation (yellow schema)
+PICKUP_COL = "tpep_pickup_datetime"
+AGG_COLUMNS = [PICKUP_COL, "PULocationID", "total_amount", "trip_distance",
+               "passenger_count", "fare_amount", "extra", "tip_amount", "tolls_amount"]
+
+
+def print_header(text):
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}")
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+def available_engines() -> List[str]:
+    """Engines whose libraries are installed in this environment"""
+    return [name for name, module in ENGINE_MODULES.items()
+            if importlib.util.find_spec(module) is not None]
+
+
+# ============================================
+# Engine Implementations
+# ============================================
+# Each runner reads input_path (Parquet), aggregates by pickup hour and
+# PULocationID, writes output_path (Parquet) sorted by both keys and returns
+# the output row count without reading the output back.
+
+def run_pandas(input_path: str, output_path: str) -> int:
+    import pandas as pd
+
+    df = pd.read_parquet(input_path, columns=AGG_COLUMNS)
+    df = df[df[PICKUP_COL].notna() & (df["total_amount"] > 0) & (df["trip_distance"] > 0)]
+    df = df.assign(Pickup_Time=df[PICKUP_COL].dt.floor("h"))
+
+    out = df.groupby(["Pickup_Time", "PULocationID"], sort=True).agg(
+        Total_Amount=("total_amount", "sum"),
+        AVG_Total_Amount=("total_amount", "mean"),
+        Total_Trip_Distance=("trip_distance", "sum"),
+        AVG_Trip_Distance=("trip_distance", "mean"),
+        Total_Passenger_Count=("passenger_count", "sum"),
+        AVG_Passenger_Count=("passenger_count", "mean"),
+        Fare_Amount=("fare_amount", "sum"),
+        Extra=("extra", "sum"),
+        tip_amount=("tip_amount", "sum"),
+        tolls_amount=("tolls_amount", "sum"),
+        number=("total_amount", "size"),
+    ).reset_index()
+    out.to_parquet(output_path, index=False)
+    return len(out)
+
+
+def run_pyarrow(input_path: str, output_path: str) -> int:
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(input_path, columns=AGG_COLUMNS)
+    mask = pc.and_(pc.and_(pc.is_valid(table[PICKUP_COL]),
+                           pc.greater(table["total_amount"], 0)),
+                   pc.greater(table["trip_distance"], 0))
+    table = table.filter(mask)
+    table = table.append_column("Pickup_Time", pc.floor_temporal(table[PICKUP_COL], unit="hour"))
+
+    out = table.group_by(["Pickup_Time", "PULocationID"]).aggregate([
+        ("total_amount", "sum"), ("total_amount", "mean"),
+        ("trip_distance", "sum"), ("trip_distance", "mean"),
+        ("passenger_count", "sum"), ("passenger_count", "mean"),
+        ("fare_amount", "sum"), ("extra", "sum"),
+        ("tip_amount", "sum"), ("tolls_amount", "sum"),
+        ("total_amount", "count"),
+    ]).sort_by([("Pickup_Time", "ascending"), ("PULocationID", "ascending")])
+    pq.write_table(out, output_path)
+    return out.num_rows
+
+
+def run_duckdb(input_path: str, output_path: str) -> int:
+    import duckdb
+
+    con = duckdb.connect()
+    # COPY returns the number of rows it wrote
+    rows = con.execute(f"""
+        COPY (
+            SELECT date_trunc('hour', {PICKUP_COL}) AS Pickup_Time,
+                   PULocationID AS Pickup_Location,
+                   SUM(total_amount) AS Total_Amount,
+                   AVG(total_amount) AS AVG_Total_Amount,
+                   SUM(trip_distance) AS Total_Trip_Distance,
+                   AVG(trip_distance) AS AVG_Trip_Distance,
+                   SUM(passenger_count) AS Total_Passenger_Count,
+                   AVG(passenger_count) AS AVG_Passenger_Count,
+                   SUM(fare_amount) AS Fare_Amount,
+                   SUM(extra) AS Extra,
+                   SUM(tip_amount) AS tip_amount,
+                   SUM(tolls_amount) AS tolls_amount,
+                   COUNT(*) AS number
+            FROM read_parquet('{input_path}')
+            WHERE {PICKUP_COL} IS NOT NULL AND total_amount > 0 AND trip_distance > 0
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        ) TO '{output_path}' (FORMAT PARQUET)
+    """).fetchone()[0]
+    con.close()
+    return rows
+
+
+def run_polars(input_path: str, output_path: str) -> int:
+    import polars as pl
+
+    out = (
+        pl.scan_parquet(input_path)
+        .select(AGG_COLUMNS)
+        .filter(pl.col(PICKUP_COL).is_not_null()
+                & (pl.col("total_amount") > 0)
+                & (pl.col("trip_distance") > 0))
+        .group_by([pl.col(PICKUP_COL).dt.truncate("1h").alias("Pickup_Time"),
+                   pl.col("PULocationID")])
+        .agg([
+            pl.col("total_amount").sum().alias("Total_Amount"),
+            pl.col("total_amount").mean().alias("AVG_Total_Amount"),
+            pl.col("trip_distance").sum().alias("Total_Trip_Distance"),
+            pl.col("trip_distance").mean().alias("AVG_Trip_Distance"),
+            pl.col("passenger_count").sum().alias("Total_Passenger_Count"),
+            pl.col("passenger_count").mean().alias("AVG_Passenger_Count"),
+            pl.col("fare_amount").sum().alias("Fare_Amount"),
+            pl.col("extra").sum().alias("Extra"),
+            pl.col("tip_amount").sum().alias("tip_amount"),
+            pl.col("tolls_amount").sum().alias("tolls_amount"),
+            pl.len().alias("number"),
+        ])
+        .sort(["Pickup_Time", "PULocationID"])
+        .collect()
+    )
+    out.write_parquet(output_path)
+    return out.height
+
+
+def spark_session():
+    """Local SparkSession for the pyspark runner (started outside the timing)"""
+    from pyspark.sql import SparkSession
+
+    return SparkSession.builder \
+        .appName("NYC Taxi Benchmark") \
+        .master("local[*]") \
+        .config("spark.driver.memory", "4g") \
+        .config("spark.ui.enabled", "false") \
+        .getOrCreate()
+
+
+def run_pyspark(input_path: str, output_path: str) -> int:
+    from pyspark.sql.functions import avg, count, sum
+
+    # Returns the session the worker already started
+    spark = spark_session()
+
+    df = spark.read.parquet(input_path)
+    out = df.selectExpr(
+        f"date_trunc('hour', {PICKUP_COL}) as Pickup_Time",
+        "PULocationID as Pickup_Location",
+        "total_amount", "trip_distance", "passenger_count",
+        "fare_amount", "extra", "tip_amount", "tolls_amount"
+    ).filter(
+        "Pickup_Time is not null and total_amount > 0 and trip_distance > 0"
+    ).groupBy("Pickup_Time", "Pickup_Location").agg(
+        sum("total_amount").alias("Total_Amount"),
+        avg("total_amount").alias("AVG_Total_Amount"),
+        sum("trip_distance").alias("Total_Trip_Distance"),
+        avg("trip_distance").alias("AVG_Trip_Distance"),
+        sum("passenger_count").alias("Total_Passenger_Count"),
+        avg("passenger_count").alias("AVG_Passenger_Count"),
+        sum("fare_amount").alias("Fare_Amount"),
+        sum("extra").alias("Extra"),
+        sum("tip_amount").alias("tip_amount"),
+        sum("tolls_amount").alias("tolls_amount"),
+        count("*").alias("number")
+    ).orderBy("Pickup_Time", "Pickup_Location")
+
+    # The aggregate is small: cache it so counting and writing share one job
+    out = out.cache()
+    rows = out.count()
+    out.write.mode("overwrite").parquet(output_path)
+    out.unpersist()
+    return rows
+
+
+ENGINE_RUNNERS = {
+    "pandas": run_pandas,
+    "pyarrow": run_pyarrow,
+    "duckdb": run_duckdb,
+    "polars": run_polars,
+    "pyspark": run_pyspark,
+}
+
+# Engine -> setup run in the worker before the timing starts (JVM startup);
+# the object returned is stopped after the timing
+ENGINE_SETUP = {
+    "pyspark": spark_session,
+}
+
+
+# ============================================
+# Measurement
+# ============================================
+
+def path_size(path: str) -> int:
+    """Size in bytes of a file, or of all files under a directory"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(path) for name in files)
+    return os.path.getsize(path)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Peak resident set size of the current process (children not included,
+    see _TreeMemorySampler)
+
+    On Linux this is VmHWM, the high-water mark of this process's own address
+    space: ru_maxrss also carries over the parent's peak from the fork, so
+    every engine would report the memory of the input generation.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _process_tree(root_pid: int) -> List[int]:
+    """root_pid and all of its live descendants, from the parent pids in /proc"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; ppid follows its ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def _tree_rss_bytes(root_pid: int) -> Optional[int]:
+    """Current resident memory of a process and its descendants (e.g. the Spark JVM)"""
+    total = None
+    for pid in _process_tree(root_pid):
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, IndexError, ValueError):
+            continue
+        total = rss if total is None else total + rss
+    return total
+
+
+class _TreeMemorySampler:
+    """
+    Background thread tracking the peak RSS of a worker's whole process tree
+
+    The worker's own VmHWM misses child processes such as the JVM pyspark
+    launches, which is where Spark's memory is. The sampler runs in the
+    parent, so it does not compete with the timed work for the GIL.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            rss = _tree_rss_bytes(self.pid)
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        if os.path.isdir("/proc"):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def _bench_worker(engine: str, input_path: str, output_path: str, queue):
+    """Run one engine in a fresh process so peak RSS is attributable to it"""
+    try:
+        setup = ENGINE_SETUP.get(engine)
+        session = setup() if setup else None
+        start = time.perf_counter()
+        rows_out = ENGINE_RUNNERS[engine](input_path, output_path)
+        wall_time = time.perf_counter() - start
+        if session is not None:
+            session.stop()
+        queue.put({
+            "wall_time_s": wall_time,
+            "rows_out": rows_out,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "output_bytes": path_size(output_path),
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _wait_for_result(proc, queue, poll_s: float = 1.0) -> Dict:
+    """Result of a worker, or an error record if it died without one (OOM, crash)"""
+    import queue as queue_module
+
+    while True:
+        try:
+            return queue.get(timeout=poll_s)
+        except queue_module.Empty:
+            if proc.is_alive():
+                continue
+        # The worker exited; pick up a result that was flushed just before
+        try:
+            return queue.get(timeout=poll_s)
+        except queue_module.Empty:
+            return {"error": f"worker exited with code {proc.exitcode} without a result"}
+
+
+def run_benchmark(engine: str, input_path: str, rows: int, work_dir: str) -> Dict:
+    """
+    Benchmark one engine on one input file in an isolated child process
+
+    Returns:
+        Result record (also suitable for the history file)
+    """
+    output_path = os.path.join(work_dir, f"{engine}_{rows}.parquet")
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_bench_worker, args=(engine, input_path, output_path, queue))
+    proc.start()
+    with _TreeMemorySampler(proc.pid) as sampler:
+        result = _wait_for_result(proc, queue)
+    proc.join()
+
+    record = {"engine": engine, "rows": rows, **result}
+    if "error" not in record and sampler.peak is not None:
+        # VmHWM catches the worker's short spikes, the sampler its children
+        record["peak_rss_bytes"] = max(record["peak_rss_bytes"] or 0, sampler.peak)
+    if "wall_time_s" in record:
+        record["rows_per_s"] = rows / record["wall_time_s"] if record["wall_time_s"] else None
+    return record
+
+
+def ensure_input(data_dir: str, rows: int, seed: int) -> str:
+    """Generate (or reuse) a synthetic yellow Parquet file with the given row count"""
+    from generate_synthetic_trips import write_trips
+
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench_yellow_{rows}_seed{seed}.parquet")
+    if not os.path.exists(path):
+        print_info(f"Generating {rows:,} synthetic rows -> {path}")
+        # In its own process, so the generator's memory stays out of this
+        # process (and of the benchmark workers started from it). Written
+        # under a temporary name, so an interrupted run never leaves a
+        # partial file that later runs would reuse.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        ctx = multiprocessing.get_context("spawn")
+        proc = ctx.Process(target=write_trips, args=(tmp_path, rows, "yellow", 2024, 1),
+                           kwargs={"fmt": "parquet", "seed": seed})
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError(f"Generating {path} failed (exit code {proc.exitcode})")
+        os.replace(tmp_path, path)
+    return path
+
+
+# ============================================
+# History & Regression Tracking
+# ============================================
+
+def load_json(path: str, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path: str, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def baseline_key(record: Dict) -> str:
+    return f"{record['engine']}:{record['rows']}"
+
+
+def find_regressions(records: List[Dict], baseline: Dict, threshold: float) -> List[Dict]:
+    """
+    Compare wall times against the baseline
+
+    Returns:
+        One entry per (engine, size) slower than baseline * (1 + threshold)
+    """
+    regressions = []
+    for record in records:
+        base = baseline.get(baseline_key(record))
+        if not base or "wall_time_s" not in record:
+            continue
+        change = record["wall_time_s"] / base["wall_time_s"] - 1.0
+        if change > threshold:
+            regressions.append({
+                "engine": record["engine"],
+                "rows": record["rows"],
+                "baseline_s": base["wall_time_s"],
+                "current_s": record["wall_time_s"],
+                "change_pct": change * 100,
+            })
+    return regressions
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the hourly NYC taxi aggregation")
+    parser.add_argument("--engines", nargs="+", default=None,
+                        help=f"Engines to run (default: all installed of {list(ENGINE_RUNNERS)})")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "nyc_taxi_bench"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown that counts as a regression (default: 0.10)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run's results as the new baseline")
+    args = parser.parse_args(argv)
+
+    print_header("NYC Taxi Aggregation Benchmark")
+
+    installed = available_engines()
+    engines = args.engines or installed
+    missing = [engine for engine in engines if engine not in installed]
+    for engine in missing:
+        print_info(f"Skipping {engine}: not installed")
+    engines = [engine for engine in engines if engine in installed]
+
+    if not engines:
+        print_error("No aggregation engines available")
+        return 1
+
+    run_id = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    records = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for rows in args.sizes:
+            input_path = ensure_input(args.data_dir, rows, args.seed)
+            for engine in engines:
+                record = run_benchmark(engine, input_path, rows, work_dir)
+                record.update({
+                    "run_id": run_id,
+                    "input_bytes": path_size(input_path),
+                    "python": platform.python_version(),
+                    "host": platform.node(),
+                })
+                records.append(record)
+
+                if "error" in record:
+                    print_error(f"{engine:8s} {rows:>13,} rows: {record['error']}")
+                else:
+                    rss = record["peak_rss_bytes"]
+                    print_success(
+                        f"{engine:8s} {rows:>13,} rows: {record['wall_time_s']:8.2f}s  "
+                        f"{record['rows_per_s']:>13,.0f} rows/s  "
+                        f"peak RSS {rss / 2**20 if rss else float('nan'):8.0f} MiB  "
+                        f"out {record['output_bytes'] / 2**20:6.1f} MiB"
+                    )
+
+    history = load_json(args.history, [])
+    history.extend(records)
+    save_json(args.history, history)
+    print_info(f"Appended {len(records)} results to {args.history}")
+
+    baseline = load_json(args.baseline, {})
+    regressions = find_regressions(records, baseline, args.threshold)
+
+    if args.update_baseline:
+        for record in records:
+            if "wall_time_s" in record:
+                baseline[baseline_key(record)] = record
+        save_json(args.baseline, baseline)
+        print_success(f"Updated baseline: {args.baseline}")
+
+    if regressions:
+        print_header("Regressions")
+        for reg in regressions:
+            print_error(f"{reg['engine']} @ {reg['rows']:,} rows: "
+                        f"{reg['baseline_s']:.2f}s -> {reg['current_s']:.2f}s "
+                        f"(+{reg['change_pct']:.1f}%)")
+        return 1
+
+    print_success("No regressions above threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+CSV to Parquet Conversion for NYC Taxi Trip Files
+One-time conversion of raw TLC CSV files into typed Parquet that is sorted
+by pickup timestamp and pickup location, with tuned row-group sizes,
+dictionary encoding for low-cardinality columns and min/max statistics, plus
+the derived trip features of trip_features.py computed once at conversion
+
+Sorting makes each row group cover a narrow time window, so readers (Spark,
+Trino, DuckDB, pyarrow) can skip row groups on time or location predicates
+using the footer statistics, and read only the columns they need.
+
+Usage:
+    python convert_to_parquet.py ~/nyc_taxi_data/raw/*.csv --output ~/nyc_taxi_data/raw
+
+Requirements: pip install pyarrow
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from pipeline_metrics import report_rows
+from trip_features import add_feature_columns
+
+DEFAULT_ROW_GROUP_SIZE = 1_000_000
+DEFAULT_COMPRESSION = "zstd"
+
+# Column types for the TLC schemas (keys are lower case; CSV headers vary in
+# case between eras, e.g. Trip_Pickup_DateTime vs trip_pickup_datetime)
+COLUMN_TYPES: Dict[str, pa.DataType] = {
+    # Modern yellow / green
+    "vendorid": pa.int8(),
+    "tpep_pickup_datetime": pa.timestamp("us"),
+    "tpep_dropoff_datetime": pa.timestamp("us"),
+    "lpep_pickup_datetime": pa.timestamp("us"),
+    "lpep_dropoff_datetime": pa.timestamp("us"),
+    "passenger_count": pa.int8(),
+    "trip_distance": pa.float64(),
+    "ratecodeid": pa.int8(),
+    "store_and_fwd_flag": pa.string(),
+    "pulocationid": pa.int16(),
+    "dolocationid": pa.int16(),
+    "payment_type": pa.string(),
+    "fare_amount": pa.float64(),
+    "extra": pa.float64(),
+    "mta_tax": pa.float64(),
+    "tip_amount": pa.float64(),
+    "tolls_amount": pa.float64(),
+    "ehail_fee": pa.float64(),
+    "improvement_surcharge": pa.float64(),
+    "total_amount": pa.float64(),
+    "congestion_surcharge": pa.float64(),
+    "airport_fee": pa.float64(),
+    "trip_type": pa.int8(),
+    # 2009-2010 yellow
+    "vendor_name": pa.string(),
+    "vendor_id": pa.string(),
+    "trip_pickup_datetime": pa.timestamp("us"),
+    "trip_dropoff_datetime": pa.timestamp("us"),
+    "pickup_datetime": pa.timestamp("us"),
+    "dropoff_datetime": pa.timestamp("us"),
+    "start_lon": pa.float64(),
+    "start_lat": pa.float64(),
+    "end_lon": pa.float64(),
+    "end_lat": pa.float64(),
+    "pickup_longitude": pa.float64(),
+    "pickup_latitude": pa.float64(),
+    "dropoff_longitude": pa.float64(),
+    "dropoff_latitude": pa.float64(),
+    "rate_code": pa.string(),
+    "store_and_forward": pa.string(),
+    "fare_amt": pa.float64(),
+    "surcharge": pa.float64(),
+    "tip_amt": pa.float64(),
+    "tolls_amt": pa.float64(),
+    "total_amt": pa.float64(),
+}
+
+# Integer columns that TLC CSVs (and generate_synthetic_trips.py) write as
+# "1.0"; they are parsed as float64 and downcast to their COLUMN_TYPES type
+# after parsing (kept as float64 if a value is fractional or out of range)
+FLOAT_PARSED_COLUMNS = {"vendorid", "passenger_count", "ratecodeid", "trip_type"}
+
+# Low-cardinality columns that benefit from dictionary encoding
+DICTIONARY_COLUMNS = {
+    "vendorid", "vendor_name", "vendor_id", "payment_type", "ratecodeid",
+    "rate_code", "store_and_fwd_flag", "store_and_forward", "trip_type",
+}
+
+# Sort keys in priority order; the first pickup column and the first
+# location column present in the file are used
+PICKUP_COLUMNS = ["tpep_pickup_datetime", "lpep_pickup_datetime",
+                  "trip_pickup_datetime", "pickup_datetime"]
+LOCATION_COLUMNS = ["pulocationid", "start_lon", "pickup_longitude"]
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}")
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+def read_csv_header(path: str) -> List[str]:
+    with open(path, newline="") as f:
+        return [name.strip() for name in f.readline().rstrip("\r\n").split(",")]
+
+
+def find_column(columns: List[str], candidates: List[str]) -> Optional[str]:
+    """Actual column name (original case) of the first candidate present"""
+    lower = {name.lower(): name for name in columns}
+    for candidate in candidates:
+        if candidate in lower:
+            return lower[candidate]
+    return None
+
+
+def read_trip_csv(path: str) -> pa.Table:
+    """Read a TLC CSV with explicit column types for every known column"""
+    header = read_csv_header(path)
+    column_types = {name: pa.float64() if name.lower() in FLOAT_PARSED_COLUMNS else COLUMN_TYPES[name.lower()]
+                    for name in header if name.lower() in COLUMN_TYPES}
+
+    return pv.read_csv(
+        path,
+        read_options=pv.ReadOptions(block_size=64 * 1024 * 1024),
+        convert_options=pv.ConvertOptions(
+            column_types=column_types,
+            timestamp_parsers=["%Y-%m-%d %H:%M:%S", pv.ISO8601],
+            strings_can_be_null=True,
+        ),
+    )
+
+
+def _downcast_integers(table: pa.Table) -> pa.Table:
+    """Checked cast of the float-parsed integer columns to their COLUMN_TYPES type"""
+    for index, name in enumerate(table.column_names):
+        if name.lower() not in FLOAT_PARSED_COLUMNS:
+            continue
+        try:
+            converted = pc.cast(table[name], COLUMN_TYPES[name.lower()])
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+        table = table.set_column(index, name, converted)
+    return table
+
+
+def _normalize_payment_type(table: pa.Table) -> pa.Table:
+    """
+    Store payment_type as a compact integer code when every value is numeric
+    (modern files); keep it as a string otherwise (2009 'CASH'/'Credit')
+    """
+    name = find_column(table.column_names, ["payment_type"])
+    if name is None:
+        return table
+    column = table[name]
+    try:
+        # Through float64: modern CSVs write codes as "1.0"
+        converted = pc.cast(pc.cast(column, pa.float64()), pa.int8())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return table
+    return table.set_column(table.column_names.index(name), name, converted)
+
+
+def sort_trips(table: pa.Table) -> pa.Table:
+    """Sort by pickup timestamp, then pickup location"""
+    keys = [find_column(table.column_names, PICKUP_COLUMNS),
+            find_column(table.column_names, LOCATION_COLUMNS)]
+    sort_keys = [(key, "ascending") for key in keys if key is not None]
+    if not sort_keys:
+        return table
+    return table.sort_by(sort_keys)
+
+
+def convert_file(csv_path: str, parquet_path: str,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 compression: str = DEFAULT_COMPRESSION) -> Dict:
+    """
+    Convert one CSV into a sorted, typed Parquet file
+
+    The file is written under a temporary name and renamed, so a crash never
+    leaves a partial Parquet file next to the CSV.
+
+    Returns:
+        Dictionary with rows, input/output bytes and seconds
+    """
+    start = time.perf_counter()
+
+    table = read_trip_csv(csv_path)
+    table = _downcast_integers(table)
+    table = _normalize_payment_type(table)
+    table = sort_trips(table)
+    table = add_feature_columns(table)
+
+    dictionary_columns = [name for name in table.column_names
+                          if name.lower() in DICTIONARY_COLUMNS]
+
+    tmp_path = f"{parquet_path}.tmp"
+    pq.write_table(
+        table,
+        tmp_path,
+        row_group_size=row_group_size,
+        compression=compression,
+        use_dictionary=dictionary_columns,
+        write_statistics=True,
+    )
+    os.replace(tmp_path, parquet_path)
+
+    return {
+        "csv_path": csv_path,
+        "parquet_path": parquet_path,
+        "rows": table.num_rows,
+        "row_groups": pq.ParquetFile(parquet_path).num_row_groups,
+        "bytes_read": os.path.getsize(csv_path),
+        "bytes_written": os.path.getsize(parquet_path),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def output_path_for(csv_path: str, output_dir: Optional[str]) -> str:
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(output_dir or os.path.dirname(csv_path), f"{stem}.parquet")
+
+
+def is_up_to_date(csv_path: str, parquet_path: str) -> bool:
+    return (os.path.exists(parquet_path)
+            and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path))
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert TLC trip CSV files to sorted Parquet")
+    parser.add_argument("inputs", nargs="+", help="CSV files or glob patterns")
+    parser.add_argument("--output", help="Output directory (default: next to each CSV)")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--compression", default=DEFAULT_COMPRESSION)
+    parser.add_argument("--force", action="store_true", help="Convert even if Parquet is newer than the CSV")
+    args = parser.parse_args(argv)
+
+    print_header("CSV to Parquet Conversion")
+
+    csv_paths = sorted({path for pattern in args.inputs for path in glob.glob(pattern)})
+    if not csv_paths:
+        print_info("No CSV files to convert")
+        return 0
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    failed = 0
+    for csv_path in csv_paths:
+        parquet_path = output_path_for(csv_path, args.output)
+        if not args.force and is_up_to_date(csv_path, parquet_path):
+            print_info(f"Up to date: {os.path.basename(parquet_path)}")
+            continue
+        try:
+            result = convert_file(csv_path, parquet_path, args.row_group_size, args.compression)
+            report_rows(rows_in=result["rows"], rows_out=result["rows"])
+            ratio = result["bytes_read"] / max(result["bytes_written"], 1)
+            print_success(f"{os.path.basename(csv_path)} -> {os.path.basename(parquet_path)}: "
+                          f"{result['rows']:,} rows, {result['row_groups']} row groups, "
+                          f"{ratio:.1f}x smaller, {result['seconds']:.1f}s")
+        except (pa.ArrowException, OSError) as e:
+            failed += 1
+            print_error(f"Failed to convert {csv_path}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -150,6 +150,15 @@ HAVING trip_count >= 1;
 -- Verify location view
 SELECT * FROM yellow_trip_locations ORDER BY trip_count DESC LIMIT 10;
 
+-- For map charts prefer the pre-aggregated grid tiles written by
+-- spatial_grid.py (nyc_taxi_grid.parquet, registered as nyc_taxi_grid):
+-- one zoom level inside the viewport is a few thousand cells, e.g. Manhattan
+-- at zoom 14 (spatial_grid.viewport_filter_sql builds the tile ranges)
+-- SELECT longitude, latitude, trips, revenue
+-- FROM nyc_taxi_grid
+-- WHERE kind = 'pickup' AND zoom = 14
+--   AND tile_x BETWEEN 4823 AND 4827 AND tile_y BETWEEN 6150 AND 6160;
+
 
 -- ============================================
 -- STEP 5: Create Dashboard Query Views
@@ -15,9 +15,15 @@ WITH (location = 'hdfs:///user/hive/warehouse/nyc_taxi.db');
 -- STEP 2: Create nyc_taxi_aggregated Table
 -- ============================================
 
+-- The pipeline writes one dataset for all trip types, partitioned as
+-- nyc_taxi_aggregated/taxi_type=<type>/Pickup_Month=<YYYY-MM>/, so
+-- cross-type dashboards read one table and prune by type and month
+
 -- Option A: External table pointing to Parquet files in HDFS
 CREATE TABLE IF NOT EXISTS nyc_taxi.nyc_taxi_aggregated (
-    Pickup_Time VARCHAR,
+    Pickup_Time VARCHAR,          -- display string, derived from Pickup_Hour_Key
+    Pickup_Hour_Key INT,          -- hours since 1970-01-01; group/filter on this
+    Pickup_Hour TIMESTAMP,        -- start of the hour, Superset time column
     Pickup_Location INT,
     Total_Amount DOUBLE,
     AVG_Total_Amount DOUBLE,
@@ -30,17 +36,27 @@ CREATE TABLE IF NOT EXISTS nyc_taxi.nyc_taxi_aggregated (
     tip_amount DOUBLE,
     tolls_amount DOUBLE,
     number INT,
-    taxi_type VARCHAR
+    Pickup_Borough VARCHAR,       -- denormalized from taxi_zones at aggregation time
+    Pickup_Zone VARCHAR,
+    Pickup_Service_Zone VARCHAR,
+    taxi_type VARCHAR,            -- partition columns (must come last)
+    Pickup_Month VARCHAR
 )
 WITH (
     format = 'PARQUET',
+    partitioned_by = ARRAY['taxi_type', 'pickup_month'],
     external_location = 'hdfs:///user/hive/warehouse/nyc_taxi/aggregated/'
 );
 
+-- Register the partitions written by the pipeline (re-run after each load)
+CALL system.sync_partition_metadata('nyc_taxi', 'nyc_taxi_aggregated', 'FULL', false);
+
 -- Option B: External table pointing to S3
 /*
 CREATE TABLE IF NOT EXISTS nyc_taxi.nyc_taxi_aggregated (
-    Pickup_Time VARCHAR,
+    Pickup_Time VARCHAR,          -- display string, derived from Pickup_Hour_Key
+    Pickup_Hour_Key INT,          -- hours since 1970-01-01; group/filter on this
+    Pickup_Hour TIMESTAMP,        -- start of the hour, Superset time column
     Pickup_Location INT,
     Total_Amount DOUBLE,
     AVG_Total_Amount DOUBLE,
@@ -53,10 +69,15 @@ CREATE TABLE IF NOT EXISTS nyc_taxi.nyc_taxi_aggregated (
     tip_amount DOUBLE,
     tolls_amount DOUBLE,
     number INT,
-    taxi_type VARCHAR
+    Pickup_Borough VARCHAR,       -- denormalized from taxi_zones at aggregation time
+    Pickup_Zone VARCHAR,
+    Pickup_Service_Zone VARCHAR,
+    taxi_type VARCHAR,            -- partition columns (must come last)
+    Pickup_Month VARCHAR
 )
 WITH (
     format = 'PARQUET',
+    partitioned_by = ARRAY['taxi_type', 'pickup_month'],
     external_location = 's3://your-bucket/nyc_taxi/aggregated/'
 );
 */
@@ -64,7 +85,9 @@ WITH (
 -- Option C: CSV format (for testing with sample data)
 /*
 CREATE TABLE IF NOT EXISTS nyc_taxi.nyc_taxi_aggregated (
-    Pickup_Time VARCHAR,
+    Pickup_Time VARCHAR,          -- display string, derived from Pickup_Hour_Key
+    Pickup_Hour_Key INT,          -- hours since 1970-01-01; group/filter on this
+    Pickup_Hour TIMESTAMP,        -- start of the hour, Superset time column
     Pickup_Location INT,
     Total_Amount DOUBLE,
     AVG_Total_Amount DOUBLE,
@@ -77,7 +100,10 @@ CREATE TABLE IF NOT EXISTS nyc_taxi.nyc_taxi_aggregated (
     tip_amount DOUBLE,
     tolls_amount DOUBLE,
     number INT,
-    taxi_type VARCHAR
+    taxi_type VARCHAR,
+    Pickup_Borough VARCHAR,       -- denormalized from taxi_zones at aggregation time
+    Pickup_Zone VARCHAR,
+    Pickup_Service_Zone VARCHAR
 )
 WITH (
     format = 'CSV',
@@ -148,8 +174,8 @@ SELECT * FROM nyc_taxi.taxi_zones LIMIT 5;
 -- Check date range
 SELECT 
     taxi_type,
-    MIN(Pickup_Time) as earliest_date,
-    MAX(Pickup_Time) as latest_date,
+    MIN(Pickup_Hour) as earliest_date,
+    MAX(Pickup_Hour) as latest_date,
     COUNT(*) as record_count,
     SUM(number) as total_trips
 FROM nyc_taxi.nyc_taxi_aggregated
@@ -163,16 +189,16 @@ FROM nyc_taxi.taxi_zones
 GROUP BY Borough
 ORDER BY zone_count DESC;
 
--- Test join
+-- Test zone attributes (denormalized at aggregation time, no join needed)
 SELECT 
     t.Pickup_Time,
-    z.Zone,
-    z.Borough,
+    t.Pickup_Zone,
+    t.Pickup_Borough,
     t.number as trips,
     t.Total_Amount as revenue
 FROM nyc_taxi.nyc_taxi_aggregated t
-JOIN nyc_taxi.taxi_zones z ON t.Pickup_Location = z.LocationID
-WHERE t.Pickup_Time >= DATE_FORMAT(CURRENT_DATE - INTERVAL '7' DAY, '%Y-%m-%d %H')
+-- integer range predicate on the hour key (hours since 1970-01-01)
+WHERE t.Pickup_Hour_Key >= date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', CAST(CURRENT_DATE - INTERVAL '7' DAY AS TIMESTAMP))
 ORDER BY t.number DESC
 LIMIT 10;
 
@@ -184,28 +210,28 @@ LIMIT 10;
 CREATE OR REPLACE VIEW nyc_taxi.recent_trips AS
 SELECT *
 FROM nyc_taxi.nyc_taxi_aggregated
-WHERE Pickup_Time >= DATE_FORMAT(CURRENT_DATE - INTERVAL '30' DAY, '%Y-%m-%d %H');
+WHERE Pickup_Hour_Key >= date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', CAST(CURRENT_DATE - INTERVAL '30' DAY AS TIMESTAMP));
 
 -- View: Trip data with zone information
+-- (kept for existing charts; zone columns now live on nyc_taxi_aggregated itself)
 CREATE OR REPLACE VIEW nyc_taxi.trips_with_zones AS
 SELECT 
     t.*,
-    z.Zone as pickup_zone,
-    z.Borough as pickup_borough
-FROM nyc_taxi.nyc_taxi_aggregated t
-LEFT JOIN nyc_taxi.taxi_zones z ON t.Pickup_Location = z.LocationID;
+    t.Pickup_Zone as pickup_zone,
+    t.Pickup_Borough as pickup_borough
+FROM nyc_taxi.nyc_taxi_aggregated t;
 
 -- View: Daily summary
 CREATE OR REPLACE VIEW nyc_taxi.daily_summary AS
 SELECT 
-    DATE(Pickup_Time) as trip_date,
+    DATE(Pickup_Hour) as trip_date,
     taxi_type,
     SUM(number) as total_trips,
     CAST(SUM(Total_Amount) AS DECIMAL(12,2)) as total_revenue,
     CAST(AVG(AVG_Total_Amount) AS DECIMAL(8,2)) as avg_fare,
     CAST(AVG(AVG_Trip_Distance) AS DECIMAL(8,2)) as avg_distance
 FROM nyc_taxi.nyc_taxi_aggregated
-GROUP BY DATE(Pickup_Time), taxi_type
+GROUP BY DATE(Pickup_Hour), taxi_type
 ORDER BY trip_date DESC;
 
 -- ============================================
@@ -96,8 +96,15 @@ DROP VIEW IF EXISTS nyc_taxi_aggregated;
 
 CREATE VIEW nyc_taxi_aggregated AS
 SELECT 
-    -- Extract hour from pickup datetime (format: '2020-07-31 17')
-    DATE_FORMAT(lpep_pickup_datetime, '%Y-%m-%d %H') as Pickup_Time,
+    -- Display string ('2020-07-31 17') and hour timestamp, derived from the
+    -- integer hour key after aggregation
+    DATE_FORMAT(date_add('hour', Pickup_Hour_Key, TIMESTAMP '1970-01-01 00:00:00'), '%Y-%m-%d %H') as Pickup_Time,
+    date_add('hour', Pickup_Hour_Key, TIMESTAMP '1970-01-01 00:00:00') as Pickup_Hour,
+    hourly.*
+FROM (
+SELECT 
+    -- Integer hour key: hours since 1970-01-01
+    CAST(date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', lpep_pickup_datetime) AS INTEGER) as Pickup_Hour_Key,
     
     -- Pickup location
     pulocationid as Pickup_Location,
@@ -132,9 +139,10 @@ WHERE lpep_pickup_datetime IS NOT NULL
     AND trip_distance > 0
     AND pulocationid IS NOT NULL
 GROUP BY 
-    DATE_FORMAT(lpep_pickup_datetime, '%Y-%m-%d %H'),
+    date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', lpep_pickup_datetime),
     pulocationid
-ORDER BY Pickup_Time, Pickup_Location;
+) hourly
+ORDER BY Pickup_Hour_Key, Pickup_Location;
 
 -- ============================================
 -- STEP 4: Verify Aggregated View
@@ -170,20 +178,48 @@ GROUP BY taxi_type;
 
 
 -- ============================================
--- OPTIONAL: Create Combined View (Green + Yellow)
+-- OPTIONAL: Combined Table (Green + Yellow)
 -- ============================================
+-- Both trip types are aggregated once, at load time, into a single table
+-- partitioned by taxi_type and month (the same layout aggregate_trips.py
+-- writes), so cross-type queries read one table and never run a UNION
 
 /*
--- Uncomment to create combined view with both taxi types
+-- Uncomment to replace the view with a combined table of both taxi types
 
-DROP VIEW IF EXISTS green_aggregated;
-DROP VIEW IF EXISTS yellow_aggregated;
 DROP VIEW IF EXISTS nyc_taxi_aggregated;
+DROP TABLE IF EXISTS nyc_taxi_aggregated;
+
+CREATE TABLE nyc_taxi_aggregated (
+    Pickup_Time VARCHAR,
+    Pickup_Hour_Key INT,
+    Pickup_Hour TIMESTAMP,
+    Pickup_Location INT,
+    Total_Amount DOUBLE,
+    AVG_Total_Amount DOUBLE,
+    Total_Trip_Distance DOUBLE,
+    AVG_Trip_Distance DOUBLE,
+    Total_Passenger_Count BIGINT,
+    AVG_Passenger_Count DOUBLE,
+    Fare_Amount DOUBLE,
+    Extra DOUBLE,
+    tip_amount DOUBLE,
+    tolls_amount DOUBLE,
+    number BIGINT,
+    taxi_type VARCHAR,
+    Pickup_Month VARCHAR
+)
+WITH (
+    format = 'PARQUET',
+    partitioned_by = ARRAY['taxi_type', 'pickup_month']
+);
 
--- Green taxi aggregation
-CREATE VIEW green_aggregated AS
+-- Green taxi partitions
+INSERT INTO nyc_taxi_aggregated
 SELECT 
-    DATE_FORMAT(lpep_pickup_datetime, '%Y-%m-%d %H') as Pickup_Time,
+    DATE_FORMAT(date_add('hour', date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', lpep_pickup_datetime), TIMESTAMP '1970-01-01 00:00:00'), '%Y-%m-%d %H') as Pickup_Time,
+    CAST(date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', lpep_pickup_datetime) AS INTEGER) as Pickup_Hour_Key,
+    date_add('hour', date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', lpep_pickup_datetime), TIMESTAMP '1970-01-01 00:00:00') as Pickup_Hour,
     pulocationid as Pickup_Location,
     SUM(total_amount) as Total_Amount,
     AVG(total_amount) as AVG_Total_Amount,
@@ -196,21 +232,25 @@ SELECT
     SUM(tip_amount) as tip_amount,
     SUM(tolls_amount) as tolls_amount,
     COUNT(*) as number,
-    'green' as taxi_type
+    'green' as taxi_type,
+    DATE_FORMAT(lpep_pickup_datetime, '%Y-%m') as Pickup_Month
 FROM nyc_greentrip
 WHERE lpep_pickup_datetime IS NOT NULL
     AND total_amount > 0
     AND trip_distance > 0
     AND pulocationid IS NOT NULL
 GROUP BY 
-    DATE_FORMAT(lpep_pickup_datetime, '%Y-%m-%d %H'),
+    date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', lpep_pickup_datetime),
+    DATE_FORMAT(lpep_pickup_datetime, '%Y-%m'),
     pulocationid;
 
--- Yellow taxi aggregation (no LocationID, grouped by time only)
-CREATE VIEW yellow_aggregated AS
+-- Yellow taxi partitions (no LocationID in 2009 data, grouped by time only)
+INSERT INTO nyc_taxi_aggregated
 SELECT 
-    DATE_FORMAT(trip_pickup_datetime, '%Y-%m-%d %H') as Pickup_Time,
-    NULL as Pickup_Location,  -- Old data doesn't have LocationID
+    DATE_FORMAT(date_add('hour', date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', trip_pickup_datetime), TIMESTAMP '1970-01-01 00:00:00'), '%Y-%m-%d %H') as Pickup_Time,
+    CAST(date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', trip_pickup_datetime) AS INTEGER) as Pickup_Hour_Key,
+    date_add('hour', date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', trip_pickup_datetime), TIMESTAMP '1970-01-01 00:00:00') as Pickup_Hour,
+    CAST(NULL AS INT) as Pickup_Location,
     SUM(total_amt) as Total_Amount,
     AVG(total_amt) as AVG_Total_Amount,
     SUM(trip_distance) as Total_Trip_Distance,
@@ -222,22 +262,17 @@ SELECT
     SUM(tip_amt) as tip_amount,
     SUM(tolls_amt) as tolls_amount,
     COUNT(*) as number,
-    'yellow' as taxi_type
+    'yellow' as taxi_type,
+    DATE_FORMAT(trip_pickup_datetime, '%Y-%m') as Pickup_Month
 FROM nyc_yellowtrip
 WHERE trip_pickup_datetime IS NOT NULL
     AND total_amt > 0
     AND trip_distance > 0
 GROUP BY 
-    DATE_FORMAT(trip_pickup_datetime, '%Y-%m-%d %H');
-
--- Combined view
-CREATE VIEW nyc_taxi_aggregated AS
-SELECT * FROM green_aggregated
-UNION ALL
-SELECT * FROM yellow_aggregated
-ORDER BY Pickup_Time, taxi_type;
+    date_diff('hour', TIMESTAMP '1970-01-01 00:00:00', trip_pickup_datetime),
+    DATE_FORMAT(trip_pickup_datetime, '%Y-%m');
 
--- Verify combined view
+-- Verify combined table (one scan, pruned per taxi_type partition)
 SELECT 
     taxi_type,
     COUNT(*) as aggregated_rows,
@@ -316,11 +351,11 @@ LIMIT 10;
 
 -- Query 1: Trips by hour
 SELECT 
-    SUBSTRING(Pickup_Time, 12, 2) as hour_of_day,
+    HOUR(Pickup_Hour) as hour_of_day,
     SUM(number) as total_trips,
     CAST(SUM(Total_Amount) AS DECIMAL(12,2)) as total_revenue
 FROM nyc_taxi_aggregated
-GROUP BY SUBSTRING(Pickup_Time, 12, 2)
+GROUP BY HOUR(Pickup_Hour)
 ORDER BY hour_of_day;
 
 -- Query 2: Top pickup locations
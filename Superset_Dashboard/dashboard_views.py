@@ -0,0 +1,237 @@
+"""
+Single-Scan GROUPING SETS Materialization of the Yellow Trip Dashboard Views
+hourly_metrics, payment_analysis, vendor_performance and fare_distribution
+used to be four independent GROUP BY views over nyc_yellowtrip, so
+refreshing the dashboard scanned the trip table four times. Here the views
+are declared as data (a dimension, an optional filter and measures) and
+compiled into one GROUPING SETS query that writes a combined summary table
+in a single scan; every dashboard dataset is then a thin filter over it
+
+    nyc_yellowtrip --(1 scan)--> dashboard_summary --> hourly_metrics
+                                                   --> payment_analysis ...
+
+Per-view filters become FILTER (WHERE ...) clauses on that view's measures,
+and the GROUPING() bitmask of each row (grouping_id) tells the thin views
+which rows belong to them. The SQL runs unchanged on Trino and DuckDB.
+
+Usage:
+    from dashboard_views import YELLOW_DASHBOARD_VIEWS, summary_statements, view_statements
+    for sql in summary_statements(YELLOW_DASHBOARD_VIEWS, "nyc_yellowtrip"):
+        backend.execute(sql)                     # every refresh
+    for view, sql in view_statements(YELLOW_DASHBOARD_VIEWS).items():
+        backend.execute(sql)                     # once
+
+    python dashboard_views.py            # print the generated SQL
+
+Requirements: none
+"""
+
+import argparse
+import sys
+from typing import Dict, List, Optional
+
+SUMMARY_TABLE = "dashboard_summary"
+GROUPING_COLUMN = "grouping_id"
+
+# View name -> definition
+#   dimension: (output column, SQL expression over the source table)
+#   where:     rows the view aggregates (optional)
+#   measures:  (output column, aggregate SQL) in output order
+#   order_by:  an output column, or an aggregate SQL to sort by (optional)
+YELLOW_DASHBOARD_VIEWS: Dict[str, Dict] = {
+    "hourly_metrics": {
+        "dimension": ("hour_of_day", "pickup_hour"),
+        "where": "trip_pickup_datetime IS NOT NULL AND total_amt > 0",
+        "measures": [
+            ("total_trips", "COUNT(*)"),
+            ("avg_fare", "AVG(total_amt)"),
+            ("avg_distance", "AVG(trip_distance)"),
+            ("avg_passengers", "AVG(passenger_count)"),
+            ("total_revenue", "SUM(total_amt)"),
+        ],
+        "order_by": "hour_of_day",
+    },
+    "payment_analysis": {
+        "dimension": ("payment_type", "payment_type"),
+        "where": "total_amt > 0",
+        "measures": [
+            ("trip_count", "COUNT(*)"),
+            ("avg_fare", "AVG(total_amt)"),
+            ("avg_tip", "AVG(tip_amt)"),
+            ("avg_tip_pct", "AVG(tip_pct)"),
+            ("total_revenue", "SUM(total_amt)"),
+        ],
+        "order_by": "trip_count DESC",
+    },
+    "vendor_performance": {
+        "dimension": ("vendor_name", "vendor_name"),
+        "measures": [
+            ("trip_count", "COUNT(*)"),
+            ("avg_fare", "AVG(total_amt)"),
+            ("avg_distance", "AVG(trip_distance)"),
+            ("avg_tip", "AVG(tip_amt)"),
+            ("total_revenue", "SUM(total_amt)"),
+        ],
+        "order_by": "trip_count DESC",
+    },
+    "fare_distribution": {
+        "dimension": ("fare_bucket", """CASE
+                WHEN total_amt < 5 THEN '$0-5'
+                WHEN total_amt < 10 THEN '$5-10'
+                WHEN total_amt < 15 THEN '$10-15'
+                WHEN total_amt < 20 THEN '$15-20'
+                WHEN total_amt < 30 THEN '$20-30'
+                ELSE '$30+'
+            END"""),
+        "where": "total_amt > 0 AND total_amt < 100",
+        "measures": [
+            ("trip_count", "COUNT(*)"),
+        ],
+        "order_by": "MIN(total_amt)",
+    },
+}
+
+
+def _column(view: str, name: str) -> str:
+    """Summary table column of a view's measure"""
+    return f"{view}__{name}"
+
+
+def _dimensions(views: Dict[str, Dict]) -> List[str]:
+    """Distinct dimension columns, in view order"""
+    names = []
+    for spec in views.values():
+        name = spec["dimension"][0]
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def grouping_ids(views: Dict[str, Dict]) -> Dict[str, int]:
+    """
+    GROUPING(d1, ..., dn) value of each view's rows
+
+    Bit i (counting from the right-most argument) is 1 when dimension i is
+    rolled up, so a view grouped by dimension k has every bit set except k's.
+
+    Raises:
+        ValueError: If two views share a dimension column with different expressions
+    """
+    expressions: Dict[str, str] = {}
+    for view, spec in views.items():
+        name, expr = spec["dimension"]
+        if expressions.setdefault(name, expr) != expr:
+            raise ValueError(f"Dimension {name!r} of {view} conflicts with another view")
+
+    dimensions = _dimensions(views)
+    all_bits = (1 << len(dimensions)) - 1
+    return {view: all_bits & ~(1 << (len(dimensions) - 1 - dimensions.index(spec["dimension"][0])))
+            for view, spec in views.items()}
+
+
+def _rows_column(view: str, spec: Dict) -> str:
+    """Column counting the rows that pass the view's filter (a COUNT(*) measure if it has one)"""
+    for name, aggregate in spec["measures"]:
+        if aggregate.replace(" ", "").upper() == "COUNT(*)":
+            return _column(view, name)
+    return _column(view, "rows")
+
+
+def _sort_is_column(spec: Dict) -> bool:
+    order_by = spec.get("order_by")
+    if not order_by:
+        return True
+    column = order_by.split()[0]
+    return column in {spec["dimension"][0]} | {name for name, _ in spec["measures"]}
+
+
+def _filtered(aggregate: str, where: Optional[str]) -> str:
+    return f"{aggregate} FILTER (WHERE {where})" if where else aggregate
+
+
+def compile_summary_sql(views: Dict[str, Dict], source: str,
+                        summary_table: str = SUMMARY_TABLE) -> str:
+    """CREATE TABLE ... AS the single GROUPING SETS query over the source table"""
+    dimensions = _dimensions(views)
+    derived = []
+    for name in dimensions:
+        expr = next(spec["dimension"][1] for spec in views.values() if spec["dimension"][0] == name)
+        if expr != name:
+            derived.append(f"{expr} AS {name}")
+
+    columns = [*dimensions, f"GROUPING({', '.join(dimensions)}) AS {GROUPING_COLUMN}"]
+    for view, spec in views.items():
+        where = spec.get("where")
+        # Groups whose rows all fail the view's filter are dropped by the thin view
+        if _rows_column(view, spec) == _column(view, "rows"):
+            columns.append(f"{_filtered('COUNT(*)', where)} AS {_column(view, 'rows')}")
+        for name, aggregate in spec["measures"]:
+            columns.append(f"{_filtered(aggregate, where)} AS {_column(view, name)}")
+        if not _sort_is_column(spec):
+            columns.append(f"{_filtered(spec['order_by'], where)} AS {_column(view, 'sort')}")
+
+    source_sql = f"(SELECT *, {', '.join(derived)} FROM {source})" if derived else source
+    grouping_sets = ", ".join(f"({name})" for name in dimensions)
+    select = ",\n        ".join(columns)
+    return f"""
+    CREATE TABLE {summary_table} AS
+    SELECT
+        {select}
+    FROM {source_sql} trips
+    GROUP BY GROUPING SETS ({grouping_sets})
+    """
+
+
+def compile_view_sql(view: str, views: Dict[str, Dict],
+                     summary_table: str = SUMMARY_TABLE) -> str:
+    """CREATE OR REPLACE VIEW of one dashboard dataset as a filter over the summary table"""
+    spec = views[view]
+    dimension = spec["dimension"][0]
+    columns = [dimension] + [f"{_column(view, name)} as {name}" for name, _ in spec["measures"]]
+
+    order_by = spec.get("order_by")
+    if order_by and not _sort_is_column(spec):
+        order_by = _column(view, "sort")
+
+    select = ",\n        ".join(columns)
+    sql = f"""
+    CREATE OR REPLACE VIEW {view} AS
+    SELECT
+        {select}
+    FROM {summary_table}
+    WHERE {GROUPING_COLUMN} = {grouping_ids(views)[view]}
+        AND {_rows_column(view, spec)} > 0
+    """
+    if order_by:
+        sql += f"ORDER BY {order_by}\n    "
+    return sql
+
+
+def summary_statements(views: Dict[str, Dict], source: str,
+                       summary_table: str = SUMMARY_TABLE) -> List[str]:
+    """Statements that rebuild the summary table (the refresh; one scan of source)"""
+    return [f"DROP TABLE IF EXISTS {summary_table}",
+            compile_summary_sql(views, source, summary_table)]
+
+
+def view_statements(views: Dict[str, Dict], summary_table: str = SUMMARY_TABLE) -> Dict[str, str]:
+    """View name -> CREATE OR REPLACE VIEW of its thin filter (needed once, not per refresh)"""
+    return {view: compile_view_sql(view, views, summary_table) for view in views}
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Print the generated refresh SQL"""
+    parser = argparse.ArgumentParser(description="Print the single-scan dashboard view SQL")
+    parser.add_argument("--source", default="nyc_yellowtrip", help="Trip table")
+    parser.add_argument("--summary-table", default=SUMMARY_TABLE)
+    args = parser.parse_args(argv)
+
+    statements = summary_statements(YELLOW_DASHBOARD_VIEWS, args.source, args.summary_table)
+    statements += view_statements(YELLOW_DASHBOARD_VIEWS, args.summary_table).values()
+    for sql in statements:
+        print(sql.strip() + ";\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Data-Quality Rules Fused into the NYC Taxi Aggregation Scan
+The aggregation jobs used to drop rows with WHERE clauses (total_amount > 0,
+trip_distance > 0, non-null pickup, pickup near the file's month), so nobody
+knew how many rows were dropped or why without separate full scans. Here the
+rules are declared once as data, compiled into a single Spark column that
+names the first rule a row violates, and carried through the aggregation as
+an extra group key. Rejected rows then aggregate into their own small groups,
+so rejection counts per rule, file and hour come out of the same scan
+
+    tagged = tag_rejections(trips.withColumn("source_file", F.input_file_name()))
+    aggregated = hourly_aggregate(tagged, keys=HOURLY_KEYS + REJECTION_KEYS)
+    valid, rejections = split_rejections(aggregated)
+
+Requirements: pip install pyspark
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pyspark.sql import Column, DataFrame
+from pyspark.sql import functions as F
+from pyspark.sql.window import Window
+
+# Rules over the canonical columns of schema_harmonization, checked in order;
+# a row is attributed to the first rule it violates.
+#   check: not_null | gt (column > value) | file_month (pickup month within
+#          "months" of the YYYY-MM in the source file name; files without one
+#          pass). Trips from adjacent months are valid late arrivals, routed
+#          to their own hour by partition_upsert.py; farther ones are clock errors
+#   exempt: taxi types the rule does not apply to (FHV files have no fares)
+QUALITY_RULES: List[Dict] = [
+    {"name": "pickup_not_null", "column": "pickup_datetime", "check": "not_null"},
+    {"name": "pickup_near_file_month", "column": "pickup_datetime", "check": "file_month",
+     "months": 1},
+    {"name": "total_amount_positive", "column": "total_amount", "check": "gt", "value": 0,
+     "exempt": ["fhv"]},
+    {"name": "trip_distance_positive", "column": "trip_distance", "check": "gt", "value": 0,
+     "exempt": ["fhv"]},
+]
+
+RULE_COLUMN = "rejected_rule"
+FILE_COLUMN = "rejected_file"
+REJECTION_KEYS = [RULE_COLUMN, FILE_COLUMN]
+
+QUARANTINE_ENV = "NYC_TAXI_QUARANTINE"
+
+_FILE_MONTH = r"_(\d{4}-\d{2})\.[A-Za-z]+$"
+
+
+def _rule_passes(rule: Dict, file_col: str) -> Column:
+    """Column that is true when the row satisfies the rule (never NULL)"""
+    column = F.col(rule["column"])
+    check = rule["check"]
+
+    if check == "not_null":
+        passes = column.isNotNull()
+    elif check == "gt":
+        passes = column.isNotNull() & (column > F.lit(rule["value"]))
+    elif check == "file_month":
+        file_month = F.regexp_extract(F.col(file_col), _FILE_MONTH, 1)
+        distance = F.months_between(F.trunc(column, "month"),
+                                    F.to_date(F.concat(file_month, F.lit("-01"))))
+        passes = (file_month == "") | (F.abs(distance) <= F.lit(rule.get("months", 0)))
+    else:
+        raise ValueError(f"Unknown check {check!r} in rule {rule['name']}")
+
+    passes = F.coalesce(passes, F.lit(False))
+    if rule.get("exempt"):
+        passes = passes | F.col("taxi_type").isin(rule["exempt"])
+    return passes
+
+
+def rejection_rule(rules: Sequence[Dict] = QUALITY_RULES, file_col: str = "source_file") -> Column:
+    """Name of the first violated rule, or NULL for rows that pass every rule"""
+    expr = F.lit(None).cast("string")
+    for rule in reversed(rules):
+        expr = F.when(~_rule_passes(rule, file_col), F.lit(rule["name"])).otherwise(expr)
+    return expr
+
+
+def tag_rejections(df: DataFrame, rules: Sequence[Dict] = QUALITY_RULES,
+                   file_col: str = "source_file") -> DataFrame:
+    """
+    Add rejected_rule and rejected_file columns
+
+    rejected_file is only set on rejected rows, so valid rows of one hour
+    still form a single group even when the hour spans several files.
+    """
+    df = df.withColumn(RULE_COLUMN, rejection_rule(rules, file_col))
+    return df.withColumn(FILE_COLUMN, F.when(F.col(RULE_COLUMN).isNotNull(), F.col(file_col)))
+
+
+def split_rejections(aggregated: DataFrame,
+                     rejection_keys: Sequence[str] = ("taxi_type", "Pickup_Hour_Key"),
+                     count_col: str = "number") -> Tuple[DataFrame, DataFrame]:
+    """
+    Split an aggregate keyed by REJECTION_KEYS into valid groups and
+    rejection counts
+
+    The aggregate is persisted so both outputs come from one scan of the
+    trip files.
+
+    Returns:
+        (valid aggregate without the rejection keys,
+         rejected_rule x rejected_file x rejection_keys -> rejected_rows)
+    """
+    aggregated = aggregated.persist()
+
+    valid = aggregated.filter(F.col(RULE_COLUMN).isNull()).drop(*REJECTION_KEYS)
+    keys = [key for key in rejection_keys if key in aggregated.columns]
+    rejections = (aggregated.filter(F.col(RULE_COLUMN).isNotNull())
+                  .groupBy(RULE_COLUMN, FILE_COLUMN, *keys)
+                  .agg(F.sum(count_col).alias("rejected_rows")))
+    return valid, rejections
+
+
+def rejection_summary(rejections: DataFrame) -> List[Tuple[str, int]]:
+    """Total rejected rows per rule, largest first"""
+    rows = (rejections.groupBy(RULE_COLUMN)
+            .agg(F.sum("rejected_rows").alias("rejected_rows"))
+            .orderBy(F.desc("rejected_rows"))
+            .collect())
+    return [(row[RULE_COLUMN], int(row["rejected_rows"])) for row in rows]
+
+
+def print_rejection_summary(summary: List[Tuple[str, int]], total_rows: Optional[int] = None):
+    if not summary:
+        print("✓ No rows rejected by data-quality rules")
+        return
+    for rule, count in summary:
+        share = f" ({count / total_rows:.2%})" if total_rows else ""
+        print(f"ℹ Rejected by {rule}: {count:,} rows{share}")
+
+
+def write_quarantine(tagged: DataFrame, path: str, per_rule: int = 100) -> None:
+    """
+    Write up to per_rule sample rows for every violated rule
+
+    Opt-in: unlike the counts this reads the trip files a second time.
+    """
+    rejected = tagged.filter(F.col(RULE_COLUMN).isNotNull())
+    rank = F.row_number().over(Window.partitionBy(RULE_COLUMN).orderBy(F.rand(seed=7)))
+    (rejected.withColumn("__rank", rank)
+     .filter(F.col("__rank") <= per_rule)
+     .drop("__rank")
+     .write.mode("overwrite").partitionBy(RULE_COLUMN).parquet(path))
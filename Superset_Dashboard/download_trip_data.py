@@ -0,0 +1,384 @@
+"""
+Parallel, Resumable TLC Trip File Downloader
+Downloads {taxi_type}_tripdata_{YEAR}-{month} files with a bounded pool of
+concurrent transfers, resumes partial files with HTTP Range requests,
+verifies size (and SHA-256 where known) before a file is considered
+complete, and retries failures with exponential backoff
+
+A file is written to <name>.part and only renamed to its final name after
+verification, so an interrupted run never leaves a truncated file that looks
+complete. A <name>.sha256 sidecar is written for every verified file, and
+its size and mtime are kept in download_manifest.json so later runs only
+re-hash files that changed.
+
+Usage:
+    python download_trip_data.py --taxi-types yellow green --year 2024 \\
+        --months 01 02 03 --output ~/nyc_taxi_data/raw --workers 4
+
+Requirements: standard library only
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+PARQUET_BASE_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data"
+CSV_BASE_URL = "https://s3.amazonaws.com/nyc-tlc/trip+data"
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 5
+DEFAULT_TIMEOUT = 60
+MANIFEST_FILE = "download_manifest.json"
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}")
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+class DownloadError(Exception):
+    """Raised when a file cannot be downloaded or fails verification"""
+
+
+class NotFoundError(DownloadError):
+    """Raised when the server reports the file does not exist (no retry)"""
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_sidecar(path: str) -> Optional[str]:
+    sidecar = f"{path}.sha256"
+    if not os.path.exists(sidecar):
+        return None
+    with open(sidecar) as f:
+        return f.read().split()[0]
+
+
+def write_sidecar(path: str, checksum: str):
+    with open(f"{path}.sha256", "w") as f:
+        f.write(f"{checksum}  {os.path.basename(path)}\n")
+
+
+class DownloadManifest:
+    """
+    Verified files of an output directory: name -> sha256, size, mtime
+
+    A file whose size and mtime still match its entry is trusted without
+    re-hashing. Shared by the download threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def unchanged(self, file_path: str) -> Optional[str]:
+        """Recorded checksum if the file's size and mtime match its entry, else None"""
+        entry = self.entries.get(os.path.basename(file_path))
+        if entry is None:
+            return None
+        if entry["size"] != os.path.getsize(file_path) or entry["mtime"] != os.path.getmtime(file_path):
+            return None
+        return entry["sha256"]
+
+    def checksum(self, file_path: str) -> Optional[str]:
+        """Checksum recorded when the file was last verified"""
+        entry = self.entries.get(os.path.basename(file_path))
+        return entry["sha256"] if entry else None
+
+    def record(self, file_path: str, checksum: str):
+        with self._lock:
+            self.entries[os.path.basename(file_path)] = {
+                "sha256": checksum,
+                "size": os.path.getsize(file_path),
+                "mtime": os.path.getmtime(file_path),
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def load_checksums(path: Optional[str]) -> Dict[str, str]:
+    """Read a 'sha256sum'-style manifest: '<hex digest>  <file name>' per line"""
+    checksums = {}
+    if not path:
+        return checksums
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                checksums[parts[1].lstrip("*")] = parts[0].lower()
+    return checksums
+
+
+def remote_size(url: str, timeout: int) -> Optional[int]:
+    """Content-Length from a HEAD request, or None if the server does not say"""
+    request = urllib.request.Request(url, method="HEAD")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            length = response.headers.get("Content-Length")
+            return int(length) if length is not None else None
+    except urllib.error.HTTPError as e:
+        if e.code in (403, 404):
+            raise NotFoundError(f"{url}: HTTP {e.code}") from e
+        raise
+
+
+def _transfer(url: str, part_path: str, timeout: int) -> int:
+    """
+    Download url into part_path, resuming from its current size if possible
+
+    Returns:
+        Number of bytes transferred in this call
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416:
+            # Requested range not satisfiable: the part file is already complete
+            return 0
+        if e.code in (403, 404):
+            raise NotFoundError(f"{url}: HTTP {e.code}") from e
+        raise
+
+    with response:
+        # 206 = server honoured the range; 200 = full body, start over
+        mode = "ab" if offset and response.status == 206 else "wb"
+        transferred = 0
+        with open(part_path, mode) as f:
+            for block in iter(lambda: response.read(CHUNK_SIZE), b""):
+                f.write(block)
+                transferred += len(block)
+    return transferred
+
+
+def download_file(url: str,
+                  dest_path: str,
+                  expected_sha256: Optional[str] = None,
+                  retries: int = DEFAULT_RETRIES,
+                  timeout: int = DEFAULT_TIMEOUT,
+                  backoff: float = 1.0,
+                  manifest: Optional[DownloadManifest] = None) -> Dict:
+    """
+    Download one file with resume, verification and retry
+
+    An existing dest_path is kept only if it still verifies (size matches the
+    server, checksum matches the checksum manifest or its sidecar); otherwise
+    it is downloaded again. Files unchanged since the download manifest
+    recorded them are not re-hashed.
+
+    Returns:
+        Result dictionary with status ('skipped' or 'downloaded'), bytes, seconds
+
+    Raises:
+        NotFoundError: If the server does not have the file
+        DownloadError: If the file still fails after all retries
+    """
+    part_path = f"{dest_path}.part"
+    start = time.perf_counter()
+    size = None
+
+    # Checksum the finished file must have: the checksum manifest's, else the
+    # one recorded when the file was last verified
+    known_sha = (expected_sha256 or read_sidecar(dest_path)
+                 or (manifest.checksum(dest_path) if manifest is not None else None))
+
+    for attempt in range(retries + 1):
+        try:
+            size = remote_size(url, timeout)
+
+            if os.path.exists(dest_path):
+                local_size = os.path.getsize(dest_path)
+                size_ok = size is None or local_size == size
+                # Hash only files that changed since they were last verified
+                checksum = manifest.unchanged(dest_path) if manifest is not None else None
+                if checksum is None:
+                    checksum = sha256_file(dest_path)
+                sha_ok = known_sha is None or checksum == known_sha
+                if size_ok and sha_ok:
+                    if read_sidecar(dest_path) is None:
+                        write_sidecar(dest_path, checksum)
+                    if manifest is not None and manifest.unchanged(dest_path) is None:
+                        manifest.record(dest_path, checksum)
+                    return {"url": url, "path": dest_path, "status": "skipped",
+                            "bytes": local_size, "seconds": time.perf_counter() - start}
+                if size is not None and local_size < size:
+                    # Truncated: resume from what is there (verified once complete)
+                    print_info(f"Existing {os.path.basename(dest_path)} is incomplete, resuming")
+                    os.replace(dest_path, part_path)
+                else:
+                    # Corrupt: none of its bytes can be reused
+                    print_info(f"Existing {os.path.basename(dest_path)} failed verification, re-downloading")
+                    os.remove(dest_path)
+
+            if size is not None and os.path.exists(part_path) and os.path.getsize(part_path) > size:
+                os.remove(part_path)
+
+            _transfer(url, part_path, timeout)
+
+            local_size = os.path.getsize(part_path)
+            if size is not None and local_size != size:
+                raise DownloadError(f"size mismatch: got {local_size}, expected {size}")
+
+            checksum = sha256_file(part_path)
+            if known_sha and checksum != known_sha:
+                os.remove(part_path)
+                raise DownloadError("checksum mismatch")
+
+            os.replace(part_path, dest_path)
+            write_sidecar(dest_path, checksum)
+            if manifest is not None:
+                manifest.record(dest_path, checksum)
+            return {"url": url, "path": dest_path, "status": "downloaded",
+                    "bytes": local_size, "seconds": time.perf_counter() - start}
+
+        except NotFoundError:
+            raise
+        except (urllib.error.URLError, OSError, DownloadError) as e:
+            if attempt == retries:
+                raise DownloadError(f"{url}: {e} (after {retries + 1} attempts)") from e
+            delay = backoff * (2 ** attempt) * (0.5 + random.random())
+            print_info(f"Retry {attempt + 1}/{retries} for {os.path.basename(dest_path)} "
+                       f"in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+
+def trip_file_candidates(taxi_type: str, year: str, month: str,
+                         parquet_base_url: str = PARQUET_BASE_URL,
+                         csv_base_url: str = CSV_BASE_URL) -> List[Tuple[str, str]]:
+    """(file name, URL) pairs to try in order: Parquet first, then the CSV archive"""
+    parquet = f"{taxi_type}_tripdata_{year}-{month}.parquet"
+    csv = f"{taxi_type}_tripdata_{year}-{month}.csv"
+    return [(parquet, f"{parquet_base_url}/{parquet}"),
+            (csv, f"{csv_base_url}/{csv}")]
+
+
+def download_trip_file(taxi_type: str, year: str, month: str, output_dir: str,
+                       checksums: Dict[str, str], **kwargs) -> Dict:
+    """Download one month, falling back to CSV if the Parquet file does not exist"""
+    errors = []
+    for file_name, url in trip_file_candidates(taxi_type, year, month,
+                                               kwargs.pop("parquet_base_url", PARQUET_BASE_URL),
+                                               kwargs.pop("csv_base_url", CSV_BASE_URL)):
+        try:
+            return download_file(url, os.path.join(output_dir, file_name),
+                                 expected_sha256=checksums.get(file_name), **kwargs)
+        except NotFoundError as e:
+            errors.append(str(e))
+    raise DownloadError("; ".join(errors))
+
+
+def download_all(taxi_types: List[str], year: str, months: List[str], output_dir: str,
+                 workers: int = DEFAULT_WORKERS, checksums: Optional[Dict[str, str]] = None,
+                 **kwargs) -> Tuple[List[Dict], List[str]]:
+    """
+    Download every (taxi_type, month) with at most `workers` concurrent transfers
+
+    Returns:
+        (results, errors)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    checksums = checksums or {}
+    kwargs.setdefault("manifest", DownloadManifest(os.path.join(output_dir, MANIFEST_FILE)))
+    results, errors = [], []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(download_trip_file, taxi_type, year, month, output_dir,
+                        checksums, **kwargs): (taxi_type, month)
+            for taxi_type in taxi_types
+            for month in months
+        }
+        for future in as_completed(futures):
+            taxi_type, month = futures[future]
+            try:
+                result = future.result()
+                results.append(result)
+                name = os.path.basename(result["path"])
+                if result["status"] == "skipped":
+                    print_info(f"Verified existing: {name}")
+                else:
+                    rate = result["bytes"] / max(result["seconds"], 1e-9) / 2**20
+                    print_success(f"Downloaded: {name} ({result['bytes'] / 2**20:,.1f} MiB, {rate:,.1f} MiB/s)")
+            except DownloadError as e:
+                errors.append(f"{taxi_type} {year}-{month}: {e}")
+                print_error(f"Failed to download {taxi_type} {year}-{month}: {e}")
+
+    return results, errors
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Download NYC TLC trip record files")
+    parser.add_argument("--taxi-types", nargs="+", default=["yellow", "green"])
+    parser.add_argument("--year", required=True)
+    parser.add_argument("--months", nargs="+", default=[f"{m:02d}" for m in range(1, 13)])
+    parser.add_argument("--output", default=".")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--checksums", help="sha256sum-style manifest of expected digests")
+    parser.add_argument("--parquet-base-url", default=PARQUET_BASE_URL)
+    parser.add_argument("--csv-base-url", default=CSV_BASE_URL)
+    args = parser.parse_args(argv)
+
+    print_header("NYC TLC Trip Data Download")
+    months = [f"{int(m):02d}" for m in args.months]
+
+    start = time.perf_counter()
+    results, errors = download_all(
+        args.taxi_types, args.year, months, args.output,
+        workers=args.workers,
+        checksums=load_checksums(args.checksums),
+        retries=args.retries,
+        timeout=args.timeout,
+        parquet_base_url=args.parquet_base_url,
+        csv_base_url=args.csv_base_url,
+    )
+    elapsed = time.perf_counter() - start
+
+    downloaded = sum(r["bytes"] for r in results if r["status"] == "downloaded")
+    print_info(f"{len(results)} files ready, {len(errors)} failed, "
+               f"{downloaded / 2**20:,.1f} MiB transferred in {elapsed:.1f}s")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
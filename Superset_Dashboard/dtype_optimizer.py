@@ -0,0 +1,206 @@
+"""
+Compact dtype Plans for In-Memory NYC Taxi Trip Frames
+pd.read_csv leaves trip frames as int64/float64/object, so low-cardinality
+strings such as vendor_name, payment_type and store_and_forward become one
+Python string object per row. This module holds a per-schema dtype plan
+(categoricals for low-cardinality strings, narrow integers for IDs and
+counts, float32 where precision allows) and applies it at read time or to an
+existing frame, reporting memory before and after
+
+Money and distance columns stay float64: they are summed over millions of
+rows (and Trino sums REAL columns as REAL), so totals would drift. Coordinates
+tolerate float32 (7 significant digits is under a meter for NYC lat/lon).
+
+Usage:
+    from dtype_optimizer import optimize_frame, read_trip_csv
+    df = read_trip_csv('sampledata/nyc_yellowtrip.csv', 'yellow_2009')   # compact while parsing
+    other = optimize_frame(other, report=True)   # an existing frame; schema detected from columns
+
+Requirements: pip install pandas
+"""
+
+import sys
+from typing import Dict, Optional
+
+import pandas as pd
+
+from trip_file_catalog import detect_schema_version
+
+# Rows per chunk when measuring the default frame for the report
+REPORT_CHUNK_ROWS = 500_000
+
+CATEGORY = "category"
+DATETIME = "datetime"
+
+# Column (lower case) -> target dtype, shared by all schemas
+_COMMON_PLAN: Dict[str, str] = {
+    "passenger_count": "Int8",
+    "store_and_fwd_flag": CATEGORY,
+    "taxi_type": CATEGORY,
+}
+
+DTYPE_PLANS: Dict[str, Dict[str, str]] = {
+    "yellow_2009": {
+        **_COMMON_PLAN,
+        "vendor_name": CATEGORY,
+        "trip_pickup_datetime": DATETIME,
+        "trip_dropoff_datetime": DATETIME,
+        "start_lon": "float32",
+        "start_lat": "float32",
+        "end_lon": "float32",
+        "end_lat": "float32",
+        "rate_code": CATEGORY,
+        "store_and_forward": CATEGORY,
+        "payment_type": CATEGORY,
+    },
+    "yellow": {
+        **_COMMON_PLAN,
+        "vendorid": "Int8",
+        "tpep_pickup_datetime": DATETIME,
+        "tpep_dropoff_datetime": DATETIME,
+        "ratecodeid": "Int8",
+        "pulocationid": "Int16",
+        "dolocationid": "Int16",
+        "payment_type": "Int8",
+    },
+    "green": {
+        **_COMMON_PLAN,
+        "vendorid": "Int8",
+        "lpep_pickup_datetime": DATETIME,
+        "lpep_dropoff_datetime": DATETIME,
+        "ratecodeid": "Int8",
+        "pulocationid": "Int16",
+        "dolocationid": "Int16",
+        "payment_type": "Int8",
+        "trip_type": "Int8",
+    },
+    # Hourly aggregates (nyc_taxi_aggregated)
+    "aggregated": {
+        "pickup_location": "Int16",
+        "pickup_hour_key": "Int32",
+        "pickup_hour": DATETIME,
+        "number": "int32",
+        "taxi_type": CATEGORY,
+    },
+}
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+    """Deep memory usage, counting the Python string objects"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def plan_for(df_columns, schema: Optional[str] = None) -> Dict[str, str]:
+    """
+    dtype plan keyed by the frame's actual column names
+
+    Args:
+        df_columns: Column names of the frame (any case)
+        schema: Schema name in DTYPE_PLANS; detected from the columns if omitted
+    """
+    if schema is None:
+        lower = {c.lower() for c in df_columns}
+        schema = "aggregated" if {"pickup_time", "number"} <= lower else detect_schema_version(df_columns)
+    plan = DTYPE_PLANS.get(schema, _COMMON_PLAN)
+    return {col: plan[col.lower()] for col in df_columns if col.lower() in plan}
+
+
+def _convert(series: pd.Series, dtype: str) -> pd.Series:
+    if dtype == DATETIME:
+        return pd.to_datetime(series, errors="coerce")
+    if dtype == CATEGORY:
+        return series.astype(CATEGORY)
+    if _is_integer(dtype):
+        numeric = pd.to_numeric(series, errors="coerce")
+        if dtype.startswith("int") and numeric.isna().any():
+            dtype = dtype.capitalize()  # fall back to the nullable variant
+        return numeric.round().astype(dtype)
+    return pd.to_numeric(series, errors="coerce").astype(dtype)
+
+
+def optimize_frame(df: pd.DataFrame, schema: Optional[str] = None,
+                   report: bool = False) -> pd.DataFrame:
+    """
+    Apply the schema's dtype plan to an existing frame
+
+    Columns not in the plan are left alone; float64 columns stay float64.
+
+    Returns:
+        New frame with compact dtypes
+    """
+    before = frame_memory_bytes(df) if report else None
+    plan = plan_for(df.columns, schema)
+
+    converted = {}
+    for column, dtype in plan.items():
+        if str(df[column].dtype) != dtype:
+            converted[column] = _convert(df[column], dtype)
+    out = df.assign(**converted) if converted else df
+
+    if report:
+        print_memory_report(before, frame_memory_bytes(out), len(df))
+    return out
+
+
+def _is_integer(dtype: str) -> bool:
+    return dtype.startswith(("Int", "int"))
+
+
+def read_trip_csv(path: str, schema: Optional[str] = None, report: bool = False,
+                  **kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv with the dtype plan applied while parsing
+
+    Categoricals, float32 and timestamps are built directly by the parser, so
+    peak memory is that of the compact frame rather than the default object
+    frame. Integer columns are written as "1.0" in TLC files, so they are
+    parsed as float64 and narrowed column by column afterwards.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    plan = plan_for(header, schema)
+
+    dtypes = {col: "float64" if _is_integer(dtype) else dtype
+              for col, dtype in plan.items() if dtype != DATETIME}
+    parse_dates = [col for col, dtype in plan.items() if dtype == DATETIME]
+
+    df = pd.read_csv(path, dtype=dtypes, parse_dates=parse_dates, **kwargs)
+    for column, dtype in plan.items():
+        if _is_integer(dtype):
+            df[column] = _convert(df[column], dtype)
+
+    if report:
+        size = frame_memory_bytes(df)
+        print_info(f"Memory: {size / 2**20:,.2f} MiB ({size / max(len(df), 1):,.0f} bytes/row)")
+    return df
+
+
+def print_memory_report(before: int, after: int, rows: int):
+    saved = 1 - after / before if before else 0.0
+    print_info(f"Memory: {before / 2**20:,.2f} MiB -> {after / 2**20:,.2f} MiB "
+               f"({saved:.0%} smaller, {after / max(rows, 1):,.0f} bytes/row)")
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Report the memory saving of the dtype plan for one or more CSV files"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show memory savings of the dtype plan")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--schema", choices=sorted(DTYPE_PLANS))
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        print(f"\n{path}")
+        # The default object frame is measured chunk by chunk, never held whole
+        before = sum(frame_memory_bytes(chunk) for chunk in pd.read_csv(path, chunksize=REPORT_CHUNK_ROWS))
+        df = read_trip_csv(path, args.schema)
+        print_memory_report(before, frame_memory_bytes(df), len(df))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
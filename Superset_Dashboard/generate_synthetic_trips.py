@@ -0,0 +1,416 @@
+"""
+Synthetic NYC Taxi Trip Data Generator
+Generates realistic yellow (modern and 2009 schemas) and green trip records
+at any scale from a fixed seed, so the Spark job, the pipeline and the
+loaders can be benchmarked offline on reproducible inputs
+
+Output files use the TLC naming scheme ({taxi_type}_tripdata_{YEAR}-{month})
+so they can be dropped straight into the pipeline's raw directory. The 2009
+schema uses the lower-case column names of sampledata/nyc_yellowtrip.csv.
+
+Usage:
+    python generate_synthetic_trips.py --taxi-type yellow --rows 10000000 \\
+        --year 2024 --month 01 --format parquet --output ~/nyc_taxi_data/raw
+
+Requirements: pip install numpy pandas pyarrow
+"""
+
+import argparse
+import calendar
+import os
+import sys
+import time
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# Distribution Parameters
+# ============================================
+
+NUM_LOCATIONS = 265
+
+# Relative pickup volume by hour of day (0-23): overnight trough, morning
+# ramp, evening peak around 18-19h
+HOURLY_WEIGHTS = np.array([
+    3.0, 2.2, 1.6, 1.1, 0.9, 1.0, 2.0, 3.6, 4.6, 4.7, 4.5, 4.6,
+    4.8, 4.8, 5.0, 5.1, 5.0, 5.6, 6.3, 6.4, 5.8, 5.5, 5.2, 4.2
+])
+
+# Relative volume by weekday (Monday=0 ... Sunday=6)
+WEEKDAY_WEIGHTS = np.array([0.92, 0.98, 1.03, 1.07, 1.10, 1.04, 0.86])
+
+# Average speed in mph by hour of day (congestion at midday/evening)
+HOURLY_SPEED_MPH = np.array([
+    17.0, 18.0, 19.0, 20.0, 20.0, 19.0, 15.0, 12.0, 10.5, 10.5, 10.5, 10.0,
+    10.0, 10.0, 10.0, 10.0, 10.5, 11.0, 11.5, 12.5, 13.5, 14.5, 15.5, 16.0
+])
+
+# Busiest pickup zones first: Midtown, Upper East/West Side, airports
+YELLOW_HOT_ZONES = [237, 161, 236, 162, 132, 230, 186, 142, 170, 163,
+                    239, 48, 138, 234, 68, 141, 79, 107, 140, 249]
+
+# Green (boro) taxis concentrate in upper Manhattan and outer boroughs
+GREEN_HOT_ZONES = [74, 75, 41, 166, 82, 7, 95, 42, 97, 129,
+                   65, 244, 116, 152, 181, 260, 25, 33, 255, 226]
+
+AIRPORT_ZONES = [1, 132, 138]
+
+# Payment type codes (modern schema) and their shares
+PAYMENT_CODES = np.array([1, 2, 3, 4])
+PAYMENT_SHARES = np.array([0.72, 0.25, 0.02, 0.01])
+
+# 2009 schema used free-text payment types, cash dominated
+PAYMENT_2009 = np.array(["CASH", "Credit", "No Charge", "Dispute"])
+PAYMENT_2009_SHARES = np.array([0.68, 0.30, 0.015, 0.005])
+
+VENDORS_2009 = np.array(["VTS", "CMT", "DDS"])
+VENDORS_2009_SHARES = np.array([0.48, 0.45, 0.07])
+
+# Pickup coordinate clusters for the 2009 schema: (lat, lon, std_deg, weight)
+COORD_CLUSTERS = np.array([
+    (40.7549, -73.9840, 0.012, 0.40),  # Midtown
+    (40.7265, -73.9950, 0.012, 0.20),  # Downtown / Village
+    (40.7736, -73.9566, 0.010, 0.15),  # Upper East Side
+    (40.7870, -73.9754, 0.010, 0.10),  # Upper West Side
+    (40.6413, -73.7781, 0.004, 0.05),  # JFK
+    (40.7769, -73.8740, 0.003, 0.04),  # LaGuardia
+    (40.6900, -73.9500, 0.025, 0.06),  # Brooklyn
+])
+
+SCHEMAS = ("yellow", "yellow_2009", "green")
+
+
+# ============================================
+# Helper Functions
+# ============================================
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}")
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+def zone_weights(hot_zones, alpha: float = 1.1) -> np.ndarray:
+    """
+    Build a Zipf-like pickup distribution over LocationIDs 1..265
+
+    The hot zones take the top ranks in order; all remaining zones follow in a
+    fixed shuffled order so that the tail is the same from run to run.
+
+    Returns:
+        Array of probabilities indexed by LocationID - 1
+    """
+    rest = [loc for loc in range(1, NUM_LOCATIONS + 1) if loc not in hot_zones]
+    rest = list(np.random.default_rng(265).permutation(rest))
+    ranking = list(hot_zones) + rest
+
+    weights = np.zeros(NUM_LOCATIONS)
+    weights[np.array(ranking) - 1] = 1.0 / np.arange(1, NUM_LOCATIONS + 1) ** alpha
+    return weights / weights.sum()
+
+
+def month_day_weights(year: int, month: int) -> np.ndarray:
+    """Probability of each day of the month, following WEEKDAY_WEIGHTS"""
+    first_weekday, num_days = calendar.monthrange(year, month)
+    weekdays = (first_weekday + np.arange(num_days)) % 7
+    weights = WEEKDAY_WEIGHTS[weekdays]
+    return weights / weights.sum()
+
+
+# ============================================
+# Vectorized Generation
+# ============================================
+
+def _generate_core(rng: np.random.Generator, n: int, year: int, month: int,
+                   hot_zones) -> Dict[str, np.ndarray]:
+    """
+    Generate the schema-independent trip attributes for n trips
+
+    Returns:
+        Dictionary of numpy arrays (timestamps, locations, distance, fares, ...)
+    """
+    day_probs = month_day_weights(year, month)
+    hour_probs = HOURLY_WEIGHTS / HOURLY_WEIGHTS.sum()
+
+    day = rng.choice(len(day_probs), size=n, p=day_probs)
+    hour = rng.choice(24, size=n, p=hour_probs)
+    seconds = rng.integers(0, 3600, size=n)
+
+    month_start = np.datetime64(f"{year:04d}-{month:02d}-01T00:00:00", "s")
+    pickup = (month_start
+              + day.astype("timedelta64[D]")
+              + hour.astype("timedelta64[h]")
+              + seconds.astype("timedelta64[s]"))
+
+    pu_location = rng.choice(NUM_LOCATIONS, size=n, p=zone_weights(hot_zones)) + 1
+    # Most trips stay near the pickup zone; a share goes to an unrelated zone
+    local = rng.random(n) < 0.6
+    do_location = np.where(
+        local,
+        np.clip(pu_location + rng.integers(-8, 9, size=n), 1, NUM_LOCATIONS - 2),
+        rng.integers(1, NUM_LOCATIONS - 1, size=n)
+    )
+
+    is_airport = np.isin(pu_location, AIRPORT_ZONES) | np.isin(do_location, AIRPORT_ZONES)
+
+    # Distance: log-normal around ~1.8 miles, airport trips much longer
+    trip_distance = rng.lognormal(mean=0.6, sigma=0.75, size=n)
+    trip_distance = np.where(is_airport, rng.normal(16.0, 3.5, size=n), trip_distance)
+    trip_distance = np.round(np.clip(trip_distance, 0.1, 60.0), 2)
+
+    # Duration follows distance and the hour's congestion level
+    speed = HOURLY_SPEED_MPH[hour] * rng.lognormal(0.0, 0.25, size=n)
+    duration_s = (trip_distance / speed * 3600 + rng.integers(60, 240, size=n)).astype(np.int64)
+    dropoff = pickup + duration_s.astype("timedelta64[s]")
+
+    # Metered fare: flag drop + per-mile + per-minute (slow traffic), with noise
+    fare_amount = 3.0 + 2.5 * trip_distance + 0.35 * (duration_s / 60.0)
+    fare_amount = np.round(fare_amount * rng.normal(1.0, 0.03, size=n) * 2) / 2
+
+    passenger_count = rng.choice(
+        np.arange(1, 7), size=n, p=[0.71, 0.15, 0.05, 0.03, 0.04, 0.02]
+    )
+    extra = np.where((hour >= 20) | (hour < 6), 0.5, 0.0) + np.where(
+        (hour >= 16) & (hour < 20), 1.0, 0.0
+    )
+    tolls_amount = np.where(is_airport & (rng.random(n) < 0.55), 6.55, 0.0)
+
+    return {
+        "pickup": pickup,
+        "dropoff": dropoff,
+        "pu_location": pu_location,
+        "do_location": do_location,
+        "passenger_count": passenger_count,
+        "trip_distance": trip_distance,
+        "fare_amount": fare_amount,
+        "extra": extra,
+        "tolls_amount": tolls_amount,
+    }
+
+
+def _tips(rng: np.random.Generator, fare_amount: np.ndarray, is_card: np.ndarray) -> np.ndarray:
+    """Tips are recorded only for card payments, typically 15-25% of fare"""
+    tip_pct = np.clip(rng.normal(0.19, 0.06, size=len(fare_amount)), 0.0, 0.5)
+    return np.round(np.where(is_card, fare_amount * tip_pct, 0.0), 2)
+
+
+def generate_chunk(rng: np.random.Generator, n: int, taxi_type: str,
+                   year: int, month: int) -> pd.DataFrame:
+    """
+    Generate n synthetic trips in the given TLC schema
+
+    Args:
+        rng: Numpy random generator (determines the output)
+        n: Number of rows
+        taxi_type: 'yellow', 'yellow_2009' or 'green'
+        year: Pickup year
+        month: Pickup month (1-12)
+
+    Returns:
+        DataFrame with the column names and order of the real TLC files
+    """
+    hot_zones = GREEN_HOT_ZONES if taxi_type == "green" else YELLOW_HOT_ZONES
+    core = _generate_core(rng, n, year, month, hot_zones)
+    fare = core["fare_amount"]
+    mta_tax = np.full(n, 0.5)
+
+    if taxi_type == "yellow_2009":
+        payment = rng.choice(PAYMENT_2009, size=n, p=PAYMENT_2009_SHARES)
+        tip = _tips(rng, fare, payment == "Credit")
+        surcharge = core["extra"]
+        total = np.round(fare + surcharge + mta_tax + tip + core["tolls_amount"], 2)
+
+        cluster = rng.choice(len(COORD_CLUSTERS), size=n, p=COORD_CLUSTERS[:, 3])
+        std = COORD_CLUSTERS[cluster, 2]
+        start_lat = COORD_CLUSTERS[cluster, 0] + rng.normal(0, 1, size=n) * std
+        start_lon = COORD_CLUSTERS[cluster, 1] + rng.normal(0, 1, size=n) * std
+        # Drop-off lies roughly trip_distance miles away (1 deg lat ~ 69 mi)
+        bearing = rng.uniform(0, 2 * np.pi, size=n)
+        reach = core["trip_distance"] / 69.0 * 0.8
+        end_lat = start_lat + reach * np.cos(bearing)
+        end_lon = start_lon + reach * np.sin(bearing) / np.cos(np.radians(40.75))
+
+        return pd.DataFrame({
+            "vendor_name": rng.choice(VENDORS_2009, size=n, p=VENDORS_2009_SHARES),
+            "trip_pickup_datetime": core["pickup"],
+            "trip_dropoff_datetime": core["dropoff"],
+            "passenger_count": core["passenger_count"],
+            "trip_distance": core["trip_distance"],
+            "start_lon": np.round(start_lon, 6),
+            "start_lat": np.round(start_lat, 6),
+            "rate_code": np.full(n, np.nan),
+            "store_and_forward": np.full(n, np.nan),
+            "end_lon": np.round(end_lon, 6),
+            "end_lat": np.round(end_lat, 6),
+            "payment_type": payment,
+            "fare_amt": fare,
+            "surcharge": surcharge,
+            "mta_tax": mta_tax,
+            "tip_amt": tip,
+            "tolls_amt": core["tolls_amount"],
+            "total_amt": total,
+        })
+
+    payment = rng.choice(PAYMENT_CODES, size=n, p=PAYMENT_SHARES)
+    tip = _tips(rng, fare, payment == 1)
+    improvement_surcharge = np.full(n, 1.0)
+    congestion_surcharge = np.where(core["pu_location"] < 264, 2.5, 0.0)
+    ratecode = np.where(np.isin(core["pu_location"], AIRPORT_ZONES), 2, 1)
+    store_and_fwd = np.where(rng.random(n) < 0.005, "Y", "N")
+    total = np.round(fare + core["extra"] + mta_tax + tip + core["tolls_amount"]
+                     + improvement_surcharge + congestion_surcharge, 2)
+
+    if taxi_type == "yellow":
+        airport_fee = np.where(np.isin(core["pu_location"], [132, 138]), 1.75, 0.0)
+        return pd.DataFrame({
+            "VendorID": rng.choice([1, 2], size=n, p=[0.27, 0.73]),
+            "tpep_pickup_datetime": core["pickup"],
+            "tpep_dropoff_datetime": core["dropoff"],
+            "passenger_count": core["passenger_count"].astype(np.float64),
+            "trip_distance": core["trip_distance"],
+            "RatecodeID": ratecode.astype(np.float64),
+            "store_and_fwd_flag": store_and_fwd,
+            "PULocationID": core["pu_location"],
+            "DOLocationID": core["do_location"],
+            "payment_type": payment,
+            "fare_amount": fare,
+            "extra": core["extra"],
+            "mta_tax": mta_tax,
+            "tip_amount": tip,
+            "tolls_amount": core["tolls_amount"],
+            "improvement_surcharge": improvement_surcharge,
+            "total_amount": np.round(total + airport_fee, 2),
+            "congestion_surcharge": congestion_surcharge,
+            "airport_fee": airport_fee,
+        })
+
+    return pd.DataFrame({
+        "VendorID": rng.choice([1, 2], size=n, p=[0.15, 0.85]),
+        "lpep_pickup_datetime": core["pickup"],
+        "lpep_dropoff_datetime": core["dropoff"],
+        "store_and_fwd_flag": store_and_fwd,
+        "RatecodeID": ratecode.astype(np.float64),
+        "PULocationID": core["pu_location"],
+        "DOLocationID": core["do_location"],
+        "passenger_count": core["passenger_count"].astype(np.float64),
+        "trip_distance": core["trip_distance"],
+        "fare_amount": fare,
+        "extra": core["extra"],
+        "mta_tax": mta_tax,
+        "tip_amount": tip,
+        "tolls_amount": core["tolls_amount"],
+        "ehail_fee": np.full(n, np.nan),
+        "improvement_surcharge": improvement_surcharge,
+        "total_amount": total,
+        "payment_type": payment.astype(np.float64),
+        "trip_type": np.where(rng.random(n) < 0.97, 1.0, 2.0),
+        "congestion_surcharge": congestion_surcharge,
+    })
+
+
+def generate_trips(rows: int, taxi_type: str, year: int, month: int,
+                   seed: int = 42, chunk_size: int = 5_000_000) -> Iterator[pd.DataFrame]:
+    """
+    Yield synthetic trips in chunks of at most chunk_size rows
+
+    Each chunk gets its own child seed, so the output for a given
+    (rows, seed, chunk_size) is identical on every run and chunks could be
+    generated in parallel.
+    """
+    if taxi_type not in SCHEMAS:
+        raise ValueError(f"Unknown taxi type '{taxi_type}', expected one of {SCHEMAS}")
+
+    num_chunks = max(1, -(-rows // chunk_size))
+    child_seeds = np.random.SeedSequence(seed).spawn(num_chunks)
+
+    remaining = rows
+    for child in child_seeds:
+        n = min(chunk_size, remaining)
+        remaining -= n
+        yield generate_chunk(np.random.default_rng(child), n, taxi_type, year, month)
+
+
+def output_file_name(taxi_type: str, year: int, month: int, fmt: str) -> str:
+    """TLC-style file name, e.g. yellow_tripdata_2024-01.parquet"""
+    prefix = "yellow" if taxi_type == "yellow_2009" else taxi_type
+    return f"{prefix}_tripdata_{year:04d}-{month:02d}.{fmt}"
+
+
+def write_trips(output_path: str, rows: int, taxi_type: str, year: int, month: int,
+                fmt: str = "parquet", seed: int = 42,
+                chunk_size: int = 5_000_000) -> int:
+    """
+    Generate trips and stream them to a CSV or Parquet file chunk by chunk
+
+    Memory use is bounded by chunk_size regardless of the total row count.
+    For Parquet, each chunk becomes one row group.
+
+    Returns:
+        Number of bytes written
+    """
+    writer = None
+    try:
+        for i, chunk in enumerate(generate_trips(rows, taxi_type, year, month, seed, chunk_size)):
+            if fmt == "csv":
+                chunk.to_csv(output_path, mode="w" if i == 0 else "a",
+                             header=(i == 0), index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema, compression="snappy")
+                writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return os.path.getsize(output_path)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic NYC taxi trip files")
+    parser.add_argument("--taxi-type", choices=SCHEMAS, default="yellow")
+    parser.add_argument("--rows", type=int, default=1_000_000,
+                        help="Number of trips to generate (default: 1,000,000)")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--month", type=int, nargs="+", default=[1],
+                        help="One or more months (1-12); one file per month")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=5_000_000)
+    parser.add_argument("--output", default=".", help="Output directory")
+    args = parser.parse_args(argv)
+
+    print_header("NYC Taxi Synthetic Data Generator")
+    os.makedirs(args.output, exist_ok=True)
+
+    for month in args.month:
+        file_name = output_file_name(args.taxi_type, args.year, month, args.format)
+        output_path = os.path.join(args.output, file_name)
+        print_info(f"Generating {args.rows:,} {args.taxi_type} trips -> {output_path}")
+
+        start = time.perf_counter()
+        # Offset the seed per month so months differ but stay reproducible
+        size = write_trips(output_path, args.rows, args.taxi_type, args.year, month,
+                           fmt=args.format, seed=args.seed + month,
+                           chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+
+        print_success(f"Wrote {file_name}: {size / 1e6:,.1f} MB in {elapsed:.1f}s "
+                      f"({args.rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
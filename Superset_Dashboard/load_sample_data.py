@@ -1,22 +1,51 @@
 """
 Load NYC Taxi Sample Data into Trino and Create Aggregated View
 This script creates tables from the sample CSV files
+
+Runs against Trino by default, or against an embedded DuckDB database for a
+fast local run without a server (see loader_backends.py):
+    python load_sample_data.py --backend duckdb
 """
 
+import argparse
+import os
 import pandas as pd
-from sqlalchemy import create_engine, text
 import sys
 
-# Configuration
-TRINO_HOST = 'localhost'
-TRINO_PORT = 8080
-TRINO_USER = 'admin'
-TRINO_CATALOG = 'hive'
-TRINO_SCHEMA = 'nyc_taxi'
+from dtype_optimizer import read_trip_csv
+from loader_backends import add_backend_arguments, get_backend
+from pipeline_metrics import PipelineMetrics
+from taxi_zones import ZONE_LOOKUP_URL, ZoneDimension
+from trip_features import add_trip_features
 
 # Sample data directory
 SAMPLE_DIR = 'sampledata/'
 
+# Full zone lookup (265 zones); downloaded from TLC if not present locally
+ZONE_LOOKUP_CSV = f'{SAMPLE_DIR}taxi+_zone_lookup.csv'
+
+# Zones seen in the sample data, used only when the full lookup is unavailable
+SAMPLE_ZONES = {
+    'LocationID': [168, 78, 95, 130, 260, 82, 106, 134, 255, 66, 254, 60, 159, 42, 91, 216, 118, 198],
+    'Borough': ['Queens', 'Manhattan', 'Queens', 'Queens', 'Queens', 'Manhattan', 'Manhattan', 
+               'Queens', 'Queens', 'Manhattan', 'Queens', 'Manhattan', 'Queens', 'Manhattan', 
+               'Queens', 'Manhattan', 'Manhattan', 'Queens'],
+    'Zone': ['Steinway', 'East Harlem South', 'Woodhaven', 'Jamaica', 'Far Rockaway', 
+            'East Village', 'Gramercy', 'Jamaica Estates', 'Forest Park', 'East Chelsea',
+            'Forest Hills', 'Midtown East', 'Ridgewood', 'Central Park', 'Elmhurst',
+            'West Village', 'Harlem', 'Sunnyside'],
+    'service_zone': ['Boro Zone', 'Boro Zone', 'Boro Zone', 'Boro Zone', 'Boro Zone',
+                    'Yellow Zone', 'Yellow Zone', 'Boro Zone', 'Boro Zone', 'Yellow Zone',
+                    'Boro Zone', 'Yellow Zone', 'Boro Zone', 'Yellow Zone', 'Boro Zone',
+                    'Yellow Zone', 'Boro Zone', 'Boro Zone'],
+    'latitude': [40.7740, 40.7957, 40.6892, 40.6902, 40.5990, 40.7264, 40.7368,
+                40.7197, 40.7016, 40.7465, 40.7183, 40.7549, 40.7021, 40.7829,
+                40.7361, 40.7357, 40.8116, 40.7433],
+    'longitude': [-73.9030, -73.9389, -73.8569, -73.8063, -73.7565, -73.9818, -73.9830,
+                 -73.7874, -73.8563, -73.9972, -73.8448, -73.9709, -73.9053, -73.9654,
+                 -73.8820, -74.0023, -73.9465, -73.9196]
+}
+
 def print_header(text):
     print(f"\n{'='*60}")
     print(f"  {text}")
@@ -28,22 +57,43 @@ def print_success(text):
 def print_error(text):
     print(f"✗ {text}")
 
-def main():
+def load_zone_dimension():
+    """Full zone dimension from the lookup CSV (local, then TLC), else the sample zones"""
+    for source in (ZONE_LOOKUP_CSV, ZONE_LOOKUP_URL):
+        try:
+            zones = ZoneDimension.from_csv(source)
+            print_success(f"Loaded {len(zones)} taxi zones from {source}")
+            return zones
+        except Exception:
+            continue
+    print_error("Zone lookup unavailable, using the sample zones only")
+    return ZoneDimension(pd.DataFrame(SAMPLE_ZONES))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the NYC Taxi sample data")
+    add_backend_arguments(parser)
+    args = parser.parse_args(argv)
+    
     print_header("NYC Taxi Sample Data Loader")
     
-    # Create SQLAlchemy engine
-    connection_string = f"trino://{TRINO_USER}@{TRINO_HOST}:{TRINO_PORT}/{TRINO_CATALOG}/{TRINO_SCHEMA}"
+    metrics = PipelineMetrics.from_env("load_sample_data")
+    zones = load_zone_dimension()
     
     try:
-        print(f"\nConnecting to Trino: {connection_string}")
-        engine = create_engine(connection_string)
-        conn = engine.connect()
-        print_success("Connected to Trino")
+        backend = get_backend(args.backend, args.duckdb_path, source="load_sample_data")
+    except ValueError as e:
+        print_error(str(e))
+        sys.exit(1)
+    
+    try:
+        print(f"\nConnecting to {backend.name}: {backend.describe()}")
+        backend.connect()
+        print_success(f"Connected to {backend.name}")
     except Exception as e:
         print_error(f"Failed to connect: {e}")
         print("\nMake sure:")
-        print("1. Trino is running: trino --server localhost:8080")
-        print("2. Install trino connector: pip install trino sqlalchemy-trino")
+        for i, hint in enumerate(backend.troubleshooting(), 1):
+            print(f"{i}. {hint}")
         sys.exit(1)
     
     # ============================================
@@ -53,7 +103,12 @@ def main():
     print_header("STEP 1: Loading Green Trip Data")
     
     try:
-        green_df = pd.read_csv(f'{SAMPLE_DIR}nyc_greentrip.csv')
+        with metrics.stage("read_csv", taxi_type="green") as stage:
+            green_df = read_trip_csv(f'{SAMPLE_DIR}nyc_greentrip.csv', report=True)
+            stage.bytes_read = os.path.getsize(f'{SAMPLE_DIR}nyc_greentrip.csv')
+            stage.rows_out = len(green_df)
+            # Denormalize pickup zone attributes once at load time
+            green_df = zones.attach(green_df, 'pulocationid', prefix='Pickup_')
         print_success(f"Loaded {len(green_df)} rows from nyc_greentrip.csv")
         
         # Show sample
@@ -64,9 +119,15 @@ def main():
         green_df['lpep_pickup_datetime'] = pd.to_datetime(green_df['lpep_pickup_datetime'])
         green_df['lpep_dropoff_datetime'] = pd.to_datetime(green_df['lpep_dropoff_datetime'])
         
-        # Write to Trino (this creates the table)
-        print("\nWriting to Trino table: nyc_greentrip...")
-        green_df.to_sql('nyc_greentrip', con=engine, if_exists='replace', index=False, method='multi')
+        # Derived features (duration, speed, tip %, hour, weekday, holiday) once at ingest
+        green_df = add_trip_features(green_df)
+        
+        # Write to the backend (this creates the table)
+        print(f"\nWriting to {backend.name} table: nyc_greentrip...")
+        with metrics.stage(f"{backend.name}_load", table="nyc_greentrip") as stage:
+            stage.rows_in = len(green_df)
+            backend.load_frame(green_df, 'nyc_greentrip')
+            stage.rows_out = len(green_df)
         print_success("Created table: nyc_greentrip")
         
     except FileNotFoundError:
@@ -83,11 +144,20 @@ def main():
     
     print_header("STEP 2: Creating Aggregated View")
     
-    aggregation_sql = """
+    # Grouped by the integer hour key precomputed at ingest; the timestamp and
+    # display string are derived from it on the aggregated rows only
+    aggregation_sql = f"""
     CREATE OR REPLACE VIEW nyc_taxi_aggregated AS
     SELECT 
-        DATE_FORMAT(lpep_pickup_datetime, '%Y-%m-%d %H') as Pickup_Time,
+        {backend.hour_string_sql('Pickup_Hour_Key')} as Pickup_Time,
+        {backend.hour_timestamp_sql('Pickup_Hour_Key')} as Pickup_Hour,
+        hourly.*
+    FROM (
+    SELECT 
+        pickup_hour_key as Pickup_Hour_Key,
         pulocationid as Pickup_Location,
+        Pickup_Borough,
+        Pickup_Zone,
         SUM(total_amount) as Total_Amount,
         AVG(total_amount) as AVG_Total_Amount,
         SUM(trip_distance) as Total_Trip_Distance,
@@ -106,12 +176,16 @@ def main():
         AND trip_distance > 0
         AND pulocationid IS NOT NULL
     GROUP BY 
-        DATE_FORMAT(lpep_pickup_datetime, '%Y-%m-%d %H'),
-        pulocationid
+        pickup_hour_key,
+        pulocationid,
+        Pickup_Borough,
+        Pickup_Zone
+    ) hourly
     """
     
     try:
-        conn.execute(text(aggregation_sql))
+        with metrics.stage("create_view", view="nyc_taxi_aggregated"):
+            backend.execute(aggregation_sql)
         print_success("Created view: nyc_taxi_aggregated")
     except Exception as e:
         print_error(f"Error creating view: {e}")
@@ -123,32 +197,13 @@ def main():
     
     print_header("STEP 3: Creating Taxi Zones Table")
     
-    # Create taxi zones dataframe with locations from sample
-    zones_data = {
-        'LocationID': [168, 78, 95, 130, 260, 82, 106, 134, 255, 66, 254, 60, 159, 42, 91, 216, 118, 198],
-        'Borough': ['Queens', 'Manhattan', 'Queens', 'Queens', 'Queens', 'Manhattan', 'Manhattan', 
-                   'Queens', 'Queens', 'Manhattan', 'Queens', 'Manhattan', 'Queens', 'Manhattan', 
-                   'Queens', 'Manhattan', 'Manhattan', 'Queens'],
-        'Zone': ['Steinway', 'East Harlem South', 'Woodhaven', 'Jamaica', 'Far Rockaway', 
-                'East Village', 'Gramercy', 'Jamaica Estates', 'Forest Park', 'East Chelsea',
-                'Forest Hills', 'Midtown East', 'Ridgewood', 'Central Park', 'Elmhurst',
-                'West Village', 'Harlem', 'Sunnyside'],
-        'service_zone': ['Boro Zone', 'Boro Zone', 'Boro Zone', 'Boro Zone', 'Boro Zone',
-                        'Yellow Zone', 'Yellow Zone', 'Boro Zone', 'Boro Zone', 'Yellow Zone',
-                        'Boro Zone', 'Yellow Zone', 'Boro Zone', 'Yellow Zone', 'Boro Zone',
-                        'Yellow Zone', 'Boro Zone', 'Boro Zone'],
-        'latitude': [40.7740, 40.7957, 40.6892, 40.6902, 40.5990, 40.7264, 40.7368,
-                    40.7197, 40.7016, 40.7465, 40.7183, 40.7549, 40.7021, 40.7829,
-                    40.7361, 40.7357, 40.8116, 40.7433],
-        'longitude': [-73.9030, -73.9389, -73.8569, -73.8063, -73.7565, -73.9818, -73.9830,
-                     -73.7874, -73.8563, -73.9972, -73.8448, -73.9709, -73.9053, -73.9654,
-                     -73.8820, -74.0023, -73.9465, -73.9196]
-    }
-    
-    zones_df = pd.DataFrame(zones_data)
+    zones_df = zones.to_frame()
     
     try:
-        zones_df.to_sql('taxi_zones', con=engine, if_exists='replace', index=False, method='multi')
+        with metrics.stage(f"{backend.name}_load", table="taxi_zones") as stage:
+            stage.rows_in = len(zones_df)
+            backend.load_frame(zones_df, 'taxi_zones')
+            stage.rows_out = len(zones_df)
         print_success(f"Created table: taxi_zones with {len(zones_df)} zones")
     except Exception as e:
         print_error(f"Error creating taxi zones: {e}")
@@ -161,13 +216,15 @@ def main():
     
     try:
         # Count aggregated rows
-        result = conn.execute(text("SELECT COUNT(*) FROM nyc_taxi_aggregated"))
-        agg_count = result.fetchone()[0]
+        with metrics.stage("verify", view="nyc_taxi_aggregated") as stage:
+            result = backend.execute("SELECT COUNT(*) FROM nyc_taxi_aggregated")
+            agg_count = result.fetchone()[0]
+            stage.rows_out = agg_count
         print_success(f"Aggregated view has {agg_count} rows")
         
         # Show sample
         print("\nSample aggregated data:")
-        result = conn.execute(text("""
+        result = backend.execute("""
             SELECT 
                 Pickup_Time,
                 Pickup_Location,
@@ -177,39 +234,40 @@ def main():
             FROM nyc_taxi_aggregated
             ORDER BY trips DESC
             LIMIT 5
-        """))
+        """)
         
         for row in result:
             print(f"  {row.Pickup_Time} | Location {row.Pickup_Location} | {row.trips} trips | ${row.revenue}")
         
-        # Test join
+        # Zone names are denormalized into the view - no join needed
         print("\nSample with zone names:")
-        result = conn.execute(text("""
+        result = backend.execute("""
             SELECT 
-                t.Pickup_Time,
-                z.Zone,
-                z.Borough,
-                t.number as trips,
-                CAST(t.Total_Amount AS DECIMAL(10,2)) as revenue
-            FROM nyc_taxi_aggregated t
-            LEFT JOIN taxi_zones z ON t.Pickup_Location = z.LocationID
-            ORDER BY t.number DESC
+                Pickup_Time,
+                Pickup_Zone,
+                Pickup_Borough,
+                number as trips,
+                CAST(Total_Amount AS DECIMAL(10,2)) as revenue
+            FROM nyc_taxi_aggregated
+            ORDER BY number DESC
             LIMIT 5
-        """))
+        """)
         
         for row in result:
-            print(f"  {row.Pickup_Time} | {row.Zone}, {row.Borough} | {row.trips} trips | ${row.revenue}")
+            print(f"  {row.Pickup_Time} | {row.Pickup_Zone}, {row.Pickup_Borough} | {row.trips} trips | ${row.revenue}")
         
     except Exception as e:
         print_error(f"Error during verification: {e}")
     
-    conn.close()
+    backend.close()
     
     # ============================================
     # SUCCESS!
     # ============================================
     
     print_header("SUCCESS!")
+    if backend.name != "trino":
+        print_success(f"Loaded into {backend.describe()} (the Superset steps below need Trino)")
     print("""
 ✓ Tables created:
   - nyc_greentrip (raw data)
@@ -237,12 +295,11 @@ if __name__ == "__main__":
     # Check dependencies
     try:
         import pandas
-        import sqlalchemy
-        from trino.dbapi import connect
     except ImportError as e:
         print_error(f"Missing dependency: {e}")
         print("\nInstall required packages:")
-        print("  pip install pandas sqlalchemy trino sqlalchemy-trino")
+        print("  pip install pandas sqlalchemy trino sqlalchemy-trino   # Trino backend")
+        print("  pip install pandas duckdb                               # DuckDB backend")
         sys.exit(1)
     
     main()
@@ -1,19 +1,30 @@
 """
 NYC Yellow Taxi Dashboard Setup Script
 Loads Yellow Trip (2009) data and creates dashboard views in Trino
+
+Runs against Trino by default, or against an embedded DuckDB database for a
+fast local run without a server (see loader_backends.py):
+    python load_yellow_trip_dashboard.py --backend duckdb
+With DuckDB, a converted sampledata/nyc_yellowtrip.parquet (convert_to_parquet.py,
+which already holds the derived features) is queried in place instead of
+loading the CSV.
 """
 
+import argparse
+import os
 import pandas as pd
-from sqlalchemy import create_engine, text
 import sys
 
+from dashboard_views import SUMMARY_TABLE, YELLOW_DASHBOARD_VIEWS, summary_statements, view_statements
+from dtype_optimizer import read_trip_csv
+from loader_backends import add_backend_arguments, get_backend
+from pipeline_metrics import PipelineMetrics
+from trip_features import add_trip_features
+
 # Configuration
-TRINO_HOST = 'localhost'
-TRINO_PORT = 8080
-TRINO_USER = 'admin'
-TRINO_CATALOG = 'hive'
-TRINO_SCHEMA = 'nyc_taxi'
 SAMPLE_DIR = 'sampledata/'
+YELLOW_CSV = f'{SAMPLE_DIR}nyc_yellowtrip.csv'
+YELLOW_PARQUET = f'{SAMPLE_DIR}nyc_yellowtrip.parquet'
 
 def print_header(text):
     print(f"\n{'='*70}")
@@ -29,23 +40,59 @@ def print_error(text):
 def print_info(text):
     print(f"ℹ {text}")
 
-def main():
+def load_yellow_csv(backend, metrics):
+    """Read the sample CSV, add the derived features and write it to the backend"""
+    with metrics.stage("read_csv", taxi_type="yellow") as stage:
+        yellow_df = read_trip_csv(YELLOW_CSV, report=True)
+        stage.bytes_read = os.path.getsize(YELLOW_CSV)
+        stage.rows_out = len(yellow_df)
+    print_success(f"Loaded {len(yellow_df)} rows from nyc_yellowtrip.csv")
+    
+    # Show sample
+    print("\nSample data (first 3 rows):")
+    print(yellow_df.head(3)[['trip_pickup_datetime', 'payment_type', 
+                               'total_amt', 'trip_distance']].to_string())
+    
+    # Convert datetime columns
+    yellow_df['trip_pickup_datetime'] = pd.to_datetime(yellow_df['trip_pickup_datetime'])
+    yellow_df['trip_dropoff_datetime'] = pd.to_datetime(yellow_df['trip_dropoff_datetime'])
+    
+    # Derived features (duration, speed, tip %, hour, weekday, holiday) once at
+    # ingest, so the views below read columns instead of re-deriving them
+    yellow_df = add_trip_features(yellow_df)
+    
+    print(f"\n📊 Writing to {backend.name} table: nyc_yellowtrip...")
+    with metrics.stage(f"{backend.name}_load", table="nyc_yellowtrip") as stage:
+        stage.rows_in = len(yellow_df)
+        backend.load_frame(yellow_df, 'nyc_yellowtrip', chunksize=1000)
+        stage.rows_out = len(yellow_df)
+    print_success("Created table: nyc_yellowtrip")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the Yellow Trip (2009) dashboard data")
+    add_backend_arguments(parser)
+    args = parser.parse_args(argv)
+    
     print_header("NYC Yellow Taxi Dashboard Setup (2009 Data)")
     
-    # Create SQLAlchemy engine
-    connection_string = f"trino://{TRINO_USER}@{TRINO_HOST}:{TRINO_PORT}/{TRINO_CATALOG}/{TRINO_SCHEMA}"
+    metrics = PipelineMetrics.from_env("load_yellow_trip_dashboard")
+    
+    try:
+        backend = get_backend(args.backend, args.duckdb_path, source="load_yellow_trip_dashboard")
+    except ValueError as e:
+        print_error(str(e))
+        sys.exit(1)
     
     try:
-        print(f"\n Connecting to Trino...")
-        print(f"   {connection_string}")
-        engine = create_engine(connection_string)
-        conn = engine.connect()
-        print_success("Connected to Trino")
+        print(f"\n Connecting to {backend.name}...")
+        print(f"   {backend.describe()}")
+        backend.connect()
+        print_success(f"Connected to {backend.name}")
     except Exception as e:
         print_error(f"Failed to connect: {e}")
         print("\nTroubleshooting:")
-        print("1. Ensure Trino is running")
-        print("2. Install: pip install trino sqlalchemy-trino")
+        for i, hint in enumerate(backend.troubleshooting(), 1):
+            print(f"{i}. {hint}")
         sys.exit(1)
     
     # ============================================
@@ -55,26 +102,17 @@ def main():
     print_header("STEP 1: Loading Yellow Trip Data")
     
     try:
-        yellow_df = pd.read_csv(f'{SAMPLE_DIR}nyc_yellowtrip.csv')
-        print_success(f"Loaded {len(yellow_df)} rows from nyc_yellowtrip.csv")
-        
-        # Show sample
-        print("\nSample data (first 3 rows):")
-        print(yellow_df.head(3)[['trip_pickup_datetime', 'payment_type', 
-                                   'total_amt', 'trip_distance']].to_string())
-        
-        # Convert datetime columns
-        yellow_df['trip_pickup_datetime'] = pd.to_datetime(yellow_df['trip_pickup_datetime'])
-        yellow_df['trip_dropoff_datetime'] = pd.to_datetime(yellow_df['trip_dropoff_datetime'])
-        
-        # Write to Trino
-        print("\n📊 Writing to Trino table: nyc_yellowtrip...")
-        yellow_df.to_sql('nyc_yellowtrip', con=engine, if_exists='replace', 
-                         index=False, method='multi', chunksize=1000)
-        print_success("Created table: nyc_yellowtrip")
+        if backend.reads_parquet and os.path.exists(YELLOW_PARQUET):
+            # Converted Parquet already carries the derived features; query it in place
+            with metrics.stage(f"{backend.name}_load", table="nyc_yellowtrip") as stage:
+                backend.load_parquet('nyc_yellowtrip', YELLOW_PARQUET)
+                stage.bytes_read = os.path.getsize(YELLOW_PARQUET)
+            print_success(f"Created table: nyc_yellowtrip (reading {YELLOW_PARQUET} in place)")
+        else:
+            load_yellow_csv(backend, metrics)
         
     except FileNotFoundError:
-        print_error(f"File not found: {SAMPLE_DIR}nyc_yellowtrip.csv")
+        print_error(f"File not found: {YELLOW_CSV}")
         print(f"Please ensure file exists in '{SAMPLE_DIR}' directory")
         sys.exit(1)
     except Exception as e:
@@ -87,10 +125,17 @@ def main():
     
     print_header("STEP 2: Creating Aggregated View")
     
-    aggregation_sql = """
+    # Grouped by the integer hour key precomputed at ingest; the timestamp and
+    # display string are derived from it on the aggregated rows only
+    aggregation_sql = f"""
     CREATE OR REPLACE VIEW nyc_taxi_aggregated AS
     SELECT 
-        DATE_FORMAT(trip_pickup_datetime, '%Y-%m-%d %H') as Pickup_Time,
+        {backend.hour_string_sql('Pickup_Hour_Key')} as Pickup_Time,
+        {backend.hour_timestamp_sql('Pickup_Hour_Key')} as Pickup_Hour,
+        hourly.*
+    FROM (
+    SELECT 
+        pickup_hour_key as Pickup_Hour_Key,
         NULL as Pickup_Location,
         SUM(total_amt) as Total_Amount,
         AVG(total_amt) as AVG_Total_Amount,
@@ -109,11 +154,13 @@ def main():
         AND total_amt > 0
         AND trip_distance > 0
     GROUP BY 
-        DATE_FORMAT(trip_pickup_datetime, '%Y-%m-%d %H')
+        pickup_hour_key
+    ) hourly
     """
     
     try:
-        conn.execute(text(aggregation_sql))
+        with metrics.stage("create_view", view="nyc_taxi_aggregated"):
+            backend.execute(aggregation_sql)
         print_success("Created view: nyc_taxi_aggregated")
         print_info("Note: Pickup_Location is NULL (Yellow Trip has coordinates, not LocationID)")
     except Exception as e:
@@ -126,73 +173,20 @@ def main():
     
     print_header("STEP 3: Creating Dashboard Views")
     
-    views = {
-        'hourly_metrics': """
-            CREATE OR REPLACE VIEW hourly_metrics AS
-            SELECT 
-                CAST(SUBSTR(DATE_FORMAT(trip_pickup_datetime, '%Y-%m-%d %H'), 12, 2) AS INTEGER) as hour_of_day,
-                COUNT(*) as total_trips,
-                AVG(total_amt) as avg_fare,
-                AVG(trip_distance) as avg_distance,
-                AVG(passenger_count) as avg_passengers,
-                SUM(total_amt) as total_revenue
-            FROM nyc_yellowtrip
-            WHERE trip_pickup_datetime IS NOT NULL AND total_amt > 0
-            GROUP BY hour_of_day
-            ORDER BY hour_of_day
-        """,
-        
-        'payment_analysis': """
-            CREATE OR REPLACE VIEW payment_analysis AS
-            SELECT 
-                payment_type,
-                COUNT(*) as trip_count,
-                AVG(total_amt) as avg_fare,
-                AVG(tip_amt) as avg_tip,
-                AVG(tip_amt / NULLIF(fare_amt, 0) * 100) as avg_tip_pct,
-                SUM(total_amt) as total_revenue
-            FROM nyc_yellowtrip
-            WHERE total_amt > 0
-            GROUP BY payment_type
-            ORDER BY trip_count DESC
-        """,
-        
-        'vendor_performance': """
-            CREATE OR REPLACE VIEW vendor_performance AS
-            SELECT 
-                vendor_name,
-                COUNT(*) as trip_count,
-                AVG(total_amt) as avg_fare,
-                AVG(trip_distance) as avg_distance,
-                AVG(tip_amt) as avg_tip,
-                SUM(total_amt) as total_revenue
-            FROM nyc_yellowtrip
-            GROUP BY vendor_name
-            ORDER BY trip_count DESC
-        """,
-        
-        'fare_distribution': """
-            CREATE OR REPLACE VIEW fare_distribution AS
-            SELECT 
-                CASE 
-                    WHEN total_amt < 5 THEN '$0-5'
-                    WHEN total_amt < 10 THEN '$5-10'
-                    WHEN total_amt < 15 THEN '$10-15'
-                    WHEN total_amt < 20 THEN '$15-20'
-                    WHEN total_amt < 30 THEN '$20-30'
-                    ELSE '$30+'
-                END as fare_bucket,
-                COUNT(*) as trip_count
-            FROM nyc_yellowtrip
-            WHERE total_amt > 0 AND total_amt < 100
-            GROUP BY fare_bucket
-            ORDER BY MIN(total_amt)
-        """
-    }
+    # All four dashboard datasets come from one GROUPING SETS scan of
+    # nyc_yellowtrip into dashboard_summary; each view is a filter over it
+    try:
+        with metrics.stage("create_summary", table=SUMMARY_TABLE):
+            for summary_sql in summary_statements(YELLOW_DASHBOARD_VIEWS, 'nyc_yellowtrip'):
+                backend.execute(summary_sql)
+        print_success(f"Created table: {SUMMARY_TABLE} (one scan for all dashboard views)")
+    except Exception as e:
+        print_error(f"Error creating {SUMMARY_TABLE}: {e}")
     
-    for view_name, view_sql in views.items():
+    for view_name, view_sql in view_statements(YELLOW_DASHBOARD_VIEWS).items():
         try:
-            conn.execute(text(view_sql))
+            with metrics.stage("create_view", view=view_name):
+                backend.execute(view_sql)
             print_success(f"Created view: {view_name}")
         except Exception as e:
             print_error(f"Error creating {view_name}: {e}")
@@ -214,8 +208,9 @@ def main():
     print("\n📊 Key Performance Indicators:")
     for kpi_name, kpi_sql in kpis.items():
         try:
-            result = conn.execute(text(kpi_sql))
-            value = result.fetchone()[0]
+            with metrics.stage("kpi_query", kpi=kpi_name):
+                result = backend.execute(kpi_sql)
+                value = result.fetchone()[0]
             print(f"   • {kpi_name:15s}: {value}")
         except Exception as e:
             print_error(f"Error calculating {kpi_name}: {e}")
@@ -228,7 +223,7 @@ def main():
     
     try:
         # Show aggregated data
-        result = conn.execute(text("""
+        result = backend.execute("""
             SELECT 
                 Pickup_Time,
                 number as trips,
@@ -238,7 +233,7 @@ def main():
             FROM nyc_taxi_aggregated
             ORDER BY trips DESC
             LIMIT 5
-        """))
+        """)
         
         print("\n📈 Top 5 Hours by Trip Count:")
         print("   Time            | Trips | Revenue  | Avg Fare | Type")
@@ -247,14 +242,14 @@ def main():
             print(f"   {row[0]} | {row[1]:5d} | ${row[2]:7.2f} | ${row[3]:6.2f} | {row[4]}")
         
         # Show payment analysis
-        result = conn.execute(text("""
+        result = backend.execute("""
             SELECT 
                 payment_type,
                 trip_count,
                 CAST(avg_fare AS DECIMAL(8,2)) as avg_fare,
                 CAST(avg_tip_pct AS DECIMAL(5,2)) as avg_tip_pct
             FROM payment_analysis
-        """))
+        """)
         
         print("\n💳 Payment Method Analysis:")
         print("   Method    | Trips | Avg Fare | Avg Tip %")
@@ -265,18 +260,21 @@ def main():
     except Exception as e:
         print_error(f"Error running sample queries: {e}")
     
-    conn.close()
+    backend.close()
     
     # ============================================
     # SUCCESS!
     # ============================================
     
     print_header("✅ SUCCESS - Dashboard Ready!")
+    if backend.name != "trino":
+        print_success(f"Loaded into {backend.describe()} (the Superset steps below need Trino)")
     
     print("""
 📊 Tables & Views Created:
    • nyc_yellowtrip         (raw data table)
    • nyc_taxi_aggregated    (aggregated view - compatible with Green format)
+   • dashboard_summary      (one-scan summary behind the four views below)
    • hourly_metrics         (time patterns)
    • payment_analysis       (Cash vs Credit)
    • vendor_performance     (vendor comparison)
@@ -321,12 +319,11 @@ def main():
 if __name__ == "__main__":
     try:
         import pandas
-        import sqlalchemy
-        from trino.dbapi import connect
     except ImportError as e:
         print_error(f"Missing dependency: {e}")
         print("\nInstall required packages:")
-        print("  pip install pandas sqlalchemy trino sqlalchemy-trino")
+        print("  pip install pandas sqlalchemy trino sqlalchemy-trino   # Trino backend")
+        print("  pip install pandas duckdb                               # DuckDB backend")
         sys.exit(1)
     
     main()
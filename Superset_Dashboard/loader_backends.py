@@ -0,0 +1,274 @@
+"""
+Pluggable SQL Backends for the NYC Taxi Loaders
+load_sample_data.py and load_yellow_trip_dashboard.py create the same
+tables, views, KPIs and previews either on Trino (what Superset reads) or on
+an embedded, in-process DuckDB database. DuckDB needs no server, reads
+Parquet files in place and takes DataFrames without a row-by-row INSERT, so
+developers and CI get a local run of the full loader in well under a second
+on the sample data
+
+    NYC_TAXI_BACKEND=trino     Trino at localhost:8080 (default)
+    NYC_TAXI_BACKEND=duckdb    Embedded DuckDB; NYC_TAXI_DUCKDB names the
+                               database file (default: in memory)
+
+Both loaders also accept --backend / --duckdb-path. Backends expose one
+interface (execute, load_frame, load_parquet) and the dialect-specific hour
+key expressions of time_keys.py, so the view definitions are written once.
+
+    backend = get_backend("duckdb")
+    backend.connect()
+    backend.load_frame(df, "nyc_greentrip")
+    for row in backend.execute("SELECT COUNT(*) AS trips FROM nyc_greentrip"):
+        print(row.trips)
+
+Requirements: pip install sqlalchemy trino sqlalchemy-trino (Trino) or
+pip install duckdb (DuckDB)
+"""
+
+import os
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from typing import List, Optional
+
+from time_keys import (duckdb_hour_string_sql, duckdb_hour_timestamp_sql,
+                       trino_hour_string_sql, trino_hour_timestamp_sql)
+
+BACKEND_ENV = "NYC_TAXI_BACKEND"
+DUCKDB_PATH_ENV = "NYC_TAXI_DUCKDB"
+DEFAULT_BACKEND = "trino"
+
+# Trino defaults (the values the loaders always used)
+TRINO_HOST = 'localhost'
+TRINO_PORT = 8080
+TRINO_USER = 'admin'
+TRINO_CATALOG = 'hive'
+TRINO_SCHEMA = 'nyc_taxi'
+
+# Overrides of the Trino defaults (set from the shared config, pipeline_config.py)
+TRINO_ENV = {
+    "host": "NYC_TAXI_TRINO_HOST",
+    "port": "NYC_TAXI_TRINO_PORT",
+    "user": "NYC_TAXI_TRINO_USER",
+    "catalog": "NYC_TAXI_TRINO_CATALOG",
+    "schema": "NYC_TAXI_TRINO_SCHEMA",
+}
+
+
+class LoaderBackend(ABC):
+    """
+    Interface shared by the loader backends
+
+    load_parquet() and troubleshooting() have defaults (not supported / no
+    hints); every other method must be implemented.
+    """
+
+    name = "base"
+    # Whether load_parquet() can expose a Parquet file as a table without loading it
+    reads_parquet = False
+
+    @abstractmethod
+    def connect(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def describe(self) -> str:
+        """Connection target, for log messages"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def execute(self, sql: str):
+        """Run a statement; the result iterates rows with attribute access and has fetchone()"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_frame(self, df, table: str, chunksize: Optional[int] = None) -> None:
+        """Create (or replace) a table from a pandas DataFrame"""
+        raise NotImplementedError
+
+    def load_parquet(self, table: str, path: str) -> None:
+        """Expose a Parquet file as a table, reading it in place"""
+        raise NotImplementedError(f"{self.name} backend cannot read Parquet in place")
+
+    @abstractmethod
+    def hour_timestamp_sql(self, key_sql: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def hour_string_sql(self, key_sql: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def troubleshooting(self) -> List[str]:
+        """Hints printed when connect() fails"""
+        return []
+
+
+# ============================================
+# Trino
+# ============================================
+
+class TrinoBackend(LoaderBackend):
+    """Trino through SQLAlchemy; statements can be profiled (trino_profiler.py)"""
+
+    name = "trino"
+
+    def __init__(self, host: str = TRINO_HOST, port: int = TRINO_PORT, user: str = TRINO_USER,
+                 catalog: str = TRINO_CATALOG, schema: str = TRINO_SCHEMA,
+                 source: str = "nyc_taxi_loader"):
+        self.connection_string = f"trino://{user}@{host}:{port}/{catalog}/{schema}"
+        self.source = source
+        self.engine = None
+        self.conn = None
+
+    def connect(self) -> None:
+        from sqlalchemy import create_engine
+        from trino_profiler import profile_connection
+
+        self.engine = create_engine(self.connection_string)
+        self.conn = profile_connection(self.engine.connect(), self.source)
+
+    def describe(self) -> str:
+        return self.connection_string
+
+    def execute(self, sql: str):
+        from sqlalchemy import text
+
+        return self.conn.execute(text(sql))
+
+    def load_frame(self, df, table: str, chunksize: Optional[int] = None) -> None:
+        df.to_sql(table, con=self.engine, if_exists='replace', index=False,
+                  method='multi', chunksize=chunksize)
+
+    def hour_timestamp_sql(self, key_sql: str) -> str:
+        return trino_hour_timestamp_sql(key_sql)
+
+    def hour_string_sql(self, key_sql: str) -> str:
+        return trino_hour_string_sql(key_sql)
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+
+    def troubleshooting(self) -> List[str]:
+        return ["Trino is running: trino --server localhost:8080",
+                "Install trino connector: pip install trino sqlalchemy-trino",
+                f"Or run locally without Trino: {BACKEND_ENV}=duckdb (pip install duckdb)"]
+
+
+# ============================================
+# DuckDB
+# ============================================
+
+class _DuckDBResult:
+    """Rows of a DuckDB statement as named tuples, like a SQLAlchemy result"""
+
+    def __init__(self, cursor):
+        self.columns = [column[0] for column in cursor.description or []]
+        self._rows = []
+        if self.columns:
+            row_type = namedtuple("Row", self.columns, rename=True)
+            self._rows = [row_type(*row) for row in cursor.fetchall()]
+        self._position = 0
+
+    def __iter__(self):
+        while self._position < len(self._rows):
+            self._position += 1
+            yield self._rows[self._position - 1]
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+
+class DuckDBBackend(LoaderBackend):
+    """Embedded DuckDB; DataFrames are scanned directly and Parquet is read in place"""
+
+    name = "duckdb"
+    reads_parquet = True
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.conn = None
+
+    def connect(self) -> None:
+        import duckdb
+
+        self.conn = duckdb.connect(self.path)
+
+    def describe(self) -> str:
+        return f"duckdb:///{self.path}"
+
+    def execute(self, sql: str):
+        return _DuckDBResult(self.conn.execute(sql))
+
+    def load_frame(self, df, table: str, chunksize: Optional[int] = None) -> None:
+        # One columnar scan of the frame; chunksize only matters for INSERT-based backends
+        self.conn.register("__loader_frame", df)
+        try:
+            self.conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM __loader_frame")
+        finally:
+            self.conn.unregister("__loader_frame")
+
+    def load_parquet(self, table: str, path: str) -> None:
+        # A view, not a copy: queries scan the file with projection and row-group pruning
+        location = os.path.abspath(path).replace("'", "''")
+        self.conn.execute(f"CREATE OR REPLACE VIEW {table} AS "
+                          f"SELECT * FROM read_parquet('{location}')")
+
+    def hour_timestamp_sql(self, key_sql: str) -> str:
+        return duckdb_hour_timestamp_sql(key_sql)
+
+    def hour_string_sql(self, key_sql: str) -> str:
+        return duckdb_hour_string_sql(key_sql)
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+
+    def troubleshooting(self) -> List[str]:
+        return ["Install DuckDB: pip install duckdb",
+                f"Check that the database file is writable: {self.path}"]
+
+
+BACKENDS = {
+    "trino": TrinoBackend,
+    "duckdb": DuckDBBackend,
+}
+
+
+def get_backend(name: Optional[str] = None, duckdb_path: Optional[str] = None,
+                source: str = "nyc_taxi_loader") -> LoaderBackend:
+    """
+    Backend by name, defaulting to $NYC_TAXI_BACKEND, then Trino (with
+    the $NYC_TAXI_TRINO_* overrides of its connection defaults)
+
+    Raises:
+        ValueError: If the name is not a known backend
+    """
+    name = (name or os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}; expected one of {sorted(BACKENDS)}")
+    if name == "duckdb":
+        return DuckDBBackend(duckdb_path or os.environ.get(DUCKDB_PATH_ENV) or ":memory:")
+    settings = {key: os.environ[env] for key, env in TRINO_ENV.items() if os.environ.get(env)}
+    if "port" in settings:
+        settings["port"] = int(settings["port"])
+    return TrinoBackend(source=source, **settings)
+
+
+def add_backend_arguments(parser) -> None:
+    """--backend / --duckdb-path options shared by the loaders"""
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        help=f"SQL backend (default: ${BACKEND_ENV} or {DEFAULT_BACKEND})")
+    parser.add_argument("--duckdb-path",
+                        help=f"DuckDB database file (default: ${DUCKDB_PATH_ENV} or in memory)")
@@ -0,0 +1,172 @@
+"""
+NYC Taxi Pipeline Command Line
+One entry point for every pipeline stage, driven by the shared config
+(pipeline_config.py). Each subcommand imports its stage module only when it
+runs, so pyspark, pandas, geopy, sqlalchemy and requests are loaded by the
+stages that need them and --help or `config` start without any of them
+
+    nyc-taxi download                  download_trip_data.py
+    nyc-taxi convert                   convert_to_parquet.py
+    nyc-taxi catalog                   trip_file_catalog.py scan
+    nyc-taxi aggregate                 aggregate_trips.py (Spark)
+    nyc-taxi geocode [--method geocode]  zone_coordinates.py
+    nyc-taxi load sample|yellow        load_sample_data.py / load_yellow_trip_dashboard.py
+    nyc-taxi provision                 superset_config_helper.py (dashboard via the Superset API)
+    nyc-taxi bench                     benchmark_aggregation.py
+    nyc-taxi config [--shell]          print the resolved settings
+
+Arguments after the subcommand are passed to the stage and override the
+defaults taken from the config (e.g. `nyc-taxi download --year 2019`);
+`nyc-taxi <command> --help` shows the stage's own options.
+
+Installed with `pip install -e .` (extras: spark, arrow, load, duckdb, geo,
+superset, bench), or run as `python nyc_taxi_cli.py`.
+
+Requirements: none (each stage lists its own)
+"""
+
+import argparse
+import importlib
+import sys
+from typing import Callable, Dict, List, Optional
+
+from pipeline_config import PipelineConfig
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def _run_module(module: str, argv: List[str]) -> int:
+    """Import a stage module and run its main(argv)"""
+    return importlib.import_module(module).main(argv) or 0
+
+
+# ============================================
+# Subcommands: config -> default stage arguments
+# ============================================
+
+def _download(config: PipelineConfig, args: List[str]) -> int:
+    return _run_module("download_trip_data", [
+        "--taxi-types", *config.taxi_types, "--year", config.year, "--months", *config.months,
+        "--output", config.raw_dir, "--workers", config.get("pipeline", "download_workers"), *args])
+
+
+def _convert(config: PipelineConfig, args: List[str]) -> int:
+    has_inputs = any(arg.endswith(".csv") or "*" in arg for arg in args)
+    inputs = [] if has_inputs else [f"{config.raw_dir}/*_tripdata_*.csv"]
+    return _run_module("convert_to_parquet", [*inputs, *args])
+
+
+def _catalog(config: PipelineConfig, args: List[str]) -> int:
+    return _run_module("trip_file_catalog", args or ["scan", config.raw_dir])
+
+
+def _aggregate(config: PipelineConfig, args: List[str]) -> int:
+    # Explicit <raw_dir> <output_dir> <year> <taxi_type>... replace the config
+    return _run_module("aggregate_trips", args or [
+        config.raw_dir, config.processed_dir, config.year, *config.taxi_types])
+
+
+def _geocode(config: PipelineConfig, args: List[str]) -> int:
+    return _run_module("zone_coordinates", ["--zones-dir", config.zones_dir, *args])
+
+
+def _load(config: PipelineConfig, args: List[str]) -> int:
+    modules = {"sample": "load_sample_data", "yellow": "load_yellow_trip_dashboard"}
+    if not args or args[0] not in modules:
+        print_error(f"Usage: nyc-taxi load {{{'|'.join(modules)}}} [options]")
+        return 2
+    return _run_module(modules[args[0]], args[1:])
+
+
+def _provision(config: PipelineConfig, args: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="nyc-taxi provision",
+                                     description="Create the Trino database, dataset, charts and dashboard in Superset")
+    parser.add_argument("--superset-url", default=config.get("superset", "url"))
+    parser.add_argument("--username", default=config.get("superset", "username"))
+    parser.add_argument("--password", default=config.get("superset", "password"))
+    parser.add_argument("--table", default="nyc_taxi_aggregated")
+    options = parser.parse_args(args)
+
+    from superset_config_helper import SupersetHelper, setup_nyc_taxi_dashboard
+
+    trino = {key: config.get("trino", key) for key in ("host", "port", "user", "catalog", "schema")}
+    trino_uri = f"trino://{trino['user']}@{trino['host']}:{trino['port']}/{trino['catalog']}"
+    try:
+        superset = SupersetHelper(options.superset_url, options.username, options.password)
+        result = setup_nyc_taxi_dashboard(superset, trino_uri, schema_name=trino["schema"],
+                                          table_name=options.table)
+    except Exception as e:
+        print_error(f"Error during setup: {e}")
+        return 1
+    return 0 if result else 1
+
+
+def _bench(config: PipelineConfig, args: List[str]) -> int:
+    return _run_module("benchmark_aggregation", args)
+
+
+def _config(config: PipelineConfig, args: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="nyc-taxi config", description="Print the resolved settings")
+    parser.add_argument("--shell", action="store_true",
+                        help="Bash assignments for quick_start_data_pipeline.sh (empty without a config file)")
+    options = parser.parse_args(args)
+
+    if options.shell:
+        if config.path:
+            print(config.shell_assignments())
+        return 0
+
+    print(f"# {config.path or 'no config file found; defaults'}")
+    for section in config.parser.sections():
+        print(f"[{section}]")
+        for key, value in config.parser.items(section):
+            print(f"{key} = {'***' if key == 'password' else value}")
+        print()
+    return 0
+
+
+COMMANDS: Dict[str, tuple] = {
+    "download": (_download, "Download TLC trip files (parallel, resumable, verified)"),
+    "convert": (_convert, "Convert trip CSV files to sorted, typed Parquet"),
+    "catalog": (_catalog, "Scan trip files into the file catalog"),
+    "aggregate": (_aggregate, "Aggregate a year of trips into hourly aggregates (Spark)"),
+    "geocode": (_geocode, "Build taxi zone coordinates (shapefile centroids or Nominatim)"),
+    "load": (_load, "Load sample or yellow dashboard data into Trino/DuckDB"),
+    "provision": (_provision, "Create the Superset database, dataset, charts and dashboard"),
+    "bench": (_bench, "Benchmark the aggregation engines"),
+    "config": (_config, "Print the resolved settings"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="nyc-taxi", description="NYC Taxi data pipeline")
+    parser.add_argument("--config", help="Config file (default: $NYC_TAXI_CONFIG, ./nyc_taxi.ini, "
+                                         "~/.config/nyc_taxi/nyc_taxi.ini)")
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        # Stage options (and --help) are left unparsed for the stage itself
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    args, stage_args = build_parser().parse_known_args(argv)
+    try:
+        config = PipelineConfig(args.config)
+    except FileNotFoundError as e:
+        print_error(str(e))
+        return 1
+    config.export_env()
+
+    handler: Callable[[PipelineConfig, List[str]], int] = COMMANDS[args.command][0]
+    try:
+        return handler(config, stage_args)
+    except ImportError as e:
+        print_error(f"{args.command} needs a missing dependency: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+Sparse Origin-Destination Matrices of NYC Taxi Trips
+The hourly aggregates key only on the pickup zone, so every flow question
+(JFK -> Midtown, where do Astoria trips go) meant re-scanning raw trips.
+This module aggregates trips into a sparse 265 x 265 pickup -> dropoff
+matrix per hour, rolled up per day and month, with trip counts, revenue and
+distance per non-empty cell
+
+Matrices are stored in COO form as columnar Parquet: one row per
+(period, Pickup_Location, Dropoff_Location) with int16 zone IDs, sorted by
+period, origin and destination within each taxi_type / Pickup_Month
+partition, so a period range is a few contiguous row groups and a zone's
+outbound row is a contiguous run. Every level keeps Pickup_Hour_Key (the
+first hour of the period, see time_keys.py), so one range filter works for
+all levels.
+
+    nyc_taxi_od_hourly   hour  x origin x destination
+    nyc_taxi_od_daily    day   x origin x destination
+    nyc_taxi_od_monthly  month x origin x destination
+
+Query API (pyarrow only, never touches raw trips):
+    od = ODMatrix.load("~/nyc_taxi_data/processed/nyc_taxi_od_daily",
+                       taxi_type="yellow", start="2024-01-01", end="2024-02-01")
+    od.top_flows(10)
+    od.zone_totals(132)                  # JFK inbound / outbound
+    od.slice(origins=[132, 138]).to_csr()
+
+    python od_matrix.py top --data ~/nyc_taxi_data/processed --level daily -n 10
+
+Requirements: pip install pyarrow (pyspark to build the matrices)
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from time_keys import hour_key, hour_key_to_datetime
+
+NUM_LOCATIONS = 265
+
+ORIGIN = "Pickup_Location"
+DESTINATION = "Dropoff_Location"
+OD_MEASURES = ["trips", "revenue", "distance"]
+
+# Level -> output dataset name under the processed directory
+OD_LEVELS: Dict[str, str] = {
+    "hourly": "nyc_taxi_od_hourly",
+    "daily": "nyc_taxi_od_daily",
+    "monthly": "nyc_taxi_od_monthly",
+}
+
+OD_ENV = "NYC_TAXI_OD"
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+# ============================================
+# Spark
+# ============================================
+
+def od_aggregate(trips, keys: Iterable[str] = ("taxi_type",)):
+    """
+    Hourly OD aggregate of trips with Pickup_Hour_Key, Pickup_Location,
+    Dropoff_Location, Total_Amount and Trip_Distance (aggregate_trips.py's
+    selectExpr); trips without both zones are skipped
+    """
+    from pyspark.sql import functions as F
+
+    return (trips.filter(F.col(ORIGIN).isNotNull() & F.col(DESTINATION).isNotNull())
+            .groupBy(*keys, "Pickup_Hour_Key",
+                     F.col(ORIGIN).cast("smallint").alias(ORIGIN),
+                     F.col(DESTINATION).cast("smallint").alias(DESTINATION))
+            .agg(F.count(F.lit(1)).cast("int").alias("trips"),
+                 F.sum("Total_Amount").alias("revenue"),
+                 F.sum("Trip_Distance").alias("distance")))
+
+
+def od_rollup(od, level: str, keys: Iterable[str] = ("taxi_type",)):
+    """
+    Merge an hourly OD aggregate into days or months
+
+    Counts and sums are mergeable, so each level is computed from the
+    (much smaller) hourly aggregate rather than from trips.
+    """
+    from pyspark.sql import functions as F
+    from time_keys import spark_hour_key, spark_hour_timestamp
+
+    if level == "hourly":
+        return od
+    if level == "daily":
+        period = (F.floor(F.col("Pickup_Hour_Key") / 24) * 24).cast("int")
+    elif level == "monthly":
+        period = spark_hour_key(F.date_trunc("month", spark_hour_timestamp("Pickup_Hour_Key")))
+    else:
+        raise ValueError(f"Unknown OD level {level!r}; expected one of {sorted(OD_LEVELS)}")
+
+    return (od.groupBy(*keys, period.alias("Pickup_Hour_Key"), ORIGIN, DESTINATION)
+            .agg(F.sum("trips").cast("int").alias("trips"),
+                 F.sum("revenue").alias("revenue"),
+                 F.sum("distance").alias("distance")))
+
+
+def write_od_levels(od_hourly, output_dir: str, keys: Iterable[str] = ("taxi_type",)) -> Dict[str, str]:
+    """
+    Write every OD level as COO Parquet partitioned by taxi_type and
+    Pickup_Month (dynamic overwrite replaces only this run's months)
+
+    Returns:
+        Level -> output path
+    """
+    from pyspark.sql import functions as F
+    from time_keys import spark_hour_timestamp
+
+    keys = list(keys)
+    od_hourly = od_hourly.persist()
+    paths = {}
+    for level, name in OD_LEVELS.items():
+        path = os.path.join(output_dir, name)
+        (od_rollup(od_hourly, level, keys)
+         .withColumn("Pickup_Month", F.date_format(spark_hour_timestamp("Pickup_Hour_Key"), "yyyy-MM"))
+         .repartition(*keys, "Pickup_Month")
+         .sortWithinPartitions("Pickup_Hour_Key", ORIGIN, DESTINATION)
+         .write.mode("overwrite").partitionBy(*keys, "Pickup_Month").parquet(path))
+        paths[level] = path
+    od_hourly.unpersist()
+    return paths
+
+
+# ============================================
+# Query API
+# ============================================
+
+def _months(start_key: Optional[int], end_key: Optional[int]) -> Tuple[Optional[str], Optional[str]]:
+    fmt = "%Y-%m"
+    return (hour_key_to_datetime(start_key).strftime(fmt) if start_key is not None else None,
+            hour_key_to_datetime(end_key - 1).strftime(fmt) if end_key is not None else None)
+
+
+class ODMatrix:
+    """A sparse OD matrix (COO table of origin, destination and measures) summed over a period"""
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+
+    @classmethod
+    def load(cls, path: str, taxi_type: Optional[str] = None,
+             start=None, end=None) -> "ODMatrix":
+        """
+        Sum an OD dataset over [start, end) (datetimes, dates or
+        'YYYY-MM-DD[ HH]' strings; open-ended when omitted)
+
+        Partition pruning on Pickup_Month and row-group statistics on
+        Pickup_Hour_Key keep the read to the requested period.
+        """
+        dataset = ds.dataset(os.path.expanduser(path), format="parquet", partitioning="hive")
+        start_key = hour_key(start) if start is not None else None
+        end_key = hour_key(end) if end is not None else None
+        first_month, last_month = _months(start_key, end_key)
+
+        conditions = []
+        if taxi_type is not None:
+            conditions.append(ds.field("taxi_type") == taxi_type)
+        if start_key is not None:
+            conditions += [ds.field("Pickup_Month") >= first_month,
+                           ds.field("Pickup_Hour_Key") >= start_key]
+        if end_key is not None:
+            conditions += [ds.field("Pickup_Month") <= last_month,
+                           ds.field("Pickup_Hour_Key") < end_key]
+        condition = None
+        for expression in conditions:
+            condition = expression if condition is None else condition & expression
+
+        table = dataset.to_table(columns=[ORIGIN, DESTINATION, *OD_MEASURES], filter=condition)
+        return cls(table).merge()
+
+    def merge(self) -> "ODMatrix":
+        """Sum duplicate (origin, destination) cells, e.g. after reading several periods"""
+        merged = self.table.group_by([ORIGIN, DESTINATION]).aggregate(
+            [(measure, "sum") for measure in OD_MEASURES])
+        # group_by names the sums "<measure>_sum"
+        merged = merged.rename_columns([name[:-len("_sum")] if name.endswith("_sum") else name
+                                        for name in merged.column_names])
+        return ODMatrix(merged.sort_by([(ORIGIN, "ascending"), (DESTINATION, "ascending")]))
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def top_flows(self, n: int = 10, measure: str = "trips") -> List[Dict]:
+        """The n largest cells by a measure"""
+        top = self.table.sort_by([(measure, "descending")]).slice(0, n)
+        return top.to_pylist()
+
+    def zone_totals(self, zone: int) -> Dict[str, Dict[str, float]]:
+        """Outbound (zone as origin), inbound (as destination) and intra-zone totals"""
+        origin = pc.equal(self.table[ORIGIN], zone)
+        destination = pc.equal(self.table[DESTINATION], zone)
+        masks = {"outbound": origin, "inbound": destination, "intrazonal": pc.and_(origin, destination)}
+        totals = {}
+        for name, mask in masks.items():
+            rows = self.table.filter(mask)
+            totals[name] = {measure: pc.sum(rows[measure]).as_py() or 0 for measure in OD_MEASURES}
+        return totals
+
+    def slice(self, origins: Optional[Iterable[int]] = None,
+              destinations: Optional[Iterable[int]] = None) -> "ODMatrix":
+        """Sub-matrix of the given origin rows and/or destination columns"""
+        mask = None
+        for column, values in ((ORIGIN, origins), (DESTINATION, destinations)):
+            if values is None:
+                continue
+            selected = pc.is_in(self.table[column], value_set=pa.array(list(values), self.table[column].type))
+            mask = selected if mask is None else pc.and_(mask, selected)
+        return ODMatrix(self.table if mask is None else self.table.filter(mask))
+
+    def to_csr(self, measure: str = "trips", size: int = NUM_LOCATIONS + 1):
+        """
+        CSR arrays (indptr, indices, data) of a measure with rows = origins
+        and columns = destinations (LocationID used as the index)
+
+        Requires numpy; pass the arrays to scipy.sparse.csr_matrix if needed.
+        """
+        import numpy as np
+
+        origins = self.table[ORIGIN].to_numpy().astype(np.int64)
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.add.at(indptr, origins + 1, 1)
+        indptr = np.cumsum(indptr)
+        # Rows are sorted by origin, then destination (see merge)
+        return (indptr,
+                self.table[DESTINATION].to_numpy().astype(np.int32),
+                self.table[measure].to_numpy())
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the sparse OD matrices")
+    parser.add_argument("command", choices=["top", "zone", "slice"])
+    parser.add_argument("--data", required=True, help="Processed directory or an OD dataset path")
+    parser.add_argument("--level", choices=sorted(OD_LEVELS), default="daily")
+    parser.add_argument("--taxi-type")
+    parser.add_argument("--start", help="Inclusive start, e.g. 2024-01-01")
+    parser.add_argument("--end", help="Exclusive end, e.g. 2024-02-01")
+    parser.add_argument("--measure", choices=OD_MEASURES, default="trips")
+    parser.add_argument("-n", type=int, default=10, help="Number of flows (top)")
+    parser.add_argument("--zone", type=int, help="LocationID (zone)")
+    parser.add_argument("--origins", type=int, nargs="*", help="Origin LocationIDs (slice)")
+    parser.add_argument("--destinations", type=int, nargs="*", help="Destination LocationIDs (slice)")
+    args = parser.parse_args(argv)
+
+    path = os.path.expanduser(args.data)
+    if os.path.isdir(os.path.join(path, OD_LEVELS[args.level])):
+        path = os.path.join(path, OD_LEVELS[args.level])
+
+    try:
+        od = ODMatrix.load(path, args.taxi_type, args.start, args.end)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print_error(f"Failed to read {path}: {e}")
+        return 1
+    print_info(f"{len(od):,} non-empty cells")
+
+    if args.command == "zone":
+        if args.zone is None:
+            print_error("--zone is required")
+            return 1
+        for direction, totals in od.zone_totals(args.zone).items():
+            print(f"  {direction:10s} trips={totals['trips']:,}  revenue=${totals['revenue']:,.2f}  "
+                  f"distance={totals['distance']:,.1f} mi")
+        return 0
+
+    if args.command == "slice":
+        od = od.slice(args.origins, args.destinations)
+    for flow in od.top_flows(args.n if args.command == "top" else len(od), args.measure):
+        print(f"  {flow[ORIGIN]:>3} -> {flow[DESTINATION]:>3}  trips={flow['trips']:,}  "
+              f"revenue=${flow['revenue']:,.2f}  distance={flow['distance']:,.1f} mi")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -156,6 +156,9 @@ GROUP BY DATE_FORMAT(trip_pickup_datetime, '%Y-%m-%d %H');
 -- ============================================
 
 -- Sample 1% of data for fast dashboard testing
+-- Uniform sampling loses rare zones/hours and gives no error bounds; for a
+-- stratified sample with weights and confidence intervals, run the pipeline
+-- with NYC_TAXI_SAMPLE=0.01 and see stratified_sampling.py
 CREATE OR REPLACE VIEW nyc_taxi_sample AS
 SELECT 
     DATE_FORMAT(trip_pickup_datetime, '%Y-%m-%d %H') as Pickup_Time,
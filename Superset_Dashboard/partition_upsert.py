@@ -0,0 +1,161 @@
+"""
+Late-Arriving Trips and Partition-Level Upsert of the Hourly Aggregates
+TLC files routinely contain trips of adjacent months (a trip that started
+at 23:50 on Jan 31 sits in the February file) and corrected files are
+re-released, yet aggregates were computed per file and written over whole
+month partitions, so late trips were either dropped or overwrote the
+partition of the month they belong to. Here every trip is aggregated into
+its true hour, keyed additionally by the file it came from, and the result
+is kept as mergeable state (sums and non-null counts, see skew_aggregation)
+
+    nyc_taxi_aggregate_state/taxi_type=yellow/Source_File=yellow_tripdata_2018-02/
+        Pickup_Hour_Key, Pickup_Location, Pickup_Month, sums and counts
+
+Re-processing a file replaces only its own state partition. The
+Pickup_Month partitions that file's old or new state touches are then
+rebuilt by merging the state of every file that contributed to them, so
+late data and corrections update only the touched months, and running the
+same file twice is idempotent.
+
+A month is only rebuilt once its own file (<taxi_type>_tripdata_YYYY-MM)
+is in the state; late trips for a month that was never processed wait in
+the state instead of replacing that month with a handful of rows.
+
+    state = valid.withColumn("Pickup_Month", ...)      # keyed by SOURCE_COLUMN
+    touched = write_state(spark, state, state_path)
+    ready, waiting = ready_partitions(spark, state_path, touched)
+    merged = merged_partitions(spark, state_path, ready)
+
+Requirements: pip install pyspark
+"""
+
+import re
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from pyspark.sql import Column, DataFrame, SparkSession
+from pyspark.sql import functions as F
+
+from skew_aggregation import HOURLY_KEYS, HOURLY_MEASURES, merge_aggregates, state_columns
+from time_keys import spark_hour_timestamp
+
+SOURCE_COLUMN = "Source_File"
+MONTH_COLUMN = "Pickup_Month"
+STATE_DIR = "nyc_taxi_aggregate_state"
+
+_HOME_FILE = "{taxi_type}_tripdata_{month}"
+_SOURCE_NAME = r"([^/]+)\.[A-Za-z]+$"
+
+
+def source_file_key(file_col: str = "source_file") -> Column:
+    """Source file name without directory and extension (CSV and converted Parquet share it)"""
+    return F.regexp_extract(F.col(file_col), _SOURCE_NAME, 1)
+
+
+def in_home_month(hour_key_col: str = "Pickup_Hour_Key", source_col: str = SOURCE_COLUMN) -> Column:
+    """
+    True for trips in their source file's own month (files without a
+    YYYY-MM in their name pass)
+
+    For outputs that are still written over whole month partitions (the OD
+    matrices): late trips would replace an adjacent month with a handful of rows.
+    """
+    file_month = F.regexp_extract(F.col(source_col), r"(\d{4}-\d{2})$", 1)
+    trip_month = F.date_format(spark_hour_timestamp(hour_key_col), "yyyy-MM")
+    return (file_month == "") | (trip_month == file_month)
+
+
+def delete_source_partitions(spark: SparkSession, path: str, sources: Iterable[Tuple[str, str]]) -> int:
+    """
+    Remove the taxi_type=/Source_File= partitions of these files from a dataset
+
+    Dynamic partition overwrite only replaces partitions the new data has
+    rows for; outputs a re-processed file may now have no rows in (e.g.
+    rejection counts of a file that became clean) are cleared with this
+    first. Returns the number of partitions removed.
+    """
+    jvm = spark.sparkContext._jvm
+    conf = spark.sparkContext._jsc.hadoopConfiguration()
+    removed = 0
+    for taxi_type, source in sources:
+        partition = jvm.org.apache.hadoop.fs.Path(f"{path}/taxi_type={taxi_type}/{SOURCE_COLUMN}={source}")
+        fs = partition.getFileSystem(conf)
+        if fs.exists(partition) and fs.delete(partition, True):
+            removed += 1
+    return removed
+
+
+def _partitions(df: DataFrame, columns: Sequence[str]) -> Set[Tuple]:
+    return {tuple(row) for row in df.select(*columns).distinct().collect()}
+
+
+def _state_exists(spark: SparkSession, state_path: str) -> bool:
+    try:
+        spark.read.parquet(state_path).schema
+        return True
+    except Exception:
+        return False
+
+
+def write_state(spark: SparkSession, state: DataFrame, state_path: str,
+                measures: Sequence[Tuple[str, str, str]] = HOURLY_MEASURES) -> Set[Tuple[str, str]]:
+    """
+    Replace the state partitions of this run's source files
+
+    Args:
+        state: Aggregate keyed by taxi_type, SOURCE_COLUMN, HOURLY_KEYS with
+            Pickup_Month and the measures
+        state_path: State dataset (written with dynamic partition overwrite)
+
+    Returns:
+        (taxi_type, Pickup_Month) partitions touched by the old or new state
+    """
+    state = state.select("taxi_type", SOURCE_COLUMN, *HOURLY_KEYS, MONTH_COLUMN,
+                         *state_columns(measures)).persist()
+    touched = _partitions(state, ["taxi_type", MONTH_COLUMN])
+
+    # Months the replaced files contributed to before, e.g. rows a corrected
+    # file no longer has; collected before the overwrite
+    sources = sorted(name for _, name in _partitions(state, ["taxi_type", SOURCE_COLUMN]))
+    if _state_exists(spark, state_path):
+        previous = spark.read.parquet(state_path).filter(F.col(SOURCE_COLUMN).isin(sources))
+        touched |= _partitions(previous, ["taxi_type", MONTH_COLUMN])
+
+    state.write.mode("overwrite").partitionBy("taxi_type", SOURCE_COLUMN).parquet(state_path)
+    state.unpersist()
+    return touched
+
+
+def ready_partitions(spark: SparkSession, state_path: str,
+                     touched: Set[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    Split touched partitions into those whose own month file is in the
+    state (safe to rebuild) and those still waiting for it
+
+    Files without a YYYY-MM in their name (e.g. synthetic data) carry no
+    month, so partitions of taxi types without any such file are rebuilt as well.
+    """
+    sources = _partitions(spark.read.parquet(state_path), ["taxi_type", SOURCE_COLUMN])
+    monthly_types = {taxi_type for taxi_type, name in sources if re.search(r"\d{4}-\d{2}$", name)}
+
+    ready, waiting = [], []
+    for taxi_type, month in sorted(touched):
+        home = (taxi_type, _HOME_FILE.format(taxi_type=taxi_type, month=month))
+        (ready if home in sources or taxi_type not in monthly_types else waiting).append((taxi_type, month))
+    return ready, waiting
+
+
+def merged_partitions(spark: SparkSession, state_path: str,
+                      partitions: Sequence[Tuple[str, str]],
+                      measures: Sequence[Tuple[str, str, str]] = HOURLY_MEASURES) -> Optional[DataFrame]:
+    """
+    Rebuild the hourly aggregate of (taxi_type, Pickup_Month) partitions by
+    merging every source file's state (None when there is nothing to rebuild)
+    """
+    if not partitions:
+        return None
+    keys = spark.createDataFrame(list(partitions), ["taxi_type", MONTH_COLUMN])
+    state = (spark.read.parquet(state_path)
+             .filter(F.col("taxi_type").isin(sorted({t for t, _ in partitions}))
+                     & F.col(MONTH_COLUMN).isin(sorted({m for _, m in partitions})))
+             .join(F.broadcast(keys), ["taxi_type", MONTH_COLUMN]))
+    return merge_aggregates(state, ["taxi_type", MONTH_COLUMN] + HOURLY_KEYS, measures)
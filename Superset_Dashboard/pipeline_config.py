@@ -0,0 +1,175 @@
+"""
+Shared NYC Taxi Pipeline Configuration
+One INI file holds the settings every stage used to hard-code or read from
+its own variables: data directories, year / months / taxi types, the
+aggregation switches, the loader backend, Trino and Superset. It is read by
+nyc_taxi_cli.py, and quick_start_data_pipeline.sh picks it up through
+`nyc_taxi_cli.py config --shell`.
+
+Lookup order: --config, $NYC_TAXI_CONFIG, ./nyc_taxi.ini,
+~/.config/nyc_taxi/nyc_taxi.ini; missing keys keep the defaults below.
+
+    [pipeline]
+    data_dir = ~/nyc_taxi_data
+    year = 2024
+    months = 01 02 03
+    taxi_types = yellow green
+
+    [trino]
+    host = trino.internal
+
+Settings reach the stages as the NYC_TAXI_* environment variables they
+already read; variables set explicitly in the environment win.
+
+Requirements: none
+"""
+
+import configparser
+import os
+import shlex
+from typing import Dict, List, Optional
+
+CONFIG_ENV = "NYC_TAXI_CONFIG"
+CONFIG_FILES = ["nyc_taxi.ini", "~/.config/nyc_taxi/nyc_taxi.ini"]
+
+DEFAULTS: Dict[str, Dict[str, str]] = {
+    "pipeline": {
+        "data_dir": "~/nyc_taxi_data",
+        "year": "2024",
+        "months": "01",
+        "taxi_types": "yellow green",
+        "download_workers": "4",
+        "skew": "static",
+        "quarantine": "0",
+        "sample": "0",
+        "od": "1",
+    },
+    "backend": {
+        "name": "trino",
+        "duckdb_path": "",
+    },
+    "trino": {
+        "host": "localhost",
+        "port": "8080",
+        "user": "admin",
+        "catalog": "hive",
+        "schema": "nyc_taxi",
+    },
+    "superset": {
+        "url": "http://localhost:8088",
+        "username": "admin",
+        "password": "admin",
+    },
+}
+
+# (section, key) -> environment variable read by the stages
+ENV_VARIABLES: Dict[tuple, str] = {
+    ("pipeline", "skew"): "NYC_TAXI_SKEW",
+    ("pipeline", "quarantine"): "NYC_TAXI_QUARANTINE",
+    ("pipeline", "sample"): "NYC_TAXI_SAMPLE",
+    ("pipeline", "od"): "NYC_TAXI_OD",
+    ("backend", "name"): "NYC_TAXI_BACKEND",
+    ("backend", "duckdb_path"): "NYC_TAXI_DUCKDB",
+    ("trino", "host"): "NYC_TAXI_TRINO_HOST",
+    ("trino", "port"): "NYC_TAXI_TRINO_PORT",
+    ("trino", "user"): "NYC_TAXI_TRINO_USER",
+    ("trino", "catalog"): "NYC_TAXI_TRINO_CATALOG",
+    ("trino", "schema"): "NYC_TAXI_TRINO_SCHEMA",
+}
+
+
+def find_config(path: Optional[str] = None) -> Optional[str]:
+    """First existing config file of the lookup order (None if there is none)"""
+    candidates = [path] if path else [os.environ.get(CONFIG_ENV)] + CONFIG_FILES
+    for candidate in filter(None, candidates):
+        candidate = os.path.expanduser(candidate)
+        if os.path.exists(candidate):
+            return candidate
+    if path:
+        raise FileNotFoundError(f"Config file not found: {path}")
+    return None
+
+
+class PipelineConfig:
+    """Pipeline settings: DEFAULTS overlaid with a config file"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = find_config(path)
+        self.parser = configparser.ConfigParser()
+        self.parser.read_dict(DEFAULTS)
+        if self.path:
+            self.parser.read(self.path)
+
+    def get(self, section: str, key: str) -> str:
+        return self.parser.get(section, key)
+
+    def _list(self, key: str) -> List[str]:
+        return self.get("pipeline", key).replace(",", " ").split()
+
+    @property
+    def data_dir(self) -> str:
+        return os.path.expanduser(self.get("pipeline", "data_dir"))
+
+    @property
+    def raw_dir(self) -> str:
+        return os.path.join(self.data_dir, "raw")
+
+    @property
+    def processed_dir(self) -> str:
+        return os.path.join(self.data_dir, "processed")
+
+    @property
+    def zones_dir(self) -> str:
+        return os.path.join(self.data_dir, "zones")
+
+    @property
+    def metrics_dir(self) -> str:
+        return os.path.join(self.data_dir, "metrics")
+
+    @property
+    def year(self) -> str:
+        return self.get("pipeline", "year")
+
+    @property
+    def months(self) -> List[str]:
+        return [f"{int(month):02d}" for month in self._list("months")]
+
+    @property
+    def taxi_types(self) -> List[str]:
+        return self._list("taxi_types")
+
+    def environment(self) -> Dict[str, str]:
+        """NYC_TAXI_* variables of these settings"""
+        env = {
+            "NYC_TAXI_METRICS_DIR": self.metrics_dir,
+            "NYC_TAXI_CATALOG": os.path.join(self.data_dir, "trip_catalog.sqlite"),
+            "NYC_TAXI_ZONES": os.path.join(self.zones_dir, "taxi+_zone_lookup.csv"),
+        }
+        for (section, key), name in ENV_VARIABLES.items():
+            value = self.get(section, key)
+            if value:
+                env[name] = value
+        return env
+
+    def export_env(self) -> None:
+        """Set the variables that are not already set in this process"""
+        for name, value in self.environment().items():
+            os.environ.setdefault(name, value)
+
+    def shell_assignments(self) -> str:
+        """Bash assignments for quick_start_data_pipeline.sh"""
+        lines = [
+            f"DATA_DIR={shlex.quote(self.data_dir)}",
+            f"YEAR={shlex.quote(self.year)}",
+            f"MONTHS=({' '.join(shlex.quote(m) for m in self.months)})",
+            f"TAXI_TYPES=({' '.join(shlex.quote(t) for t in self.taxi_types)})",
+            f"DOWNLOAD_WORKERS={shlex.quote(self.get('pipeline', 'download_workers'))}",
+        ]
+        for key in ("host", "port", "catalog", "schema"):
+            lines.append(f"TRINO_{key.upper()}={shlex.quote(self.get('trino', key))}")
+        for (section, key), name in ENV_VARIABLES.items():
+            value = self.get(section, key)
+            if value:
+                # Variables set explicitly in the environment win
+                lines.append(f'[ -n "${{{name}+x}}" ] || export {name}={shlex.quote(value)}')
+        return "\n".join(lines)
@@ -0,0 +1,490 @@
+"""
+NYC Taxi Pipeline Instrumentation
+Every pipeline stage (download, read, aggregate, write, Trino load, view
+creation) reports through this module. Each stage records start/end time,
+rows in/out, bytes read/written, rows/sec and peak memory, which are appended
+as JSON lines and exported as a Prometheus textfile-collector file
+
+Python usage:
+    metrics = PipelineMetrics.from_env("load_sample_data")
+    with metrics.stage("read_csv", taxi_type="green") as stage:
+        df = pd.read_csv(path)
+        stage.bytes_read = os.path.getsize(path)
+        stage.rows_out = len(df)
+
+Shell usage (wraps a command, measuring the child process):
+    python pipeline_metrics.py run --pipeline quick_start --stage download \\
+        --label taxi_type=yellow --output file.parquet -- wget -q URL
+
+Python stages run this way report their row counts with
+report_rows(rows_out=...), which is a no-op outside `run`.
+
+Configuration (environment):
+    NYC_TAXI_METRICS_DIR   Directory for pipeline_metrics.jsonl and
+                           nyc_taxi_pipeline.prom (default: ./metrics)
+    NYC_TAXI_RUN_ID        Run id shared by every stage of one pipeline run
+                           (default: a new id per collector)
+
+Requirements: standard library only
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows
+    fcntl = None
+    resource = None
+
+METRICS_DIR_ENV = "NYC_TAXI_METRICS_DIR"
+DEFAULT_METRICS_DIR = "metrics"
+RUN_ID_ENV = "NYC_TAXI_RUN_ID"
+JSONL_FILE = "pipeline_metrics.jsonl"
+PROM_FILE = "nyc_taxi_pipeline.prom"
+# Latest record per (pipeline, stage, labels) (source of the .prom)
+LATEST_FILE = "pipeline_metrics_latest.json"
+# Set by `run` for the wrapped command; report_rows() writes its counts there
+ROWS_FILE_ENV = "NYC_TAXI_STAGE_ROWS_FILE"
+
+# Prometheus gauges exported for every stage: (metric suffix, record field, help)
+PROM_GAUGES = [
+    ("duration_seconds", "duration_s", "Wall time of the stage"),
+    ("rows_in", "rows_in", "Rows consumed by the stage"),
+    ("rows_out", "rows_out", "Rows produced by the stage"),
+    ("bytes_read", "bytes_read", "Bytes read by the stage"),
+    ("bytes_written", "bytes_written", "Bytes written by the stage"),
+    ("rows_per_second", "rows_per_s", "Stage throughput"),
+    ("peak_rss_bytes", "peak_rss_bytes", "Peak resident memory during the stage"),
+    ("success", "success", "1 if the last run of the stage succeeded"),
+    ("end_timestamp_seconds", "end_ts", "Unix time the stage last finished"),
+]
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """Current resident set size, read from /proc where available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss_bytes(who) -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _MemorySampler:
+    """Background thread tracking peak RSS while a stage runs"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = _current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = _current_rss_bytes()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self.peak is None:
+            # No /proc: fall back to the process-lifetime peak
+            self.peak = _max_rss_bytes(resource.RUSAGE_SELF) if resource else None
+
+
+class StageMetrics:
+    """Measurements for one run of one pipeline stage"""
+
+    def __init__(self, pipeline: str, stage: str, run_id: str, labels: Optional[Dict] = None):
+        self.pipeline = pipeline
+        self.stage = stage
+        self.run_id = run_id
+        self.labels = dict(labels or {})
+        self.start_ts = None
+        self.end_ts = None
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = None
+        self.bytes_written = None
+        self.peak_rss_bytes = None
+        self.success = None
+        self.error = None
+
+    @property
+    def duration_s(self) -> Optional[float]:
+        if self.start_ts is None or self.end_ts is None:
+            return None
+        return self.end_ts - self.start_ts
+
+    @property
+    def rows_per_s(self) -> Optional[float]:
+        rows = self.rows_in if self.rows_in is not None else self.rows_out
+        if rows is None or not self.duration_s:
+            return None
+        return rows / self.duration_s
+
+    def to_dict(self) -> Dict:
+        return {
+            "pipeline": self.pipeline,
+            "stage": self.stage,
+            "run_id": self.run_id,
+            "labels": self.labels,
+            "start": _iso(self.start_ts),
+            "end": _iso(self.end_ts),
+            "start_ts": self.start_ts,
+            "end_ts": self.end_ts,
+            "duration_s": self.duration_s,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "rows_per_s": self.rows_per_s,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "success": self.success,
+            "error": self.error,
+        }
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat(timespec="milliseconds")
+
+
+class PipelineMetrics:
+    """Collects stage metrics and writes them to JSON lines and a Prometheus textfile"""
+
+    def __init__(self,
+                 pipeline: str,
+                 metrics_dir: str = DEFAULT_METRICS_DIR,
+                 run_id: Optional[str] = None,
+                 labels: Optional[Dict] = None,
+                 verbose: bool = True):
+        """
+        Args:
+            pipeline: Pipeline name, used as a label on every metric
+            metrics_dir: Directory for the JSONL and .prom files
+            run_id: Identifier shared by all stages of one run (generated if omitted)
+            labels: Labels attached to every stage (e.g. {"year": "2024"})
+            verbose: Print a one-line summary when each stage finishes
+        """
+        self.pipeline = pipeline
+        self.metrics_dir = metrics_dir
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.labels = dict(labels or {})
+        self.verbose = verbose
+        self.stages: List[StageMetrics] = []
+
+    @classmethod
+    def from_env(cls, pipeline: str, **kwargs) -> "PipelineMetrics":
+        """
+        Create a collector writing to $NYC_TAXI_METRICS_DIR (default: ./metrics)
+        whose stages share the run id $NYC_TAXI_RUN_ID when it is set
+        """
+        metrics_dir = os.environ.get(METRICS_DIR_ENV, DEFAULT_METRICS_DIR)
+        kwargs.setdefault("run_id", os.environ.get(RUN_ID_ENV))
+        return cls(pipeline, metrics_dir=metrics_dir, **kwargs)
+
+    @property
+    def jsonl_path(self) -> str:
+        return os.path.join(self.metrics_dir, JSONL_FILE)
+
+    @property
+    def prom_path(self) -> str:
+        return os.path.join(self.metrics_dir, PROM_FILE)
+
+    @property
+    def latest_path(self) -> str:
+        return os.path.join(self.metrics_dir, LATEST_FILE)
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        """
+        Measure a block of code as one pipeline stage
+
+        The yielded StageMetrics can be filled in with rows/bytes counts; timing
+        and peak memory are recorded automatically. Exceptions are recorded as a
+        failed stage and re-raised.
+        """
+        stage = StageMetrics(self.pipeline, name, self.run_id, {**self.labels, **labels})
+        stage.start_ts = time.time()
+        try:
+            with _MemorySampler() as sampler:
+                yield stage
+            stage.success = True
+        except BaseException as e:
+            stage.success = False
+            stage.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stage.end_ts = time.time()
+            stage.peak_rss_bytes = sampler.peak if stage.peak_rss_bytes is None else stage.peak_rss_bytes
+            self.record(stage)
+
+    def record(self, stage: StageMetrics):
+        """Append a finished stage to the JSONL log and refresh the .prom file"""
+        self.stages.append(stage)
+        os.makedirs(self.metrics_dir, exist_ok=True)
+
+        with open(self.jsonl_path, "a") as f:
+            f.write(json.dumps(stage.to_dict()) + "\n")
+
+        # Stages finishing concurrently (e.g. parallel `run` wrappers) would
+        # otherwise lose each other's records or write an older .prom last
+        with _file_lock(self.latest_path):
+            records = update_latest_records(self.latest_path, stage.to_dict())
+            write_prometheus_textfile(records, self.prom_path)
+
+        if self.verbose:
+            print(f"  ⏱ {format_stage(stage.to_dict())}")
+
+
+def format_stage(record: Dict) -> str:
+    """One-line human-readable summary of a stage record"""
+    parts = [f"{record['stage']}: {record['duration_s']:.2f}s"]
+    if record.get("rows_out") is not None:
+        parts.append(f"{record['rows_out']:,} rows")
+    if record.get("rows_per_s") is not None:
+        parts.append(f"{record['rows_per_s']:,.0f} rows/s")
+    if record.get("bytes_read"):
+        parts.append(f"read {record['bytes_read'] / 2**20:,.1f} MiB")
+    if record.get("bytes_written"):
+        parts.append(f"wrote {record['bytes_written'] / 2**20:,.1f} MiB")
+    if record.get("peak_rss_bytes"):
+        parts.append(f"peak {record['peak_rss_bytes'] / 2**20:,.0f} MiB")
+    if not record.get("success"):
+        parts.append("FAILED")
+    return ", ".join(parts)
+
+
+# ============================================
+# Prometheus Export
+# ============================================
+
+def _prom_labels(labels: Dict) -> str:
+    escaped = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _record_key(record: Dict) -> tuple:
+    return (record["pipeline"], record["stage"], json.dumps(record.get("labels", {}), sort_keys=True))
+
+
+def latest_stage_records(jsonl_path: str) -> List[Dict]:
+    """Most recent record for every (pipeline, stage, labels) combination"""
+    latest = {}
+    if not os.path.exists(jsonl_path):
+        return []
+    with open(jsonl_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            latest[_record_key(record)] = record
+    return list(latest.values())
+
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive advisory lock on path + ".lock" (no-op without fcntl)"""
+    with open(f"{path}.lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def update_latest_records(latest_path: str, record: Dict) -> List[Dict]:
+    """
+    Upsert a stage record into the latest-records file and return its records
+
+    The file keeps the newest record of every (pipeline, stage, labels), like
+    latest_stage_records(), so the .prom written from it no longer has to be
+    rebuilt from the whole JSONL history. Callers hold _file_lock(latest_path).
+    """
+    latest = {}
+    if os.path.exists(latest_path):
+        with open(latest_path) as f:
+            latest = {_record_key(r): r for r in json.load(f)}
+    key = _record_key(record)
+    current = latest.get(key)
+    if current is None or (current.get("end_ts") or 0) <= (record.get("end_ts") or 0):
+        latest[key] = record
+    records = list(latest.values())
+    _write_atomic(latest_path, json.dumps(records))
+    return records
+
+
+def write_prometheus_textfile(records: List[Dict], prom_path: str, prefix: str = "nyc_taxi_stage"):
+    """
+    Write every stage gauge of the given records in textfile-collector format
+
+    The file is written to a temporary name and renamed so node_exporter
+    never reads a partial file.
+    """
+    lines = []
+    for suffix, field, help_text in PROM_GAUGES:
+        name = f"{prefix}_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for record in records:
+            value = record.get(field)
+            if value is None:
+                continue
+            labels = {"pipeline": record["pipeline"], "stage": record["stage"],
+                      **record.get("labels", {})}
+            lines.append(f"{name}{_prom_labels(labels)} {float(value)}")
+
+    _write_atomic(prom_path, "\n".join(lines) + "\n")
+
+
+def report_rows(rows_in: Optional[int] = None, rows_out: Optional[int] = None):
+    """
+    Report row counts to the `pipeline_metrics.py run` wrapping this process
+
+    Counts add up over calls (e.g. one per file); without a wrapper this
+    does nothing.
+    """
+    path = os.environ.get(ROWS_FILE_ENV)
+    if not path:
+        return
+    counts = {}
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path) as f:
+            counts = json.load(f)
+    for name, rows in (("rows_in", rows_in), ("rows_out", rows_out)):
+        if rows is not None:
+            counts[name] = counts.get(name, 0) + int(rows)
+    with open(path, "w") as f:
+        json.dump(counts, f)
+
+
+# ============================================
+# Command Line (for shell stages)
+# ============================================
+
+def _path_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(path) for name in files)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _parse_labels(pairs: List[str]) -> Dict:
+    labels = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        labels[key] = value
+    return labels
+
+
+def run_command(args) -> int:
+    """Run a command as a measured stage; returns the command's exit code"""
+    metrics = PipelineMetrics(args.pipeline,
+                              metrics_dir=args.metrics_dir,
+                              run_id=args.run_id,
+                              labels=_parse_labels(args.label))
+    stage = StageMetrics(metrics.pipeline, args.stage, metrics.run_id, metrics.labels)
+    stage.bytes_read = sum(_path_size(p) for p in args.input) if args.input else None
+
+    # The command reports its row counts (report_rows) into a scratch file
+    fd, rows_path = tempfile.mkstemp(prefix="stage_rows_", suffix=".json")
+    os.close(fd)
+    stage.start_ts = time.time()
+    try:
+        returncode = subprocess.call(args.command, env={**os.environ, ROWS_FILE_ENV: rows_path})
+        stage.end_ts = time.time()
+        reported = {}
+        if os.path.getsize(rows_path):
+            with open(rows_path) as f:
+                reported = json.load(f)
+    finally:
+        os.remove(rows_path)
+
+    stage.success = returncode == 0
+    if not stage.success:
+        stage.error = f"exit code {returncode}"
+    stage.bytes_written = sum(_path_size(p) for p in args.output) if args.output else None
+    stage.rows_in = args.rows_in if args.rows_in is not None else reported.get("rows_in")
+    stage.rows_out = args.rows_out if args.rows_out is not None else reported.get("rows_out")
+    stage.peak_rss_bytes = _max_rss_bytes(resource.RUSAGE_CHILDREN) if resource else None
+
+    metrics.record(stage)
+    return returncode
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="NYC taxi pipeline metrics")
+    subparsers = parser.add_subparsers(dest="command_name", required=True)
+
+    run = subparsers.add_parser("run", help="Run a command as an instrumented stage")
+    run.add_argument("--pipeline", default="quick_start")
+    run.add_argument("--stage", required=True)
+    run.add_argument("--run-id", default=os.environ.get(RUN_ID_ENV))
+    run.add_argument("--metrics-dir", default=os.environ.get(METRICS_DIR_ENV, DEFAULT_METRICS_DIR))
+    run.add_argument("--label", action="append", help="key=value label (repeatable)")
+    run.add_argument("--input", action="append", help="File/dir read by the stage (repeatable)")
+    run.add_argument("--output", action="append", help="File/dir written by the stage (repeatable)")
+    run.add_argument("--rows-in", type=int)
+    run.add_argument("--rows-out", type=int)
+    run.add_argument("command", nargs=argparse.REMAINDER)
+
+    show = subparsers.add_parser("show", help="Print the latest record of every stage")
+    show.add_argument("--metrics-dir", default=os.environ.get(METRICS_DIR_ENV, DEFAULT_METRICS_DIR))
+
+    args = parser.parse_args(argv)
+
+    if args.command_name == "run":
+        if args.command and args.command[0] == "--":
+            args.command = args.command[1:]
+        if not args.command:
+            parser.error("run: no command given")
+        return run_command(args)
+
+    for record in latest_stage_records(os.path.join(args.metrics_dir, JSONL_FILE)):
+        print(f"{record['pipeline']:20s} {format_stage(record)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,11 +13,10 @@ set -e  # Exit on error
 # Configuration - EDIT THESE PATHS
 # ============================================
 
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
 # Base directory for data
 DATA_DIR="${HOME}/nyc_taxi_data"
-RAW_DIR="${DATA_DIR}/raw"
-PROCESSED_DIR="${DATA_DIR}/processed"
-ZONES_DIR="${DATA_DIR}/zones"
 
 # Year and months to process
 YEAR="2024"
@@ -26,12 +25,35 @@ MONTHS=("01")  # Add more months: ("01" "02" "03" ... "12")
 # Taxi types
 TAXI_TYPES=("yellow" "green")
 
+# Concurrent downloads
+DOWNLOAD_WORKERS=4
+
 # Trino connection
 TRINO_HOST="localhost"
 TRINO_PORT="8080"
 TRINO_CATALOG="hive"
 TRINO_SCHEMA="nyc_taxi"
 
+# Settings of the shared config file (nyc_taxi.ini, see pipeline_config.py)
+# replace the defaults above; prints nothing when there is no config file
+if CONFIG_EXPORTS="$(python3 "${SCRIPT_DIR}/nyc_taxi_cli.py" config --shell 2>/dev/null)"; then
+    eval "${CONFIG_EXPORTS}"
+fi
+
+RAW_DIR="${DATA_DIR}/raw"
+PROCESSED_DIR="${DATA_DIR}/processed"
+ZONES_DIR="${DATA_DIR}/zones"
+
+# Pipeline metrics (JSON lines + Prometheus textfile)
+export NYC_TAXI_METRICS_DIR="${DATA_DIR}/metrics"
+export NYC_TAXI_RUN_ID="$(date +%Y%m%d%H%M%S)"
+export NYC_TAXI_CATALOG="${DATA_DIR}/trip_catalog.sqlite"
+export NYC_TAXI_ZONES="${ZONES_DIR}/taxi+_zone_lookup.csv"
+export NYC_TAXI_SKEW="${NYC_TAXI_SKEW:-static}"  # static | auto (extra full scan) | off
+export NYC_TAXI_QUARANTINE="${NYC_TAXI_QUARANTINE:-0}"  # sample rows kept per rejection rule
+export NYC_TAXI_SAMPLE="${NYC_TAXI_SAMPLE:-0}"  # stratified sample base rate (e.g. 0.01); 0 = off
+export NYC_TAXI_OD="${NYC_TAXI_OD:-1}"  # origin-destination matrices; 0 = off
+
 # ============================================
 # Functions
 # ============================================
@@ -51,6 +73,14 @@ print_success() {
     echo "[✓] $1"
 }
 
+# Run a command as an instrumented pipeline stage:
+#   run_stage <stage> [--label k=v ...] [--output path ...] -- <command ...>
+run_stage() {
+    local stage="$1"
+    shift
+    python3 "${SCRIPT_DIR}/pipeline_metrics.py" run --stage "${stage}" --label "year=${YEAR}" "$@"
+}
+
 print_error() {
     echo "[✗] $1"
 }
@@ -64,6 +94,7 @@ print_header "STEP 1: Setting up directories"
 mkdir -p "${RAW_DIR}"
 mkdir -p "${PROCESSED_DIR}"
 mkdir -p "${ZONES_DIR}"
+mkdir -p "${NYC_TAXI_METRICS_DIR}"
 
 print_success "Directories created:
   - Raw data: ${RAW_DIR}
@@ -76,36 +107,33 @@ print_success "Directories created:
 
 print_header "STEP 2: Downloading NYC Taxi data"
 
-cd "${RAW_DIR}"
-
-for taxi_type in "${TAXI_TYPES[@]}"; do
-    print_info "Downloading ${taxi_type} taxi data..."
-    
-    for month in "${MONTHS[@]}"; do
-        file_name="${taxi_type}_tripdata_${YEAR}-${month}.parquet"
-        url="https://d37ci6vzurychx.cloudfront.net/trip-data/${file_name}"
-        
-        if [ -f "${file_name}" ]; then
-            print_info "File exists: ${file_name} (skipping)"
-        else
-            print_info "Downloading: ${file_name}"
-            if wget -q "${url}"; then
-                print_success "Downloaded: ${file_name}"
-            else
-                print_error "Failed to download: ${file_name}"
-                # Try CSV format for older data
-                file_name="${taxi_type}_tripdata_${YEAR}-${month}.csv"
-                url="https://s3.amazonaws.com/nyc-tlc/trip+data/${file_name}"
-                print_info "Trying CSV format: ${file_name}"
-                if wget -q "${url}"; then
-                    print_success "Downloaded CSV: ${file_name}"
-                else
-                    print_error "Failed to download CSV version"
-                fi
-            fi
-        fi
-    done
-done
+# Parallel download with resume, size/checksum verification and retries.
+# Falls back to the CSV archive for months without a Parquet file.
+if run_stage download --input "${RAW_DIR}" --output "${RAW_DIR}" -- \
+        python3 "${SCRIPT_DIR}/download_trip_data.py" \
+        --taxi-types "${TAXI_TYPES[@]}" \
+        --year "${YEAR}" \
+        --months "${MONTHS[@]}" \
+        --output "${RAW_DIR}" \
+        --workers "${DOWNLOAD_WORKERS}"; then
+    print_success "All trip files downloaded and verified"
+else
+    print_error "Some trip files failed to download (see above); continuing with the rest"
+fi
+
+# Older months only exist as CSV: convert them once to sorted, typed Parquet
+# so aggregation never re-parses text
+if ls "${RAW_DIR}"/*_tripdata_*.csv >/dev/null 2>&1; then
+    print_info "Converting CSV files to Parquet..."
+    run_stage convert --input "${RAW_DIR}" -- \
+        python3 "${SCRIPT_DIR}/convert_to_parquet.py" "${RAW_DIR}/*_tripdata_*.csv"
+    print_success "CSV files converted to Parquet"
+fi
+
+# Record row counts, pickup time ranges and pickup zones of every file so
+# later stages can skip files that cannot match
+run_stage catalog --input "${RAW_DIR}" -- \
+    python3 "${SCRIPT_DIR}/trip_file_catalog.py" scan "${RAW_DIR}"
 
 # ============================================
 # STEP 3: Download Taxi Zones
@@ -150,102 +178,35 @@ if ! python3 -c "import pyspark" 2>/dev/null; then
     pip install pyspark
 fi
 
-print_info "Creating PySpark processing script..."
-
-# Create inline PySpark script
-cat > "${DATA_DIR}/process_data.py" << 'PYEOF'
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import substring, sum, avg, count
-import sys
-import os
-
-if len(sys.argv) < 5:
-    print("Usage: process_data.py <raw_dir> <output_dir> <year> <taxi_type>")
-    sys.exit(1)
-
-raw_dir = sys.argv[1]
-output_dir = sys.argv[2]
-year = sys.argv[3]
-taxi_type = sys.argv[4]
-
-spark = SparkSession.builder \
-    .appName("NYC Taxi Processing") \
-    .config("spark.driver.memory", "4g") \
-    .getOrCreate()
-
-print(f"Processing {taxi_type} taxi data for {year}")
-
-# Find all files for this type and year
-import glob
-pattern = f"{raw_dir}/{taxi_type}_tripdata_{year}-*.{{parquet,csv}}"
-files = glob.glob(pattern.replace('{parquet,csv}', 'parquet')) + \
-        glob.glob(pattern.replace('{parquet,csv}', 'csv'))
-
-if not files:
-    print(f"No files found matching pattern: {pattern}")
-    sys.exit(1)
-
-all_data = []
-
-for file_path in files:
-    print(f"Processing: {file_path}")
-    
-    if file_path.endswith('.parquet'):
-        df = spark.read.parquet(file_path)
-    else:
-        df = spark.read.csv(file_path, header=True, inferSchema=True)
-    
-    pickup_col = "tpep_pickup_datetime" if taxi_type == "yellow" else "lpep_pickup_datetime"
-    
-    aggregated = df.selectExpr(
-        f"substring({pickup_col}, 1, 13) as Pickup_Time",
-        "PULocationID as Pickup_Location",
-        "total_amount as Total_Amount",
-        "trip_distance as Trip_Distance",
-        "passenger_count as Passenger_Count",
-        "fare_amount as Fare_Amount",
-        "extra as Extra",
-        "tip_amount",
-        "tolls_amount"
-    ).filter(
-        f"{pickup_col} is not null and total_amount > 0 and trip_distance > 0"
-    ).groupBy("Pickup_Time", "Pickup_Location").agg(
-        sum("Total_Amount").alias("Total_Amount"),
-        avg("Total_Amount").alias("AVG_Total_Amount"),
-        sum("Trip_Distance").alias("Total_Trip_Distance"),
-        avg("Trip_Distance").alias("AVG_Trip_Distance"),
-        sum("Passenger_Count").alias("Total_Passenger_Count"),
-        avg("Passenger_Count").alias("AVG_Passenger_Count"),
-        sum("Fare_Amount").alias("Fare_Amount"),
-        sum("Extra").alias("Extra"),
-        sum("tip_amount").alias("tip_amount"),
-        sum("tolls_amount").alias("tolls_amount"),
-        count("*").alias("number")
-    )
-    
-    all_data.append(aggregated)
-
-# Combine all months
-from functools import reduce
-combined = reduce(lambda df1, df2: df1.union(df2), all_data)
-
-# Add taxi_type column
-from pyspark.sql.functions import lit
-combined = combined.withColumn("taxi_type", lit(taxi_type))
-
-# Save
-output_path = f"{output_dir}/{taxi_type}_{year}_aggregated"
-combined.write.mode("overwrite").parquet(output_path)
-
-print(f"Saved {combined.count()} rows to {output_path}")
-spark.stop()
-PYEOF
-
-# Run PySpark for each taxi type
-for taxi_type in "${TAXI_TYPES[@]}"; do
-    print_info "Processing ${taxi_type} taxi data with PySpark..."
-    python3 "${DATA_DIR}/process_data.py" "${RAW_DIR}" "${PROCESSED_DIR}" "${YEAR}" "${taxi_type}"
-    print_success "Processed ${taxi_type} taxi data"
+# Run PySpark once for all taxi types
+print_info "Processing ${TAXI_TYPES[*]} taxi data with PySpark..."
+run_stage aggregate --label "taxi_types=$(IFS=,; echo "${TAXI_TYPES[*]}")" \
+    --input "${RAW_DIR}" --output "${PROCESSED_DIR}/nyc_taxi_aggregated" -- \
+    python3 "${SCRIPT_DIR}/aggregate_trips.py" "${RAW_DIR}" "${PROCESSED_DIR}" "${YEAR}" "${TAXI_TYPES[@]}"
+print_success "Processed ${TAXI_TYPES[*]} taxi data into ${PROCESSED_DIR}/nyc_taxi_aggregated"
+
+# Files before mid-2016 have pickup/dropoff coordinates instead of zone IDs:
+# bin them into multi-zoom map tiles so map charts read cells, not raw points
+if [ "${YEAR}" -lt 2017 ]; then
+    GRID_INPUTS=()
+    for TAXI_TYPE in "${TAXI_TYPES[@]}"; do
+        GRID_INPUTS+=("${RAW_DIR}/${TAXI_TYPE}_tripdata_${YEAR}-*.parquet")
+    done
+    print_info "Binning trip coordinates into map grid tiles..."
+    run_stage spatial_grid --input "${RAW_DIR}" --output "${PROCESSED_DIR}/nyc_taxi_grid.parquet" -- \
+        python3 "${SCRIPT_DIR}/spatial_grid.py" "${GRID_INPUTS[@]}" \
+        --output "${PROCESSED_DIR}/nyc_taxi_grid.parquet"
+    print_success "Grid tiles saved to ${PROCESSED_DIR}/nyc_taxi_grid.parquet"
+fi
+
+# Advance the 7/28-day rolling zone metrics from the last processed day on
+# (ring buffers of daily partials, so this reads only the new aggregates)
+print_info "Updating rolling 7/28-day zone metrics..."
+for TAXI_TYPE in "${TAXI_TYPES[@]}"; do
+    run_stage rolling_metrics --label "taxi_type=${TAXI_TYPE}" \
+        --input "${PROCESSED_DIR}/nyc_taxi_aggregated" --output "${PROCESSED_DIR}/nyc_taxi_rolling_metrics" -- \
+        python3 "${SCRIPT_DIR}/rolling_metrics.py" --data "${PROCESSED_DIR}/nyc_taxi_aggregated" \
+        --output "${PROCESSED_DIR}/nyc_taxi_rolling_metrics" --taxi-type "${TAXI_TYPE}"
 done
 
 # ============================================
@@ -254,37 +215,8 @@ done
 
 print_header "STEP 5: Processing taxi zones with coordinates"
 
-cd "${ZONES_DIR}"
-
-cat > "process_zones.py" << 'PYEOF'
-import pandas as pd
-
-try:
-    import geopandas as gpd
-    zones_csv = pd.read_csv('taxi+_zone_lookup.csv')
-    zones_shp = gpd.read_file('taxi_zones.shp')
-    zones_shp['longitude'] = zones_shp.geometry.centroid.x
-    zones_shp['latitude'] = zones_shp.geometry.centroid.y
-    
-    zones_merged = zones_shp.merge(zones_csv, on='LocationID', how='left')
-    taxi_zones = zones_merged[['LocationID', 'Borough', 'Zone', 'service_zone', 'latitude', 'longitude']]
-    taxi_zones.to_csv('taxi_zones_with_coords.csv', index=False)
-    print(f"Created taxi_zones table with {len(taxi_zones)} zones")
-    
-except ImportError:
-    print("geopandas not found, using simple centroid calculation")
-    zones = pd.read_csv('taxi+_zone_lookup.csv')
-    # Add dummy coordinates (NYC approximate center)
-    zones['latitude'] = 40.7128
-    zones['longitude'] = -74.0060
-    zones[['LocationID', 'Borough', 'Zone', 'service_zone', 'latitude', 'longitude']].to_csv(
-        'taxi_zones_with_coords.csv', index=False
-    )
-    print(f"Created basic taxi_zones table with {len(zones)} zones")
-    print("Note: Install geopandas for accurate coordinates: pip install geopandas")
-PYEOF
-
-python3 process_zones.py
+run_stage process_zones --output "${ZONES_DIR}/taxi_zones_with_coords.csv" -- \
+    python3 "${SCRIPT_DIR}/zone_coordinates.py" --zones-dir "${ZONES_DIR}"
 print_success "Processed taxi zones"
 
 # ============================================
@@ -296,10 +228,26 @@ print_header "Data Pipeline Completed!"
 print_info "Summary:"
 echo "  - Raw data downloaded: ${RAW_DIR}"
 echo "  - Processed data: ${PROCESSED_DIR}"
+echo "  - Data-quality rejections: ${PROCESSED_DIR}/nyc_taxi_rejections"
+echo "  - Per-file aggregate state: ${PROCESSED_DIR}/nyc_taxi_aggregate_state"
+if [ "${YEAR}" -lt 2017 ]; then
+    echo "  - Map grid tiles: ${PROCESSED_DIR}/nyc_taxi_grid.parquet"
+fi
+echo "  - Rolling 7/28-day zone metrics: ${PROCESSED_DIR}/nyc_taxi_rolling_metrics"
+if [ "${NYC_TAXI_OD}" != "0" ]; then
+    echo "  - Origin-destination matrices: ${PROCESSED_DIR}/nyc_taxi_od_{hourly,daily,monthly}"
+fi
+if [ "${NYC_TAXI_SAMPLE}" != "0" ]; then
+    echo "  - Stratified sample: ${PROCESSED_DIR}/nyc_taxi_sample"
+fi
 echo "  - Taxi zones: ${ZONES_DIR}/taxi_zones_with_coords.csv"
+echo "  - Stage metrics: ${NYC_TAXI_METRICS_DIR}/pipeline_metrics.jsonl"
+echo "  - Prometheus textfile: ${NYC_TAXI_METRICS_DIR}/nyc_taxi_pipeline.prom"
+
+python3 "${SCRIPT_DIR}/pipeline_metrics.py" show
 
 print_header "Next Steps:"
-echo "1. Copy processed data to Trino-accessible location (HDFS/S3)"
+echo "1. Copy ${PROCESSED_DIR}/nyc_taxi_aggregated to a Trino-accessible location (HDFS/S3)"
 echo "2. Run create_tables.sql in Trino:"
 echo "   trino --server ${TRINO_HOST}:${TRINO_PORT} --catalog ${TRINO_CATALOG} --schema ${TRINO_SCHEMA} -f create_tables.sql"
 echo "3. Verify tables:"
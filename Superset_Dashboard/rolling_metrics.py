@@ -0,0 +1,308 @@
+"""
+Incrementally Maintained Rolling-Window Metrics per Pickup Zone
+7-day and 28-day moving averages of trips and revenue per zone (the trend
+charts of advanced_chart_ideas.md) used to be window functions over the
+whole aggregated history on every query. This module keeps the windows as
+state instead: for every zone a ring buffer of the last 28 daily partials
+and a running sum per window. Advancing one day adds the new day's partial
+and subtracts the one leaving each window, so an update costs O(new days x
+zones) whatever the length of the history
+
+    day d:   sum_7  += partial[d] - partial[d - 7]
+             sum_28 += partial[d] - partial[d - 28]    (the slot being reused)
+
+The state is saved next to the output (numpy .npz) and every run reads
+only the aggregates from the last processed day on; that day is re-read
+and replaced, so hours that land during a day update it in place. Partials
+of days still inside the ring (late trips, see partition_upsert.py) are
+replaced and corrected in the running sums when re-read with --since;
+rows already written for the days between are not re-emitted. Older
+revisions need --rebuild.
+
+Output (nyc_taxi_rolling_metrics, one row per day and zone with activity in
+the last 28 days, partitioned by taxi_type and Pickup_Month):
+    Pickup_Day, Pickup_Hour_Key (first hour of the day), Pickup_Location,
+    Trips_7d, Revenue_7d, Avg_Daily_Trips_7d, Avg_Daily_Revenue_7d, ..._28d
+
+Usage:
+    python rolling_metrics.py --data ~/nyc_taxi_data/processed/nyc_taxi_aggregated \\
+        --output ~/nyc_taxi_data/processed/nyc_taxi_rolling_metrics --taxi-type yellow
+
+Requirements: pip install pyarrow numpy
+"""
+
+import argparse
+import os
+import shutil
+import sys
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pipeline_metrics import report_rows
+from time_keys import HOUR_KEY_COLUMN, hour_key, hour_key_to_datetime
+
+NUM_LOCATIONS = 265
+LOCATION_COLUMN = "Pickup_Location"
+
+# Output name -> additive aggregate column (skew_aggregation.HOURLY_MEASURES)
+ROLLING_MEASURES: Dict[str, str] = {
+    "Trips": "number",
+    "Revenue": "Total_Amount",
+}
+WINDOWS = (7, 28)
+
+ALL_TYPES = "all"
+STATE_FILE = "_rolling_state_{scope}.npz"
+OUTPUT_FILE = "rolling.parquet"
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+# ============================================
+# Ring buffers
+# ============================================
+
+class RollingWindows:
+    """Ring buffer of daily partials per zone with a running sum per window"""
+
+    def __init__(self, measures: Sequence[str] = tuple(ROLLING_MEASURES),
+                 windows: Sequence[int] = WINDOWS, zones: int = NUM_LOCATIONS + 1):
+        self.measures = list(measures)
+        self.windows = tuple(sorted(windows))
+        self.size = self.windows[-1]
+        self.ring = np.zeros((self.size, zones, len(self.measures)))
+        self.sums = np.zeros((len(self.windows), zones, len(self.measures)))
+        self.last_day: Optional[int] = None
+        self.stale_days = 0
+
+    def _advance(self, day: int):
+        """Move the windows' end to day, whose partial starts empty"""
+        for i, window in enumerate(self.windows):
+            self.sums[i] -= self.ring[(day - window) % self.size]
+        self.ring[day % self.size] = 0
+        self.last_day = day
+
+    def _replace(self, day: int, partials: np.ndarray):
+        """Set a day's partials (zones x measures), correcting the windows that contain it"""
+        slot = day % self.size
+        delta = partials - self.ring[slot]
+        self.ring[slot] = partials
+        for i, window in enumerate(self.windows):
+            if self.last_day - day < window:
+                self.sums[i] += delta
+
+    def update(self, daily: Dict[int, np.ndarray]) -> Iterator[int]:
+        """
+        Apply daily partials in day order, yielding every day whose window
+        values (self.sums) are current at that moment: new days, days
+        without data in between (as the windows decay) and a replaced last day
+        """
+        for day in sorted(daily):
+            if self.last_day is not None and day <= self.last_day - self.size:
+                self.stale_days += 1
+                continue
+            if self.last_day is None:
+                self.last_day = day - 1
+
+            while self.last_day < day:
+                if day - self.last_day > self.size and not self.ring.any():
+                    # Windows are empty and stay empty until the next data
+                    self.sums[:] = 0
+                    self.last_day = day - 1
+                    continue
+                self._advance(self.last_day + 1)
+                if self.last_day < day:
+                    yield self.last_day
+
+            # Late partials of older days in the ring only correct the sums
+            self._replace(day, daily[day])
+            if day == self.last_day:
+                yield day
+
+    def window_sums(self, day: int) -> np.ndarray:
+        """Exact window sums ending at a day still inside the ring"""
+        sums = np.zeros_like(self.sums)
+        for i, window in enumerate(self.windows):
+            for past in range(max(day - window + 1, self.last_day - self.size + 1), day + 1):
+                sums[i] += self.ring[past % self.size]
+        return sums
+
+    def resync(self):
+        """Recompute the running sums from the ring (drops float drift)"""
+        if self.last_day is not None:
+            self.sums = self.window_sums(self.last_day)
+
+    def save(self, path: str):
+        self.resync()
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, ring=self.ring, sums=self.sums, last_day=-1 if self.last_day is None else self.last_day,
+                 measures=np.array(self.measures), windows=np.array(self.windows))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, measures: Sequence[str] = tuple(ROLLING_MEASURES),
+             windows: Sequence[int] = WINDOWS) -> "RollingWindows":
+        """
+        Raises:
+            ValueError: If the saved state has other measures or windows
+        """
+        state = cls(measures, windows)
+        with np.load(path) as saved:
+            if list(saved["measures"]) != state.measures or tuple(saved["windows"]) != state.windows:
+                raise ValueError(f"{path} holds other measures/windows; run with --rebuild")
+            state.ring = saved["ring"]
+            state.sums = saved["sums"]
+            state.last_day = int(saved["last_day"]) if int(saved["last_day"]) >= 0 else None
+        return state
+
+
+# ============================================
+# Input / output
+# ============================================
+
+def read_daily_partials(data_path: str, since_day: Optional[int] = None,
+                        taxi_type: Optional[str] = None,
+                        measures: Dict[str, str] = ROLLING_MEASURES) -> Dict[int, np.ndarray]:
+    """Day -> (zones x measures) sums of the hourly aggregates from since_day on"""
+    dataset = ds.dataset(data_path, format="parquet", partitioning="hive")
+    condition = ds.field(HOUR_KEY_COLUMN).is_valid()
+    if since_day is not None:
+        since = hour_key_to_datetime(since_day * 24)
+        condition &= ((ds.field("Pickup_Month") >= since.strftime("%Y-%m"))
+                      & (ds.field(HOUR_KEY_COLUMN) >= since_day * 24))
+    if taxi_type is not None:
+        condition &= ds.field("taxi_type") == taxi_type
+    table = dataset.to_table(columns=[HOUR_KEY_COLUMN, LOCATION_COLUMN, *measures.values()],
+                             filter=condition)
+    if not table.num_rows:
+        return {}
+
+    days = table[HOUR_KEY_COLUMN].to_numpy().astype(np.int64) // 24
+    zones = pc.fill_null(table[LOCATION_COLUMN], 0).to_numpy().astype(np.int64)
+    first_day, zone_count = int(days.min()), NUM_LOCATIONS + 1
+    cells = (days - first_day) * zone_count + zones
+    day_count = int(days.max()) - first_day + 1
+
+    partials = np.stack([
+        np.bincount(cells, weights=pc.fill_null(table[column], 0).to_numpy().astype(np.float64),
+                    minlength=day_count * zone_count).reshape(day_count, zone_count)
+        for column in measures.values()], axis=-1)
+    present = np.unique(days - first_day)
+    return {first_day + int(offset): partials[offset] for offset in present}
+
+
+def window_rows(state: RollingWindows, day: int) -> pa.Table:
+    """Output rows of one day: zones with activity in the longest window"""
+    active = np.nonzero(state.sums[-1][:, 0])[0]
+    columns = {
+        "Pickup_Day": pa.array(np.full(len(active), day, dtype=np.int32)).cast(pa.date32()),
+        HOUR_KEY_COLUMN: pa.array(np.full(len(active), day * 24, dtype=np.int32)),
+        LOCATION_COLUMN: pa.array(active.astype(np.int16)),
+    }
+    for w, window in enumerate(state.windows):
+        for m, name in enumerate(state.measures):
+            total = state.sums[w][active, m]
+            columns[f"{name}_{window}d"] = pa.array(total)
+            columns[f"Avg_Daily_{name}_{window}d"] = pa.array(total / window)
+    return pa.table(columns)
+
+
+def upsert_month_files(output_dir: str, scope: str, table: pa.Table) -> int:
+    """Replace the given days in the output's month files; returns files written"""
+    months = pc.strftime(pc.cast(table["Pickup_Day"], pa.timestamp("s")), format="%Y-%m")
+    written = 0
+    for month in pc.unique(months).to_pylist():
+        rows = table.filter(pc.equal(months, month))
+        directory = os.path.join(output_dir, f"taxi_type={scope}", f"Pickup_Month={month}")
+        path = os.path.join(directory, OUTPUT_FILE)
+        if os.path.exists(path):
+            existing = pq.read_table(path)
+            kept = existing.filter(pc.invert(pc.is_in(existing["Pickup_Day"], value_set=pc.unique(rows["Pickup_Day"]))))
+            rows = pa.concat_tables([kept, rows.cast(existing.schema)])
+        rows = rows.sort_by([("Pickup_Day", "ascending"), (LOCATION_COLUMN, "ascending")])
+
+        os.makedirs(directory, exist_ok=True)
+        pq.write_table(rows, f"{path}.tmp", compression="snappy")
+        os.replace(f"{path}.tmp", path)
+        written += 1
+    return written
+
+
+def advance(data_path: str, output_dir: str, taxi_type: Optional[str] = None,
+            rebuild: bool = False, since=None) -> Tuple[int, int]:
+    """
+    Bring the rolling metrics of one taxi type (or all types) up to date
+
+    Returns:
+        (days emitted, month files written)
+    """
+    scope = taxi_type or ALL_TYPES
+    state_path = os.path.join(output_dir, STATE_FILE.format(scope=scope))
+    if rebuild:
+        shutil.rmtree(os.path.join(output_dir, f"taxi_type={scope}"), ignore_errors=True)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+    state = RollingWindows.load(state_path) if os.path.exists(state_path) else RollingWindows()
+    since_day = state.last_day
+    if since is not None and since_day is not None:
+        since_day = min(since_day, hour_key(since) // 24)
+    daily = read_daily_partials(data_path, since_day, taxi_type)
+
+    tables = [window_rows(state, day) for day in state.update(daily)]
+    if state.stale_days:
+        print_info(f"Skipped {state.stale_days} days older than the {state.size}-day ring; "
+                   f"run with --rebuild to include them")
+    if not tables:
+        return 0, 0
+
+    rows = pa.concat_tables(tables)
+    written = upsert_month_files(output_dir, scope, rows)
+    os.makedirs(output_dir, exist_ok=True)
+    state.save(state_path)
+    report_rows(rows_out=rows.num_rows)
+    return len(tables), written
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Advance the rolling 7/28-day zone metrics")
+    parser.add_argument("--data", required=True, help="nyc_taxi_aggregated directory")
+    parser.add_argument("--output", required=True, help="Rolling metrics directory")
+    parser.add_argument("--taxi-type", help="Taxi type (default: all types combined)")
+    parser.add_argument("--since", help="Also re-read days from this date on, e.g. after late trips")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the state and start over")
+    args = parser.parse_args(argv)
+
+    data_path = os.path.expanduser(args.data)
+    output_dir = os.path.expanduser(args.output)
+    try:
+        days, files = advance(data_path, output_dir, args.taxi_type, args.rebuild, args.since)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print_error(f"Failed to update rolling metrics: {e}")
+        return 1
+
+    if days:
+        print_success(f"Rolling metrics ({args.taxi_type or ALL_TYPES}): {days} days emitted, "
+                      f"{files} month files updated")
+    else:
+        print_info("Rolling metrics already up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
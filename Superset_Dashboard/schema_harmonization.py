@@ -0,0 +1,350 @@
+"""
+Era-Aware Schema Harmonization for NYC Taxi Trip Files
+TLC trip files have changed schema several times: 2009 yellow files use
+Trip_Pickup_DateTime / Total_Amt / Start_Lon, 2010-2014 use pickup_datetime
+with coordinates, 2015+ use tpep_/lpep_ timestamps and PULocationID, and
+FHV/FHVHV files have their own columns. This module maps every era to one
+canonical column set, and reads all files of the same era, format and
+physical column types with a single multi-path Spark read, so a multi-year
+job is a handful of flat scans rather than one union per file, and never
+fails halfway on a missing column
+
+    from schema_harmonization import read_harmonized
+    trips = read_harmonized(spark, files)      # canonical columns only
+    trips.groupBy("pickup_location").count()
+
+Requirements: pip install pyarrow (pyspark for read_harmonized, pandas for
+harmonize_frame)
+"""
+
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from trip_file_catalog import detect_schema_version
+
+# Canonical column -> Spark SQL type
+CANONICAL_COLUMNS: Dict[str, str] = {
+    "vendor": "string",
+    "pickup_datetime": "timestamp",
+    "dropoff_datetime": "timestamp",
+    "pickup_location": "int",
+    "dropoff_location": "int",
+    "pickup_longitude": "double",
+    "pickup_latitude": "double",
+    "dropoff_longitude": "double",
+    "dropoff_latitude": "double",
+    "passenger_count": "int",
+    "trip_distance": "double",
+    "payment_type": "string",
+    "fare_amount": "double",
+    "extra": "double",
+    "tip_amount": "double",
+    "tolls_amount": "double",
+    "total_amount": "double",
+}
+
+# A source is a (lower-case) column name, or a tuple of columns that are
+# summed with NULL treated as 0. Canonical columns missing from an era are NULL.
+Source = Union[str, Tuple[str, ...]]
+
+_MODERN_MONEY: Dict[str, Source] = {
+    "passenger_count": "passenger_count",
+    "trip_distance": "trip_distance",
+    "payment_type": "payment_type",
+    "fare_amount": "fare_amount",
+    "extra": "extra",
+    "tip_amount": "tip_amount",
+    "tolls_amount": "tolls_amount",
+    "total_amount": "total_amount",
+}
+
+_ZONES: Dict[str, Source] = {
+    "pickup_location": "pulocationid",
+    "dropoff_location": "dolocationid",
+}
+
+_COORDINATES: Dict[str, Source] = {
+    "pickup_longitude": "pickup_longitude",
+    "pickup_latitude": "pickup_latitude",
+    "dropoff_longitude": "dropoff_longitude",
+    "dropoff_latitude": "dropoff_latitude",
+}
+
+ERA_MAPPINGS: Dict[str, Dict[str, Source]] = {
+    "yellow_2009": {
+        "vendor": "vendor_name",
+        "pickup_datetime": "trip_pickup_datetime",
+        "dropoff_datetime": "trip_dropoff_datetime",
+        "pickup_longitude": "start_lon",
+        "pickup_latitude": "start_lat",
+        "dropoff_longitude": "end_lon",
+        "dropoff_latitude": "end_lat",
+        "passenger_count": "passenger_count",
+        "trip_distance": "trip_distance",
+        "payment_type": "payment_type",
+        "fare_amount": "fare_amt",
+        "extra": "surcharge",
+        "tip_amount": "tip_amt",
+        "tolls_amount": "tolls_amt",
+        "total_amount": "total_amt",
+    },
+    "yellow_2010": {
+        "vendor": "vendor_id",
+        "pickup_datetime": "pickup_datetime",
+        "dropoff_datetime": "dropoff_datetime",
+        **_COORDINATES,
+        **_MODERN_MONEY,
+        "extra": "surcharge",
+    },
+    "yellow": {
+        "vendor": "vendorid",
+        "pickup_datetime": "tpep_pickup_datetime",
+        "dropoff_datetime": "tpep_dropoff_datetime",
+        **_ZONES,
+        **_MODERN_MONEY,
+    },
+    "yellow_coords": {
+        "vendor": "vendorid",
+        "pickup_datetime": "tpep_pickup_datetime",
+        "dropoff_datetime": "tpep_dropoff_datetime",
+        **_COORDINATES,
+        **_MODERN_MONEY,
+    },
+    "green": {
+        "vendor": "vendorid",
+        "pickup_datetime": "lpep_pickup_datetime",
+        "dropoff_datetime": "lpep_dropoff_datetime",
+        **_ZONES,
+        **_MODERN_MONEY,
+    },
+    "green_coords": {
+        "vendor": "vendorid",
+        "pickup_datetime": "lpep_pickup_datetime",
+        "dropoff_datetime": "lpep_dropoff_datetime",
+        **_COORDINATES,
+        **_MODERN_MONEY,
+    },
+    "fhvhv": {
+        "vendor": "hvfhs_license_num",
+        "pickup_datetime": "pickup_datetime",
+        "dropoff_datetime": "dropoff_datetime",
+        **_ZONES,
+        "trip_distance": "trip_miles",
+        "fare_amount": "base_passenger_fare",
+        "tip_amount": "tips",
+        "tolls_amount": "tolls",
+        "extra": ("bcf", "sales_tax", "congestion_surcharge", "airport_fee"),
+        "total_amount": ("base_passenger_fare", "tolls", "bcf", "sales_tax",
+                         "congestion_surcharge", "airport_fee", "tips"),
+    },
+    "fhv": {
+        "vendor": "dispatching_base_num",
+        "pickup_datetime": "pickup_datetime",
+        "dropoff_datetime": "dropoff_datetime",
+        **_ZONES,
+    },
+}
+
+
+# Trip type of each era; added to every row as taxi_type
+ERA_TAXI_TYPES: Dict[str, str] = {
+    "yellow_2009": "yellow",
+    "yellow_2010": "yellow",
+    "yellow": "yellow",
+    "yellow_coords": "yellow",
+    "green": "green",
+    "green_coords": "green",
+    "fhvhv": "fhvhv",
+    "fhv": "fhv",
+}
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+def file_columns(path: str) -> List[str]:
+    """Column names of a Parquet or CSV trip file (reads only the header/footer)"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    with open(path, newline="") as f:
+        return [name.strip() for name in f.readline().rstrip("\r\n").split(",")]
+
+
+def parquet_physical_schema(path: str) -> Tuple[Tuple[str, str], ...]:
+    """(lower-case name, Arrow type) of every column in a Parquet footer"""
+    import pyarrow.parquet as pq
+    return tuple((field.name.lower(), str(field.type)) for field in pq.read_schema(path))
+
+
+def file_schema_version(path: str, catalog=None) -> Optional[str]:
+    """Schema era of a file, from the catalog when available, else its header"""
+    if catalog is not None:
+        row = catalog.conn.execute("SELECT schema_version FROM trip_files WHERE path = ?",
+                                   (os.path.abspath(path),)).fetchone()
+        if row is not None and row["schema_version"]:
+            return row["schema_version"]
+    return detect_schema_version(file_columns(path))
+
+
+def group_files_by_era(paths: Iterable[str], catalog=None) -> Dict[Tuple[str, str], List[str]]:
+    """
+    Group files by (schema era, file format)
+
+    Raises:
+        ValueError: If a file matches no known era
+    """
+    groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+    for path in paths:
+        era = file_schema_version(path, catalog)
+        if era is None:
+            raise ValueError(f"Unrecognized trip file schema: {path}")
+        file_format = "parquet" if path.endswith(".parquet") else "csv"
+        groups[(era, file_format)].append(path)
+    return dict(groups)
+
+
+# ============================================
+# Spark
+# ============================================
+
+def _source_sql(source: Source, present: set) -> Optional[str]:
+    if isinstance(source, tuple):
+        parts = [f"coalesce(`{name}`, 0)" for name in source if name in present]
+        return " + ".join(parts) if parts else None
+    return f"`{source}`" if source in present else None
+
+
+def canonical_exprs(era: str, columns: Iterable[str]) -> List[str]:
+    """
+    Spark SQL select expressions that turn an era's columns into the
+    canonical column set plus taxi_type (missing sources become typed NULLs)
+    """
+    present = {name.lower() for name in columns}
+    mapping = ERA_MAPPINGS[era]
+
+    exprs = []
+    for name, sql_type in CANONICAL_COLUMNS.items():
+        source = mapping.get(name)
+        sql = _source_sql(source, present) if source is not None else None
+        exprs.append(f"CAST({sql or 'NULL'} AS {sql_type}) AS {name}")
+    exprs.append(f"'{ERA_TAXI_TYPES[era]}' AS taxi_type")
+    return exprs
+
+
+def read_era(spark, era: str, file_format: str, paths: List[str]):
+    """
+    Same-era files projected to canonical columns
+
+    Parquet files of one era can still differ in physical types: TLC files
+    store int64/double where convert_to_parquet writes int8/int16, and a
+    single multi-path read would take one footer's schema for all of them.
+    Files are therefore read once per distinct physical schema, each scan is
+    cast to the canonical types, and the scans are combined by name.
+    """
+    if file_format != "parquet":
+        # Types come from the canonical CASTs, so schema inference is skipped
+        df = spark.read.csv(paths, header=True)
+        return df.selectExpr(*canonical_exprs(era, df.columns))
+
+    by_schema: Dict[Tuple[Tuple[str, str], ...], List[str]] = defaultdict(list)
+    for path in paths:
+        by_schema[parquet_physical_schema(path)].append(path)
+
+    combined = None
+    for group in by_schema.values():
+        df = spark.read.parquet(*group)
+        df = df.selectExpr(*canonical_exprs(era, df.columns))
+        combined = df if combined is None else combined.unionByName(df)
+    return combined
+
+
+def read_harmonized(spark, paths: Iterable[str], catalog=None):
+    """
+    Read trip files of any mix of eras as one DataFrame of canonical columns
+
+    Files are grouped by (era, format, physical Parquet schema); each group is
+    a single multi-path scan and the few resulting scans are combined with unionByName. Files of
+    several trip types can be read together; every row carries taxi_type.
+    """
+    groups = group_files_by_era(paths, catalog)
+    frames = []
+    for (era, file_format), group in sorted(groups.items()):
+        print_info(f"{era} ({file_format}): {len(group)} files")
+        frames.append(read_era(spark, era, file_format, group))
+
+    if not frames:
+        raise ValueError("No trip files to read")
+    combined = frames[0]
+    for frame in frames[1:]:
+        combined = combined.unionByName(frame)
+    return combined
+
+
+# ============================================
+# pandas
+# ============================================
+
+def harmonize_frame(df, era: Optional[str] = None):
+    """
+    pandas equivalent of canonical_exprs(): a new frame with the canonical
+    columns (source columns matched case-insensitively)
+    """
+    import pandas as pd
+
+    era = era or detect_schema_version(df.columns)
+    if era not in ERA_MAPPINGS:
+        raise ValueError(f"Unrecognized trip frame schema: {list(df.columns)}")
+    lower = {name.lower(): name for name in df.columns}
+    mapping = ERA_MAPPINGS[era]
+
+    out = {}
+    for name, sql_type in CANONICAL_COLUMNS.items():
+        source = mapping.get(name)
+        if isinstance(source, tuple):
+            parts = [pd.to_numeric(df[lower[s]], errors="coerce").fillna(0)
+                     for s in source if s in lower]
+            values = sum(parts) if parts else None
+        else:
+            values = df[lower[source]] if source in lower else None
+
+        if values is None:
+            out[name] = pd.Series(pd.NA, index=df.index, dtype="object")
+        elif sql_type == "timestamp":
+            out[name] = pd.to_datetime(values, errors="coerce")
+        elif sql_type == "int":
+            out[name] = pd.to_numeric(values, errors="coerce").round().astype("Int64")
+        elif sql_type == "double":
+            out[name] = pd.to_numeric(values, errors="coerce").astype("float64")
+        else:
+            out[name] = values.astype("string")
+    out["taxi_type"] = ERA_TAXI_TYPES[era]
+    return pd.DataFrame(out, index=df.index)
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Show the detected era and canonical mapping of trip files"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show schema eras of trip files")
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    try:
+        groups = group_files_by_era(args.paths)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+
+    for (era, file_format), paths in sorted(groups.items()):
+        print(f"\n{era} ({file_format}): {len(paths)} files")
+        for name, source in ERA_MAPPINGS[era].items():
+            print(f"  {name:18s} <- {' + '.join(source) if isinstance(source, tuple) else source}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Skew-Aware Hourly Aggregation for the NYC Taxi Spark Jobs
+The pickup hour x PULocationID groupBy is heavily skewed: airports and
+Midtown zones produce a few huge keys while outer-borough zones are tiny, so
+a handful of straggler tasks dominate the job. This module detects heavy
+keys (from a sample, or from a supplied list) and aggregates them in two
+steps - a salted partial aggregation that spreads each heavy key over
+several tasks, then a final merge - and sizes shuffle partitions to the
+input, so job time tracks the average load rather than the worst zone
+
+All measures are expressed as mergeable partial state (sums and non-null
+counts); averages are computed only in the final step, so the result is
+identical to a plain groupBy.
+
+    from skew_aggregation import tune_shuffle_partitions, hourly_aggregate
+    tune_shuffle_partitions(spark, input_bytes)
+    aggregated = hourly_aggregate(trips, skew="static")
+
+Requirements: pip install pyspark
+"""
+
+import math
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql import functions as F
+
+# Output measures of the hourly aggregate: (output column, function, input column)
+# Input columns are the canonical names produced by aggregate_trips.py's selectExpr
+HOURLY_MEASURES: List[Tuple[str, str, str]] = [
+    ("Total_Amount", "sum", "Total_Amount"),
+    ("AVG_Total_Amount", "avg", "Total_Amount"),
+    ("Total_Trip_Distance", "sum", "Trip_Distance"),
+    ("AVG_Trip_Distance", "avg", "Trip_Distance"),
+    ("Total_Passenger_Count", "sum", "Passenger_Count"),
+    ("AVG_Passenger_Count", "avg", "Passenger_Count"),
+    ("Fare_Amount", "sum", "Fare_Amount"),
+    ("Extra", "sum", "Extra"),
+    ("tip_amount", "sum", "tip_amount"),
+    ("tolls_amount", "sum", "tolls_amount"),
+    ("number", "count_rows", None),
+    # Non-null counts behind the averages, so aggregates stay mergeable (merge_aggregates)
+    ("Count_Total_Amount", "count", "Total_Amount"),
+    ("Count_Trip_Distance", "count", "Trip_Distance"),
+    ("Count_Passenger_Count", "count", "Passenger_Count"),
+]
+
+# Integer hour key (time_keys.py) rather than the formatted Pickup_Time string
+HOURLY_KEYS = ["Pickup_Hour_Key", "Pickup_Location"]
+
+# Target bytes of input per shuffle partition
+TARGET_PARTITION_BYTES = 128 * 1024 * 1024
+MIN_SHUFFLE_PARTITIONS = 8
+MAX_SHUFFLE_PARTITIONS = 4000
+
+# Zones that dominate pickups in every year of TLC data: JFK, LaGuardia and
+# the busiest Midtown / Upper East Side zones (used by skew='static')
+KNOWN_HOT_ZONES = [132, 138, 161, 162, 170, 186, 230, 236, 237]
+
+SKEW_MODES = ("auto", "static", "off")
+SKEW_ENV = "NYC_TAXI_SKEW"
+
+DEFAULT_SALT_BUCKETS = 16
+DEFAULT_SAMPLE_FRACTION = 0.01
+# A key is heavy if it holds more than this multiple of the average key's rows
+DEFAULT_HEAVY_FACTOR = 20.0
+
+
+def tune_shuffle_partitions(spark: SparkSession, input_bytes: int,
+                            target_partition_bytes: int = TARGET_PARTITION_BYTES) -> int:
+    """
+    Size spark.sql.shuffle.partitions to the input and enable adaptive execution
+
+    Small monthly runs get few partitions (no thousands of empty tasks);
+    multi-year runs get enough that no partition exceeds the target size.
+    AQE then coalesces partitions that end up small after the aggregation.
+
+    Returns:
+        The number of shuffle partitions set
+    """
+    cores = spark.sparkContext.defaultParallelism
+    partitions = max(math.ceil(input_bytes / target_partition_bytes), cores * 2)
+    partitions = max(MIN_SHUFFLE_PARTITIONS, min(MAX_SHUFFLE_PARTITIONS, partitions))
+
+    spark.conf.set("spark.sql.shuffle.partitions", str(partitions))
+    spark.conf.set("spark.sql.adaptive.enabled", "true")
+    spark.conf.set("spark.sql.adaptive.coalescePartitions.enabled", "true")
+    spark.conf.set("spark.sql.adaptive.advisoryPartitionSizeInBytes", str(target_partition_bytes // 2))
+    spark.conf.set("spark.sql.adaptive.skewJoin.enabled", "true")
+    return partitions
+
+
+def detect_heavy_keys(df: DataFrame,
+                      key_col: str = "Pickup_Location",
+                      sample_fraction: float = DEFAULT_SAMPLE_FRACTION,
+                      heavy_factor: float = DEFAULT_HEAVY_FACTOR,
+                      seed: int = 42) -> List:
+    """
+    Find key values whose row count is far above average, from a sample
+
+    Skew in this data comes from the pickup zone (hours are roughly even), so
+    detection runs on key_col alone. The sample still scans every input row
+    (Bernoulli sampling cannot skip row groups), so 'auto' costs one extra
+    pass over the trip files; the pipeline defaults to 'static'.
+
+    Returns:
+        Heavy key values (may be empty)
+    """
+    counts = (df.sample(withReplacement=False, fraction=sample_fraction, seed=seed)
+              .groupBy(key_col).count()
+              .collect())
+    if not counts:
+        return []
+    average = sum(row["count"] for row in counts) / len(counts)
+    return [row[key_col] for row in counts
+            if row[key_col] is not None and row["count"] > heavy_factor * average]
+
+
+def _partial_columns(measures: Sequence[Tuple[str, str, str]]):
+    """Mergeable partial state for every measure: sums and non-null counts"""
+    partials = {}
+    for _, func, column in measures:
+        if func in ("sum", "avg"):
+            partials[f"__sum_{column}"] = F.sum(column)
+        if func in ("avg", "count"):
+            partials[f"__cnt_{column}"] = F.count(column)
+        if func == "count_rows":
+            partials["__rows"] = F.count(F.lit(1))
+    return partials
+
+
+def _final_columns(measures: Sequence[Tuple[str, str, str]]):
+    columns = []
+    for name, func, column in measures:
+        if func == "sum":
+            columns.append(F.col(f"__sum_{column}").alias(name))
+        elif func == "avg":
+            columns.append((F.col(f"__sum_{column}") / F.col(f"__cnt_{column}")).alias(name))
+        elif func == "count":
+            columns.append(F.col(f"__cnt_{column}").alias(name))
+        elif func == "count_rows":
+            columns.append(F.col("__rows").alias(name))
+    return columns
+
+
+def plain_aggregate(df: DataFrame,
+                    keys: Sequence[str] = HOURLY_KEYS,
+                    measures: Sequence[Tuple[str, str, str]] = HOURLY_MEASURES) -> DataFrame:
+    """Single-step groupBy over the measures (no salting)"""
+    aggs = []
+    for name, func, column in measures:
+        if func == "sum":
+            aggs.append(F.sum(column).alias(name))
+        elif func == "avg":
+            aggs.append(F.avg(column).alias(name))
+        elif func == "count":
+            aggs.append(F.count(column).alias(name))
+        elif func == "count_rows":
+            aggs.append(F.count(F.lit(1)).alias(name))
+    return df.groupBy(*keys).agg(*aggs)
+
+
+def salted_aggregate(df: DataFrame,
+                     heavy_keys: Iterable,
+                     keys: Sequence[str] = HOURLY_KEYS,
+                     measures: Sequence[Tuple[str, str, str]] = HOURLY_MEASURES,
+                     skew_col: str = "Pickup_Location",
+                     salt_buckets: int = DEFAULT_SALT_BUCKETS) -> DataFrame:
+    """
+    Two-step aggregation that spreads heavy keys over salt_buckets tasks
+
+    Rows whose skew_col is heavy get a random salt in [0, salt_buckets);
+    all other rows get salt 0, so light keys are not split at all. Step one
+    aggregates partial state by (keys, salt); step two merges the (at most
+    salt_buckets) partials per key and computes the final measures.
+    """
+    heavy_keys = list(heavy_keys)
+    if not heavy_keys:
+        return plain_aggregate(df, keys, measures)
+
+    salt = F.when(F.col(skew_col).isin(heavy_keys),
+                  (F.rand(seed=17) * salt_buckets).cast("int")).otherwise(F.lit(0))
+
+    partials = _partial_columns(measures)
+    partial = (df.withColumn("__salt", salt)
+               .groupBy(*keys, "__salt")
+               .agg(*[expr.alias(name) for name, expr in partials.items()]))
+
+    merged = partial.groupBy(*keys).agg(*[F.sum(name).alias(name) for name in partials])
+    return merged.select(*keys, *_final_columns(measures))
+
+
+def state_columns(measures: Sequence[Tuple[str, str, str]] = HOURLY_MEASURES) -> List[str]:
+    """Output columns that merge by summing (everything but the averages)"""
+    return [name for name, func, _ in measures if func != "avg"]
+
+
+def merge_aggregates(df: DataFrame,
+                     keys: Sequence[str] = HOURLY_KEYS,
+                     measures: Sequence[Tuple[str, str, str]] = HOURLY_MEASURES) -> DataFrame:
+    """
+    Merge rows of an hourly aggregate that share keys, e.g. one hour's rows
+    from several source files
+
+    Sums and counts add up; every average is recomputed from the sum and
+    non-null count of its input column, which must both be measures.
+
+    Raises:
+        ValueError: If an average has no matching sum and count measure
+    """
+    outputs = {(func, column): name for name, func, column in measures}
+    merged = df.groupBy(*keys).agg(*[F.sum(name).alias(name) for name in state_columns(measures)])
+
+    columns = []
+    for name, func, column in measures:
+        if func != "avg":
+            columns.append(F.col(name))
+            continue
+        if ("sum", column) not in outputs or ("count", column) not in outputs:
+            raise ValueError(f"Average {name} needs a sum and a count of {column} to be mergeable")
+        columns.append((F.col(outputs[("sum", column)]) / F.col(outputs[("count", column)])).alias(name))
+    return merged.select(*keys, *columns)
+
+
+def hourly_aggregate(df: DataFrame,
+                     keys: Sequence[str] = HOURLY_KEYS,
+                     skew: str = "static",
+                     heavy_keys: Optional[Iterable] = None,
+                     salt_buckets: int = DEFAULT_SALT_BUCKETS,
+                     sample_fraction: float = DEFAULT_SAMPLE_FRACTION) -> DataFrame:
+    """
+    Hourly Pickup_Hour_Key x Pickup_Location aggregate with optional skew handling
+
+    Args:
+        df: Trips with the canonical columns of aggregate_trips.py's selectExpr
+        keys: Group-by columns (e.g. taxi_type + HOURLY_KEYS for a
+            multi-type job); must include Pickup_Location
+        skew: 'static' (salt heavy_keys without sampling), 'auto' (detect
+            heavy zones from a sample, an extra scan) or 'off' (plain groupBy)
+        heavy_keys: Known heavy Pickup_Location values; defaults to
+            KNOWN_HOT_ZONES for 'static'. For 'auto' they are salted in
+            addition to the detected keys
+        salt_buckets: Number of tasks each heavy key is spread over
+        sample_fraction: Sample size for 'auto' detection
+    """
+    if skew not in SKEW_MODES:
+        raise ValueError(f"Unknown skew mode {skew!r}; expected one of {SKEW_MODES}")
+    if skew == "off":
+        return plain_aggregate(df, keys)
+
+    if skew == "static":
+        heavy = list(heavy_keys) if heavy_keys is not None else list(KNOWN_HOT_ZONES)
+    else:
+        heavy = list(heavy_keys or [])
+        heavy = sorted(set(heavy) | set(detect_heavy_keys(df, sample_fraction=sample_fraction)))
+
+    if heavy:
+        print(f"Skew handling: salting {len(heavy)} heavy pickup zones over "
+              f"{salt_buckets} buckets: {heavy[:10]}{' ...' if len(heavy) > 10 else ''}")
+    return salted_aggregate(df, heavy, keys, salt_buckets=salt_buckets)
@@ -0,0 +1,316 @@
+"""
+Multi-Resolution Spatial Grid Tiles for Lat/Lon Trip Heatmaps
+Trip files before mid-2016 (2009 yellow start_lon/start_lat, 2010-2016
+pickup_longitude/pickup_latitude) have coordinates instead of LocationIDs,
+so maps of them (yellow_trip_locations in create_dashboard_yellow_trip.sql)
+plot raw points - millions of rows sent to the browser. This stage bins
+pickups and dropoffs into the Web Mercator tile grid (the z/x/y scheme of
+every web map) at several zoom levels, with trip counts and revenue per cell
+
+Each batch of rows is binned once, at the finest zoom, with vectorized
+numpy arithmetic and reduced with np.unique/np.bincount; coarser levels are
+rolled up from the finest cells by bit-shifting tile coordinates (the parent
+of tile x at zoom z is x >> 1 at zoom z - 1), so raw rows are read once for
+all levels. A map chart then reads the few thousand cells of one zoom inside
+its viewport (viewport_filter_sql).
+
+Usage:
+    python spatial_grid.py ~/nyc_taxi_data/raw/yellow_tripdata_2009-*.parquet \\
+        --output ~/nyc_taxi_data/processed/nyc_taxi_grid.parquet --zooms 10-16
+
+Requirements: pip install numpy pyarrow
+"""
+
+import argparse
+import glob
+import math
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from pipeline_metrics import report_rows
+from schema_harmonization import ERA_MAPPINGS, file_columns, file_schema_version
+
+DEFAULT_MIN_ZOOM = 10
+DEFAULT_MAX_ZOOM = 16
+# Tile coordinates are packed into one int64 key (x << 32 | y)
+MAX_ZOOM = 24
+
+# Pending partial cells of a kind are re-reduced into one array once they
+# exceed this many (or twice the size of the last reduced array)
+COMPACT_MIN_CELLS = 1_000_000
+
+# Points outside this (west, south, east, north) box are GPS noise (0/0, etc.)
+NYC_BBOX = (-74.30, 40.45, -73.65, 40.95)
+
+# Canonical coordinate columns (schema_harmonization.py) per kind of point
+POINT_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "pickup": ("pickup_longitude", "pickup_latitude"),
+    "dropoff": ("dropoff_longitude", "dropoff_latitude"),
+}
+
+GRID_SCHEMA = pa.schema([
+    ("kind", pa.string()),
+    ("zoom", pa.int8()),
+    ("tile_x", pa.int32()),
+    ("tile_y", pa.int32()),
+    ("trips", pa.int64()),
+    ("revenue", pa.float64()),
+    ("longitude", pa.float64()),
+    ("latitude", pa.float64()),
+])
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}")
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+# ============================================
+# Tile Math
+# ============================================
+
+def lonlat_to_tile(lon: np.ndarray, lat: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator tile coordinates of points at a zoom level (vectorized)"""
+    n = 1 << zoom
+    lat_rad = np.radians(lat)
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return (np.clip(x, 0, n - 1).astype(np.int64),
+            np.clip(y, 0, n - 1).astype(np.int64))
+
+
+def tile_center(x: np.ndarray, y: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(longitude, latitude) of tile centers"""
+    n = float(1 << zoom)
+    lon = (x + 0.5) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1.0 - 2.0 * (y + 0.5) / n))))
+    return lon, lat
+
+
+def tile_range(west: float, south: float, east: float, north: float,
+               zoom: int) -> Tuple[int, int, int, int]:
+    """(min_x, max_x, min_y, max_y) of the tiles covering a bounding box"""
+    xs, ys = lonlat_to_tile(np.array([west, east]), np.array([north, south]), zoom)
+    return int(xs[0]), int(xs[1]), int(ys[0]), int(ys[1])
+
+
+def viewport_filter_sql(zoom: int, west: float, south: float, east: float, north: float,
+                        kind: str = "pickup") -> str:
+    """WHERE clause selecting the grid cells of one zoom inside a map viewport"""
+    min_x, max_x, min_y, max_y = tile_range(west, south, east, north, zoom)
+    return (f"kind = '{kind}' AND zoom = {zoom} "
+            f"AND tile_x BETWEEN {min_x} AND {max_x} AND tile_y BETWEEN {min_y} AND {max_y}")
+
+
+# ============================================
+# Aggregation
+# ============================================
+
+def _reduce(keys: np.ndarray, trips: np.ndarray, revenue: np.ndarray):
+    """Sum trips and revenue per distinct key"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return (unique,
+            np.bincount(inverse, weights=trips, minlength=len(unique)).astype(np.int64),
+            np.bincount(inverse, weights=revenue, minlength=len(unique)))
+
+
+class GridAccumulator:
+    """
+    Streams coordinate batches into finest-zoom cell partials, then rolls
+    them up to every coarser zoom
+
+    Memory is bounded by the number of occupied finest cells, not by rows:
+    batch partials are re-reduced into one array whenever they grow past
+    twice the cells already reduced, so each kind holds at most about three
+    times its occupied cells.
+    """
+
+    def __init__(self, min_zoom: int = DEFAULT_MIN_ZOOM, max_zoom: int = DEFAULT_MAX_ZOOM,
+                 bbox: Sequence[float] = NYC_BBOX):
+        if not 0 <= min_zoom <= max_zoom <= MAX_ZOOM:
+            raise ValueError(f"Zooms must satisfy 0 <= min <= max <= {MAX_ZOOM}")
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.bbox = bbox
+        self.rows = 0
+        self._partials: Dict[str, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {
+            kind: [] for kind in POINT_COLUMNS}
+        self._pending: Dict[str, int] = {kind: 0 for kind in POINT_COLUMNS}
+        self._reduced: Dict[str, int] = {kind: 0 for kind in POINT_COLUMNS}
+
+    def add(self, kind: str, lon: np.ndarray, lat: np.ndarray, revenue: np.ndarray) -> None:
+        """Bin one batch of points of a kind ('pickup' or 'dropoff')"""
+        west, south, east, north = self.bbox
+        keep = (lon >= west) & (lon <= east) & (lat >= south) & (lat <= north)
+        if not keep.any():
+            return
+        x, y = lonlat_to_tile(lon[keep], lat[keep], self.max_zoom)
+        keys = (x << 32) | y
+        partial = _reduce(keys, np.ones(len(keys)), np.nan_to_num(revenue[keep]))
+        self._partials[kind].append(partial)
+        self._pending[kind] += len(partial[0])
+        self.rows += int(keep.sum())
+        if self._pending[kind] > max(COMPACT_MIN_CELLS, 2 * self._reduced[kind]):
+            self._compact(kind)
+
+    def _compact(self, kind: str) -> None:
+        """Merge all partials of a kind into one reduced partial"""
+        partials = self._partials[kind]
+        if len(partials) > 1:
+            partials[:] = [_reduce(*(np.concatenate(arrays) for arrays in zip(*partials)))]
+        self._reduced[kind] = len(partials[0][0]) if partials else 0
+        self._pending[kind] = 0
+
+    def add_table(self, table: pa.Table, columns: Dict[str, str]) -> None:
+        """Bin a batch with canonical -> source column names (see ERA_MAPPINGS)"""
+        def values(canonical: str) -> np.ndarray:
+            source = columns.get(canonical)
+            if source is None:
+                return np.full(table.num_rows, np.nan)
+            return table[source].cast(pa.float64()).to_numpy()
+
+        revenue = values("total_amount")
+        for kind, (lon_col, lat_col) in POINT_COLUMNS.items():
+            if lon_col in columns and lat_col in columns:
+                self.add(kind, values(lon_col), values(lat_col), revenue)
+
+    def to_table(self) -> pa.Table:
+        """Cells of every zoom level as a GRID_SCHEMA table sorted by kind, zoom, x, y"""
+        parts = []
+        for kind in self._partials:
+            self._compact(kind)
+            if not self._partials[kind]:
+                continue
+            keys, trips, revenue = self._partials[kind][0]
+            x, y = keys >> 32, keys & 0xFFFFFFFF
+            for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+                if zoom < self.max_zoom:
+                    # Parent tiles: halve both coordinates and merge the children
+                    x, y = x >> 1, y >> 1
+                    keys, trips, revenue = _reduce((x << 32) | y, trips, revenue)
+                    x, y = keys >> 32, keys & 0xFFFFFFFF
+                lon, lat = tile_center(x, y, zoom)
+                parts.append(pa.table({
+                    "kind": pa.array([kind] * len(x), pa.string()),
+                    "zoom": pa.array(np.full(len(x), zoom, dtype=np.int8)),
+                    "tile_x": pa.array(x.astype(np.int32)),
+                    "tile_y": pa.array(y.astype(np.int32)),
+                    "trips": pa.array(trips),
+                    "revenue": pa.array(revenue),
+                    "longitude": pa.array(lon),
+                    "latitude": pa.array(lat),
+                }, schema=GRID_SCHEMA))
+        if not parts:
+            return GRID_SCHEMA.empty_table()
+        # Parts are produced per kind from fine to coarse; sort so row groups
+        # cover one zoom and a narrow tile_x band each
+        return pa.concat_tables(parts).sort_by([("kind", "ascending"), ("zoom", "ascending"),
+                                                ("tile_x", "ascending"), ("tile_y", "ascending")])
+
+
+# ============================================
+# Files
+# ============================================
+
+def _source_columns(path: str) -> Dict[str, str]:
+    """Canonical -> actual source column names of the coordinate and revenue columns"""
+    era = file_schema_version(path)
+    if era is None:
+        raise ValueError(f"Unrecognized trip file schema: {path}")
+    actual = {name.lower(): name for name in file_columns(path)}
+    columns = {}
+    for canonical in ("total_amount", *[name for pair in POINT_COLUMNS.values() for name in pair]):
+        source = ERA_MAPPINGS[era].get(canonical)
+        if isinstance(source, str) and source in actual:
+            columns[canonical] = actual[source]
+    return columns
+
+
+def iter_batches(path: str, columns: List[str]) -> Iterator[pa.Table]:
+    """Batches of the given columns of a Parquet (per row group) or CSV file"""
+    if path.endswith(".parquet"):
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(columns=columns):
+            yield pa.Table.from_batches([batch])
+        return
+    convert = pv.ConvertOptions(include_columns=columns,
+                                column_types={name: pa.float64() for name in columns})
+    with pv.open_csv(path, convert_options=convert) as reader:
+        for batch in reader:
+            yield pa.Table.from_batches([batch])
+
+
+def grid_files(paths: Sequence[str], min_zoom: int = DEFAULT_MIN_ZOOM,
+               max_zoom: int = DEFAULT_MAX_ZOOM) -> pa.Table:
+    """Grid cells of all files; files without coordinates are skipped"""
+    accumulator = GridAccumulator(min_zoom, max_zoom)
+    for path in paths:
+        columns = _source_columns(path)
+        if not any(name in columns for name, _ in POINT_COLUMNS.values()):
+            print_info(f"No coordinates in {os.path.basename(path)}, skipped")
+            continue
+        for batch in iter_batches(path, sorted(set(columns.values()))):
+            accumulator.add_table(batch, columns)
+    print_info(f"Binned {accumulator.rows:,} points in the NYC bounding box")
+    return accumulator.to_table()
+
+
+def _parse_zooms(text: str) -> Tuple[int, int]:
+    low, _, high = text.partition("-")
+    return int(low), int(high or low)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bin trip coordinates into multi-zoom grid tiles")
+    parser.add_argument("inputs", nargs="+", help="Trip files (Parquet or CSV) or glob patterns")
+    parser.add_argument("--output", required=True, help="Output Parquet file")
+    parser.add_argument("--zooms", default=f"{DEFAULT_MIN_ZOOM}-{DEFAULT_MAX_ZOOM}",
+                        help="Zoom range, e.g. 10-16")
+    args = parser.parse_args(argv)
+
+    print_header("Spatial Grid Tiles")
+
+    paths = sorted({path for pattern in args.inputs for path in glob.glob(pattern)})
+    if not paths:
+        print_info("No trip files to bin")
+        return 0
+
+    start = time.perf_counter()
+    try:
+        min_zoom, max_zoom = _parse_zooms(args.zooms)
+        table = grid_files(paths, min_zoom, max_zoom)
+    except (ValueError, pa.ArrowException, OSError) as e:
+        print_error(f"Failed to build grid: {e}")
+        return 1
+
+    tmp_path = f"{args.output}.tmp"
+    pq.write_table(table, tmp_path, row_group_size=64 * 1024, write_statistics=True)
+    os.replace(tmp_path, args.output)
+    report_rows(rows_out=table.num_rows)
+    print_success(f"Wrote {table.num_rows:,} cells (zoom {min_zoom}-{max_zoom}) to {args.output} "
+                  f"in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
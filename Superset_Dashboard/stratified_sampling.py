@@ -0,0 +1,245 @@
+"""
+Stratified Trip Sampling with Error Bounds for Dashboard Prototyping
+A uniform 1% TABLESAMPLE (optimized_yellow_trip_queries.sql, Option 4) keeps
+1% of every stratum, so rare pickup zones and night hours all but vanish and
+the scaled-up numbers come with no error estimate. This module samples trips
+per stratum - pickup hour x weekday x pickup LocationID - with a per-stratum
+rate: the base rate, raised so every stratum keeps at least min_rows rows
+(small strata are kept whole). Every sampled row carries
+
+    sample_weight = 1 / its stratum's rate
+
+and the KPI estimators below are Horvitz-Thompson totals and ratio means
+whose variance under Bernoulli sampling is itself a weighted sum over the
+sample, so every estimate comes back with a confidence interval from one
+query on a small table
+
+    total   Y = SUM(w * y)              Var = SUM(w * (w - 1) * y^2)
+    mean    R = SUM(w * y) / SUM(w)     Var = SUM(w * (w - 1) * (y - R)^2) / SUM(w)^2
+
+Pipeline: set NYC_TAXI_SAMPLE to the base rate (e.g. 0.01) and
+quick_start_data_pipeline.sh writes nyc_taxi_sample next to the aggregates.
+
+Usage:
+    python stratified_sampling.py kpis --parquet ~/nyc_taxi_data/processed/nyc_taxi_sample --backend duckdb
+
+Requirements: pip install pyspark (sampling); the estimators are plain SQL
+"""
+
+import argparse
+import math
+import os
+import sys
+from typing import Dict, Hashable, Iterable, Optional, Sequence, Tuple
+
+# Canonical columns (schema_harmonization.py) the strata are derived from
+STRATUM_COLUMNS = ["pickup_hour", "pickup_weekday", "pickup_location"]
+WEIGHT_COLUMN = "sample_weight"
+RATE_COLUMN = "sample_rate"
+STRATUM_ROWS_COLUMN = "stratum_rows"
+
+SAMPLE_ENV = "NYC_TAXI_SAMPLE"
+SAMPLE_TABLE = "nyc_taxi_sample"
+
+DEFAULT_MIN_ROWS = 30
+# Files without LocationIDs (2009-2016 coordinates) fall into this location stratum
+UNKNOWN_LOCATION = 0
+Z_95 = 1.96
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+# ============================================
+# Allocation
+# ============================================
+
+def allocate_rates(stratum_rows: Dict[Hashable, int], base_rate: float,
+                   min_rows: int = DEFAULT_MIN_ROWS) -> Dict[Hashable, float]:
+    """
+    Sampling rate of every stratum: base_rate, raised so the stratum keeps
+    about min_rows rows, capped at 1 (strata smaller than min_rows are kept whole)
+
+    Raises:
+        ValueError: If base_rate is not in (0, 1]
+    """
+    if not 0 < base_rate <= 1:
+        raise ValueError(f"base_rate must be in (0, 1], got {base_rate}")
+    return {stratum: min(1.0, max(base_rate, min_rows / rows)) if rows else 1.0
+            for stratum, rows in stratum_rows.items()}
+
+
+def expected_sample_rows(stratum_rows: Dict[Hashable, int], rates: Dict[Hashable, float]) -> float:
+    return sum(rows * rates[stratum] for stratum, rows in stratum_rows.items())
+
+
+# ============================================
+# Spark
+# ============================================
+
+def add_stratum_columns(df, pickup_col: str = "pickup_datetime",
+                        location_col: str = "pickup_location"):
+    """pickup_hour (0-23), pickup_weekday (1 = Monday) and a non-NULL pickup_location"""
+    from pyspark.sql import functions as F
+
+    pickup = F.col(pickup_col)
+    return (df.withColumn("pickup_hour", F.hour(pickup))
+            # Spark's dayofweek is 1 = Sunday; shift to ISO like trip_features.py
+            .withColumn("pickup_weekday", (F.dayofweek(pickup) + 5) % 7 + 1)
+            .withColumn(location_col, F.coalesce(F.col(location_col).cast("int"),
+                                                 F.lit(UNKNOWN_LOCATION))))
+
+
+def stratified_sample(df, base_rate: float, strata: Sequence[str] = STRATUM_COLUMNS,
+                      min_rows: int = DEFAULT_MIN_ROWS, seed: int = 42):
+    """
+    Stratified Bernoulli sample of a trip DataFrame
+
+    One grouped count sizes the strata; their rates are allocated on the
+    driver (at most 24 x 7 x 266 strata per trip type) and broadcast back,
+    and rows are kept with probability equal to their stratum's rate.
+
+    Args:
+        df: Trips with the strata columns (see add_stratum_columns)
+        base_rate: Rate of large strata, e.g. 0.01
+        strata: Stratum columns; prepend taxi_type for multi-type input
+        min_rows: Expected rows kept per stratum (small strata kept whole)
+
+    Returns:
+        (sample with sample_rate / sample_weight columns,
+         strata DataFrame: strata columns, stratum_rows, sample_rate)
+    """
+    from pyspark.sql import functions as F
+
+    strata = list(strata)
+    counts = df.groupBy(*strata).count().collect()
+    stratum_rows = {tuple(row[name] for name in strata): row["count"] for row in counts}
+    rates = allocate_rates(stratum_rows, base_rate, min_rows)
+    print(f"Stratified sample: {len(rates)} strata, ~{expected_sample_rows(stratum_rows, rates):,.0f} "
+          f"of {sum(stratum_rows.values()):,} rows")
+
+    spark = df.sparkSession
+    strata_df = spark.createDataFrame(
+        [(*stratum, stratum_rows[stratum], rate) for stratum, rate in rates.items()],
+        schema=df.select(*strata).schema.add(STRATUM_ROWS_COLUMN, "long").add(RATE_COLUMN, "double"))
+
+    sample = (df.join(F.broadcast(strata_df.drop(STRATUM_ROWS_COLUMN)), strata)
+              .filter(F.rand(seed=seed) < F.col(RATE_COLUMN))
+              .withColumn(WEIGHT_COLUMN, 1.0 / F.col(RATE_COLUMN)))
+    return sample, strata_df
+
+
+# ============================================
+# Estimators
+# ============================================
+
+def estimate_total(values: Iterable[float], weights: Iterable[float],
+                   z: float = Z_95) -> Tuple[float, float, float]:
+    """Horvitz-Thompson total of sampled values: (estimate, lower, upper)"""
+    estimate = variance = 0.0
+    for y, w in zip(values, weights):
+        estimate += w * y
+        variance += w * (w - 1) * y * y
+    margin = z * math.sqrt(variance)
+    return estimate, estimate - margin, estimate + margin
+
+
+def estimate_mean(values: Sequence[float], weights: Sequence[float],
+                  z: float = Z_95) -> Tuple[float, float, float]:
+    """Weighted (ratio) mean of sampled values: (estimate, lower, upper)"""
+    population = sum(weights)
+    if not population:
+        return math.nan, math.nan, math.nan
+    mean = sum(w * y for y, w in zip(values, weights)) / population
+    variance = sum(w * (w - 1) * (y - mean) ** 2 for y, w in zip(values, weights)) / population ** 2
+    margin = z * math.sqrt(variance)
+    return mean, mean - margin, mean + margin
+
+
+def total_estimate_sql(value_sql: str, table: str = SAMPLE_TABLE,
+                       where: Optional[str] = None, z: float = Z_95) -> str:
+    """SQL returning (estimate, lower_bound, upper_bound) of a population total"""
+    conditions = " AND ".join(filter(None, [where, f"{value_sql} IS NOT NULL"]))
+    return f"""
+    SELECT estimate, estimate - {z} * se AS lower_bound, estimate + {z} * se AS upper_bound
+    FROM (
+        SELECT SUM({WEIGHT_COLUMN} * y) AS estimate,
+               SQRT(SUM({WEIGHT_COLUMN} * ({WEIGHT_COLUMN} - 1) * y * y)) AS se
+        FROM (SELECT {WEIGHT_COLUMN}, CAST({value_sql} AS DOUBLE) AS y
+              FROM {table} WHERE {conditions}) sampled
+    ) totals
+    """
+
+
+def mean_estimate_sql(value_sql: str, table: str = SAMPLE_TABLE,
+                      where: Optional[str] = None, z: float = Z_95) -> str:
+    """SQL returning (estimate, lower_bound, upper_bound) of a population mean"""
+    conditions = " AND ".join(filter(None, [where, f"{value_sql} IS NOT NULL"]))
+    return f"""
+    WITH sampled AS (
+        SELECT {WEIGHT_COLUMN} AS w, CAST({value_sql} AS DOUBLE) AS y
+        FROM {table} WHERE {conditions}
+    ), ratio AS (
+        SELECT SUM(w * y) / SUM(w) AS estimate, SUM(w) AS population FROM sampled
+    )
+    SELECT estimate, estimate - {z} * se AS lower_bound, estimate + {z} * se AS upper_bound
+    FROM (
+        SELECT ratio.estimate,
+               SQRT(SUM(w * (w - 1) * (y - ratio.estimate) * (y - ratio.estimate))) / ratio.population AS se
+        FROM sampled CROSS JOIN ratio
+        GROUP BY ratio.estimate, ratio.population
+    ) means
+    """
+
+
+def sample_kpi_queries(table: str = SAMPLE_TABLE, z: float = Z_95) -> Dict[str, str]:
+    """The loader KPIs as estimator queries over a sample table (canonical columns)"""
+    return {
+        "Total Trips": total_estimate_sql("1", table, z=z),
+        "Total Revenue": total_estimate_sql("total_amount", table, z=z),
+        "Average Fare": mean_estimate_sql("total_amount", table, "total_amount > 0", z=z),
+        "Total Miles": total_estimate_sql("trip_distance", table, z=z),
+        "Avg Distance": mean_estimate_sql("trip_distance", table, "trip_distance > 0", z=z),
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Print KPI estimates with confidence intervals from a sample table"""
+    from loader_backends import add_backend_arguments, get_backend
+
+    parser = argparse.ArgumentParser(description="Stratified sample KPI estimates")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    kpis = subparsers.add_parser("kpis", help="Estimate the dashboard KPIs with 95% intervals")
+    kpis.add_argument("--table", default=SAMPLE_TABLE)
+    kpis.add_argument("--parquet", help="Sample directory written by the pipeline (read in place)")
+    kpis.add_argument("--z", type=float, default=Z_95, help="Normal quantile of the interval")
+    add_backend_arguments(kpis)
+    args = parser.parse_args(argv)
+
+    try:
+        backend = get_backend(args.backend, args.duckdb_path, source="stratified_sampling")
+        backend.connect()
+        if args.parquet:
+            path = os.path.join(args.parquet, "**", "*.parquet") if os.path.isdir(args.parquet) else args.parquet
+            backend.load_parquet(args.table, path)
+    except Exception as e:
+        print_error(f"Failed to open sample: {e}")
+        return 1
+
+    for name, sql in sample_kpi_queries(args.table, args.z).items():
+        try:
+            estimate, lower, upper = backend.execute(sql).fetchone()
+            print(f"   • {name:15s}: {estimate:,.2f}  [{lower:,.2f}, {upper:,.2f}]")
+        except Exception as e:
+            print_error(f"Error estimating {name}: {e}")
+    backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -334,6 +334,74 @@ def get_table_config(columns: List[str], metrics: List[str]) -> Dict:
 # NYC Taxi Dashboard Setup Functions
 # ==============================================
 
+def get_nyc_taxi_chart_specs() -> List[tuple]:
+    """
+    Get the chart definitions used by the NYC Taxi dashboard
+    
+    Returns:
+        List of (chart_name, viz_type, params, description) tuples
+    """
+    specs = []
+    
+    # KPI Charts
+    kpi_charts = [
+        ("Total Trips", "SUM(number)", ",.0f"),
+        ("Total Revenue", "SUM(Total_Amount)", "$,.2f"),
+        ("Average Fare", "AVG(AVG_Total_Amount)", "$,.2f"),
+        ("Total Miles", "SUM(Total_Trip_Distance)", ",.1f")
+    ]
+    
+    for chart_name, metric, format_str in kpi_charts:
+        config = {
+            "metric": metric,
+            "viz_type": "big_number_total",
+            "header_font_size": 0.4,
+            "y_axis_format": format_str
+        }
+        specs.append((chart_name, "big_number_total", config, f"KPI: {chart_name}"))
+    
+    # Time Series Chart - Trips Over Time
+    time_series_config = {
+        "viz_type": "echarts_timeseries_line",
+        "x_axis": "Pickup_Hour",
+        "metrics": ["SUM(number)"],
+        "groupby": ["taxi_type"],
+        "time_grain_sqla": "PT1H",
+        "show_legend": True
+    }
+    specs.append(("Trips Over Time", "echarts_timeseries_line", time_series_config,
+                  "Hourly trip count by taxi type"))
+    
+    # Bar Chart - Busy Hours
+    bar_config = {
+        "viz_type": "echarts_timeseries_bar",
+        "x_axis": "Pickup_Hour",
+        "metrics": ["SUM(number)"],
+        "groupby": ["taxi_type"],
+        "row_limit": 24
+    }
+    specs.append(("Busy Hours Analysis", "echarts_timeseries_bar", bar_config,
+                  "Trip volume by hour of day"))
+    
+    # Table - Top Pickup Locations
+    table_config = {
+        "viz_type": "table",
+        "groupby": ["Pickup_Location"],
+        "metrics": [
+            "SUM(number)",
+            "SUM(Total_Amount)",
+            "AVG(AVG_Trip_Distance)"
+        ],
+        "row_limit": 20,
+        "show_cell_bars": True,
+        "order_desc": True
+    }
+    specs.append(("Top Pickup Locations", "table", table_config,
+                  "Top 20 busiest pickup locations"))
+    
+    return specs
+
+
 def setup_nyc_taxi_dashboard(superset: SupersetHelper,
                             trino_uri: str,
                             schema_name: str = "nyc_taxi",
@@ -383,94 +451,18 @@ def setup_nyc_taxi_dashboard(superset: SupersetHelper,
     print("\nStep 3: Creating charts...")
     chart_ids = []
     
-    # KPI Charts
-    kpi_charts = [
-        ("Total Trips", "SUM(number)", ",.0f"),
-        ("Total Revenue", "SUM(Total_Amount)", "$,.2f"),
-        ("Average Fare", "AVG(AVG_Total_Amount)", "$,.2f"),
-        ("Total Miles", "SUM(Total_Trip_Distance)", ",.1f")
-    ]
-    
-    for chart_name, metric, format_str in kpi_charts:
-        config = {
-            "metric": metric,
-            "viz_type": "big_number_total",
-            "header_font_size": 0.4,
-            "y_axis_format": format_str
-        }
+    for chart_name, viz_type, config, description in get_nyc_taxi_chart_specs():
         chart_id = superset.create_chart(
             dataset_id=dataset_id,
             chart_name=chart_name,
-            viz_type="big_number_total",
+            viz_type=viz_type,
             params=config,
-            description=f"KPI: {chart_name}"
+            description=description
         )
         if chart_id:
             chart_ids.append(chart_id)
         time.sleep(1)
     
-    # Time Series Chart - Trips Over Time
-    time_series_config = {
-        "viz_type": "echarts_timeseries_line",
-        "x_axis": "Pickup_Time",
-        "metrics": ["SUM(number)"],
-        "groupby": ["taxi_type"],
-        "time_grain_sqla": "PT1H",
-        "show_legend": True
-    }
-    chart_id = superset.create_chart(
-        dataset_id=dataset_id,
-        chart_name="Trips Over Time",
-        viz_type="echarts_timeseries_line",
-        params=time_series_config,
-        description="Hourly trip count by taxi type"
-    )
-    if chart_id:
-        chart_ids.append(chart_id)
-    time.sleep(1)
-    
-    # Bar Chart - Busy Hours
-    bar_config = {
-        "viz_type": "echarts_timeseries_bar",
-        "x_axis": "Pickup_Time",
-        "metrics": ["SUM(number)"],
-        "groupby": ["taxi_type"],
-        "row_limit": 24
-    }
-    chart_id = superset.create_chart(
-        dataset_id=dataset_id,
-        chart_name="Busy Hours Analysis",
-        viz_type="echarts_timeseries_bar",
-        params=bar_config,
-        description="Trip volume by hour of day"
-    )
-    if chart_id:
-        chart_ids.append(chart_id)
-    time.sleep(1)
-    
-    # Table - Top Pickup Locations
-    table_config = {
-        "viz_type": "table",
-        "groupby": ["Pickup_Location"],
-        "metrics": [
-            "SUM(number)",
-            "SUM(Total_Amount)",
-            "AVG(AVG_Trip_Distance)"
-        ],
-        "row_limit": 20,
-        "show_cell_bars": True,
-        "order_desc": True
-    }
-    chart_id = superset.create_chart(
-        dataset_id=dataset_id,
-        chart_name="Top Pickup Locations",
-        viz_type="table",
-        params=table_config,
-        description="Top 20 busiest pickup locations"
-    )
-    if chart_id:
-        chart_ids.append(chart_id)
-    
     # Step 4: Create dashboard
     print("\nStep 4: Creating dashboard...")
     dashboard_id = superset.create_dashboard(
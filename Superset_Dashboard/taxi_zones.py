@@ -0,0 +1,182 @@
+"""
+NYC Taxi Zone Dimension
+Loads the complete taxi+_zone_lookup.csv (265 zones) into dense arrays
+indexed directly by LocationID, so borough / zone / service_zone and zone
+coordinates can be attached to any number of rows with a single vectorized
+gather instead of a per-query LEFT JOIN against taxi_zones
+
+    zones = ZoneDimension.from_csv('taxi+_zone_lookup.csv', 'taxi_zones_with_coords.csv')
+    df = zones.attach(df, 'Pickup_Location', prefix='Pickup_')   # pandas
+    sdf = zones.attach_spark(sdf, 'Pickup_Location', prefix='Pickup_')  # Spark
+
+Requirements: pip install numpy pandas
+"""
+
+import os
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+ZONE_LOOKUP_URL = "https://d37ci6vzurychx.cloudfront.net/misc/taxi+_zone_lookup.csv"
+ZONES_ENV = "NYC_TAXI_ZONES"
+
+# Name used for LocationIDs missing from the lookup
+UNKNOWN = "Unknown"
+
+
+class ZoneDimension:
+    """Array-indexed LocationID -> zone attributes"""
+
+    def __init__(self, zones: pd.DataFrame):
+        """
+        Args:
+            zones: Frame with LocationID, Borough, Zone, service_zone and
+                optionally latitude/longitude columns
+        """
+        zones = zones.dropna(subset=["LocationID"]).copy()
+        zones["LocationID"] = zones["LocationID"].astype(np.int64)
+        self.size = int(zones["LocationID"].max()) + 1
+
+        ids = zones["LocationID"].to_numpy()
+        self.location_ids = np.unique(ids)
+        self.borough_names, self.borough_code = self._encode(zones["Borough"], ids)
+        self.zone_names, self.zone_code = self._encode(zones["Zone"], ids)
+        self.service_zone_names, self.service_zone_code = self._encode(zones["service_zone"], ids)
+
+        self.latitude = np.full(self.size, np.nan, dtype=np.float32)
+        self.longitude = np.full(self.size, np.nan, dtype=np.float32)
+        if "latitude" in zones and "longitude" in zones:
+            self.latitude[ids] = zones["latitude"].to_numpy(dtype=np.float32)
+            self.longitude[ids] = zones["longitude"].to_numpy(dtype=np.float32)
+
+    def _encode(self, values: pd.Series, ids: np.ndarray):
+        """
+        Dictionary-encode one attribute into a dense code array
+
+        Returns:
+            (names, codes) where names[codes[location_id]] is the attribute;
+            code 0 is reserved for UNKNOWN
+        """
+        values = values.fillna(UNKNOWN).astype(str)
+        names = [UNKNOWN] + sorted(set(values) - {UNKNOWN})
+        lookup = {name: code for code, name in enumerate(names)}
+        dtype = np.int8 if len(names) < 128 else np.int16
+
+        codes = np.zeros(self.size, dtype=dtype)
+        codes[ids] = [lookup[v] for v in values]
+        return np.array(names, dtype=object), codes
+
+    @classmethod
+    def from_csv(cls, lookup_csv: str, coords_csv: Optional[str] = None) -> "ZoneDimension":
+        """
+        Load the TLC zone lookup, optionally merged with zone centroids
+
+        Args:
+            lookup_csv: Path or URL of taxi+_zone_lookup.csv
+            coords_csv: CSV with LocationID, latitude, longitude (e.g. the
+                pipeline's taxi_zones_with_coords.csv)
+        """
+        zones = pd.read_csv(lookup_csv)
+        if coords_csv and os.path.exists(coords_csv):
+            coords = pd.read_csv(coords_csv)[["LocationID", "latitude", "longitude"]]
+            zones = zones.merge(coords.drop_duplicates("LocationID"), on="LocationID", how="left")
+        return cls(zones)
+
+    @classmethod
+    def from_env(cls) -> Optional["ZoneDimension"]:
+        """Load from $NYC_TAXI_ZONES if it points at an existing file"""
+        path = os.environ.get(ZONES_ENV)
+        if path and os.path.exists(path):
+            return cls.from_csv(path)
+        return None
+
+    def _safe_index(self, location_ids) -> np.ndarray:
+        """LocationIDs as array indexes; NULL and out-of-range map to slot 0 (unknown)"""
+        ids = pd.to_numeric(pd.Series(location_ids), errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+        ids[(ids < 0) | (ids >= self.size)] = 0
+        return ids
+
+    def lookup(self, location_ids, attribute: str = "zone") -> pd.Categorical:
+        """Vectorized LocationID -> attribute name, returned as a Categorical"""
+        names = getattr(self, f"{attribute}_names")
+        codes = getattr(self, f"{attribute}_code")[self._safe_index(location_ids)]
+        return pd.Categorical.from_codes(codes, categories=names)
+
+    def attach(self, df: pd.DataFrame, location_col: str, prefix: str = "",
+               coordinates: bool = False) -> pd.DataFrame:
+        """
+        Add Borough, Zone and Service_Zone (and optionally Latitude/Longitude)
+        columns for location_col with one gather per attribute
+
+        Returns:
+            New frame with the added columns
+        """
+        ids = self._safe_index(df[location_col])
+        columns = {
+            f"{prefix}Borough": pd.Categorical.from_codes(self.borough_code[ids], self.borough_names),
+            f"{prefix}Zone": pd.Categorical.from_codes(self.zone_code[ids], self.zone_names),
+            f"{prefix}Service_Zone": pd.Categorical.from_codes(self.service_zone_code[ids],
+                                                               self.service_zone_names),
+        }
+        if coordinates:
+            columns[f"{prefix}Latitude"] = self.latitude[ids]
+            columns[f"{prefix}Longitude"] = self.longitude[ids]
+        return df.assign(**columns)
+
+    def attach_spark(self, sdf, location_col: str, prefix: str = ""):
+        """
+        Spark equivalent of attach(): element_at() into literal arrays
+
+        The 265-entry arrays are compiled into the plan, so attributes are
+        resolved per row without a join or shuffle.
+        """
+        from pyspark.sql import functions as F
+
+        index = F.coalesce(F.col(location_col).cast("int"), F.lit(0))
+        # element_at is 1-based; out-of-range ids give NULL -> Unknown
+        position = F.when((index >= 0) & (index < self.size), index + 1).otherwise(F.lit(1))
+
+        for attribute, column in [("borough", "Borough"), ("zone", "Zone"),
+                                  ("service_zone", "Service_Zone")]:
+            names = getattr(self, f"{attribute}_names")
+            codes = getattr(self, f"{attribute}_code")
+            values = F.array(*[F.lit(str(names[code])) for code in codes])
+            sdf = sdf.withColumn(f"{prefix}{column}", F.element_at(values, position))
+        return sdf
+
+    def to_frame(self) -> pd.DataFrame:
+        """taxi_zones table (one row per known LocationID)"""
+        ids = self.location_ids
+        return pd.DataFrame({
+            "LocationID": ids,
+            "Borough": self.borough_names[self.borough_code[ids]],
+            "Zone": self.zone_names[self.zone_code[ids]],
+            "service_zone": self.service_zone_names[self.service_zone_code[ids]],
+            "latitude": self.latitude[ids].astype(np.float64),
+            "longitude": self.longitude[ids].astype(np.float64),
+        })
+
+    def __len__(self):
+        return int((self.zone_code[1:] != 0).sum())
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Print the zone dimension summary for a lookup file"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the taxi zone dimension")
+    parser.add_argument("lookup_csv", nargs="?", default=ZONE_LOOKUP_URL)
+    parser.add_argument("--coords")
+    args = parser.parse_args(argv)
+
+    zones = ZoneDimension.from_csv(args.lookup_csv, args.coords)
+    frame = zones.to_frame()
+    print(f"✓ {len(zones)} zones, {len(zones.borough_names) - 1} boroughs")
+    print(frame.groupby("Borough").size().to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Integer Hour-Epoch Keys for NYC Taxi Aggregates
+Hourly aggregates used to be keyed by a 13-character string
+('2018-01-01 17'), so every group-by, sort, join and range filter compared
+strings and Superset had to parse them back into time. Aggregates now carry
+
+    Pickup_Hour_Key   INT        hours since 1970-01-01 00:00 (naive local time)
+    Pickup_Hour       TIMESTAMP  start of the hour, for Superset's time axis
+
+and keep Pickup_Time only as a display string derived from the key after
+aggregation. This module holds the conversions for every boundary: Python
+values, pandas, Arrow, Spark columns, Trino and DuckDB SQL. All of them do plain
+calendar arithmetic on the naive TLC timestamps, so no time zone or DST rule
+can shift a key.
+
+    key = hour_key("2018-01-01 17:42:00")        # 420785
+    hour_key_to_string(key)                        # '2018-01-01 17'
+    trino_hour_key_sql("tpep_pickup_datetime")     # SQL expression
+
+Requirements: none (pandas / pyarrow / pyspark only for their helpers)
+"""
+
+import datetime
+from typing import Union
+
+HOUR_KEY_COLUMN = "Pickup_Hour_Key"
+HOUR_COLUMN = "Pickup_Hour"
+TIME_STRING_COLUMN = "Pickup_Time"
+
+EPOCH = datetime.datetime(1970, 1, 1)
+TIME_STRING_FORMAT = "%Y-%m-%d %H"
+
+# SQL (Trino, DuckDB) / Spark spellings of the epoch and of TIME_STRING_FORMAT
+_SQL_EPOCH = "TIMESTAMP '1970-01-01 00:00:00'"
+_SPARK_TIME_FORMAT = "yyyy-MM-dd HH"
+
+
+# ============================================
+# Python values
+# ============================================
+
+def hour_key(value: Union[str, datetime.datetime, datetime.date]) -> int:
+    """Hour key of a datetime, a date, or a 'YYYY-MM-DD[ HH[:MM[:SS]]]' string"""
+    if isinstance(value, str):
+        text = value.strip()
+        if len(text) == 13:  # 'YYYY-MM-DD HH'
+            text += ":00"
+        value = datetime.datetime.fromisoformat(text)
+    elif not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    delta = value.replace(tzinfo=None) - EPOCH
+    return delta.days * 24 + delta.seconds // 3600
+
+
+def hour_key_to_datetime(key: int) -> datetime.datetime:
+    return EPOCH + datetime.timedelta(hours=int(key))
+
+
+def hour_key_to_string(key: int) -> str:
+    """Legacy Pickup_Time string ('YYYY-MM-DD HH') of a key"""
+    return hour_key_to_datetime(key).strftime(TIME_STRING_FORMAT)
+
+
+def hour_key_range(start, end) -> range:
+    """Keys of the hours in [start, end), e.g. for a time-range predicate"""
+    return range(hour_key(start), hour_key(end))
+
+
+# ============================================
+# pandas / Arrow
+# ============================================
+
+def frame_hour_key(values):
+    """pandas datetime Series -> nullable Int32 hour keys"""
+    import pandas as pd
+
+    hours = pd.to_datetime(values).dt.floor("h")
+    keys = (hours - pd.Timestamp(EPOCH)) // pd.Timedelta(hours=1)
+    return keys.astype("Int32")
+
+
+def frame_hour_timestamp(keys):
+    """pandas hour keys -> start-of-hour timestamps"""
+    import pandas as pd
+
+    return pd.Timestamp(EPOCH) + pd.to_timedelta(keys.astype("float64"), unit="h")
+
+
+def arrow_hour_key(timestamps):
+    """Arrow timestamp array -> int32 hour keys"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    epoch = pa.scalar(EPOCH, type=timestamps.type)
+    return pc.cast(pc.hours_between(epoch, timestamps), pa.int32())
+
+
+# ============================================
+# Spark
+# ============================================
+
+def spark_hour_key(column):
+    """Spark column: timestamp -> int hour key (days * 24 + hour, no time zone)"""
+    from pyspark.sql import functions as F
+
+    ts = F.col(column) if isinstance(column, str) else column
+    return (F.datediff(F.to_date(ts), F.lit("1970-01-01")) * 24 + F.hour(ts)).cast("int")
+
+
+def spark_hour_key_sql(timestamp_sql: str) -> str:
+    """spark_hour_key() as a SQL expression, for selectExpr"""
+    return (f"CAST(datediff(to_date({timestamp_sql}), DATE '1970-01-01') * 24 "
+            f"+ hour({timestamp_sql}) AS INT)")
+
+
+def spark_hour_timestamp(column):
+    """Spark column: int hour key -> start-of-hour timestamp"""
+    from pyspark.sql import functions as F
+
+    key = F.col(column) if isinstance(column, str) else column
+    day = F.date_add(F.lit("1970-01-01").cast("date"), F.floor(key / 24).cast("int"))
+    return F.to_timestamp(F.concat(F.date_format(day, "yyyy-MM-dd"), F.lit(" "),
+                                   F.lpad((key % 24).cast("string"), 2, "0")),
+                          _SPARK_TIME_FORMAT)
+
+
+def spark_hour_string(column):
+    """Spark column: int hour key -> legacy Pickup_Time string"""
+    from pyspark.sql import functions as F
+
+    return F.date_format(spark_hour_timestamp(column), _SPARK_TIME_FORMAT)
+
+
+# ============================================
+# Trino SQL
+# ============================================
+
+def trino_hour_key_sql(timestamp_sql: str) -> str:
+    """Trino expression: timestamp -> hour key"""
+    return f"CAST(date_diff('hour', {_SQL_EPOCH}, {timestamp_sql}) AS INTEGER)"
+
+
+def trino_hour_timestamp_sql(key_sql: str) -> str:
+    """Trino expression: hour key -> start-of-hour timestamp"""
+    return f"date_add('hour', {key_sql}, {_SQL_EPOCH})"
+
+
+def trino_hour_string_sql(key_sql: str) -> str:
+    """Trino expression: hour key -> legacy Pickup_Time string"""
+    return f"DATE_FORMAT({trino_hour_timestamp_sql(key_sql)}, '%Y-%m-%d %H')"
+
+
+# ============================================
+# DuckDB SQL
+# ============================================
+
+def duckdb_hour_key_sql(timestamp_sql: str) -> str:
+    """DuckDB expression: timestamp -> hour key"""
+    return f"CAST(date_diff('hour', {_SQL_EPOCH}, {timestamp_sql}) AS INTEGER)"
+
+
+def duckdb_hour_timestamp_sql(key_sql: str) -> str:
+    """DuckDB expression: hour key -> start-of-hour timestamp"""
+    return f"({_SQL_EPOCH} + to_hours(CAST({key_sql} AS BIGINT)))"
+
+
+def duckdb_hour_string_sql(key_sql: str) -> str:
+    """DuckDB expression: hour key -> legacy Pickup_Time string"""
+    return f"strftime({duckdb_hour_timestamp_sql(key_sql)}, '{TIME_STRING_FORMAT}')"
@@ -0,0 +1,335 @@
+"""
+Trino Query Profiler for the NYC Taxi Loaders
+Opt-in wrapper around a SQLAlchemy connection that records, for every
+statement, the Trino query ID, its EXPLAIN (or EXPLAIN ANALYZE) plan and the
+query statistics reported by the Trino client (CPU time, wall time, input
+rows/bytes, peak memory), and stores them locally for a ranked report
+
+Enable in the loaders with an environment variable:
+    NYC_TAXI_PROFILE=1         EXPLAIN each statement and record stats
+    NYC_TAXI_PROFILE=analyze   Also run EXPLAIN ANALYZE (executes the query twice!)
+
+Report the most expensive statements:
+    python trino_profiler.py report --top 10 --by cpu
+
+Offline: ReplayConnection answers statements from a previously recorded
+profile file, so the profiler and report can be exercised without Trino.
+
+Requirements: pip install sqlalchemy trino sqlalchemy-trino
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from pipeline_metrics import DEFAULT_METRICS_DIR, METRICS_DIR_ENV
+
+PROFILE_ENV = "NYC_TAXI_PROFILE"
+PROFILE_FILE = "query_profiles.jsonl"
+
+# Trino client stats field -> profile field
+STATS_FIELDS = {
+    "cpuTimeMillis": "cpu_time_ms",
+    "wallTimeMillis": "wall_time_ms",
+    "elapsedTimeMillis": "elapsed_time_ms",
+    "queuedTimeMillis": "queued_time_ms",
+    "processedRows": "input_rows",
+    "processedBytes": "input_bytes",
+    "physicalInputBytes": "physical_input_bytes",
+    "peakMemoryBytes": "peak_memory_bytes",
+    "spilledBytes": "spilled_bytes",
+    "totalSplits": "total_splits",
+    "nodes": "nodes",
+    "state": "state",
+}
+
+# Report sort keys -> profile field
+SORT_KEYS = {
+    "cpu": "cpu_time_ms",
+    "wall": "wall_time_ms",
+    "elapsed": "elapsed_time_ms",
+    "memory": "peak_memory_bytes",
+    "input_rows": "input_rows",
+    "input_bytes": "input_bytes",
+}
+
+# CREATE [OR REPLACE] VIEW name AS <select> / CREATE TABLE name AS <select>
+_CREATE_AS_SELECT = re.compile(
+    r"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:VIEW|TABLE)\s+\S+(?:\s+WITH\s*\(.*?\))?\s+AS\s+(.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace so recorded statements match regardless of indentation"""
+    return " ".join(str(sql).split())
+
+
+def explainable_query(sql: str) -> Optional[str]:
+    """
+    Return the query to EXPLAIN for a statement
+
+    SELECT/WITH statements are explained as-is; for CREATE ... AS SELECT the
+    SELECT body is explained. Other statements (DDL, DML) return None.
+    """
+    sql = str(sql).strip().rstrip(";")
+    match = _CREATE_AS_SELECT.match(sql)
+    if match:
+        return match.group(1)
+    if re.match(r"^\s*(SELECT|WITH)\b", sql, re.IGNORECASE):
+        return sql
+    return None
+
+
+class QueryProfiler:
+    """Drop-in wrapper for a SQLAlchemy connection that profiles each statement"""
+
+    def __init__(self,
+                 conn,
+                 source: str,
+                 profile_path: Optional[str] = None,
+                 analyze: bool = False):
+        """
+        Args:
+            conn: SQLAlchemy connection (or ReplayConnection)
+            source: Name of the calling script, stored with each profile
+            profile_path: JSONL file for profiles (default: $NYC_TAXI_METRICS_DIR/query_profiles.jsonl)
+            analyze: Also run EXPLAIN ANALYZE, which executes each query again
+        """
+        self.conn = conn
+        self.source = source
+        self.analyze = analyze
+        self.profile_path = profile_path or os.path.join(
+            os.environ.get(METRICS_DIR_ENV, DEFAULT_METRICS_DIR), PROFILE_FILE
+        )
+        self.profiles: List[Dict] = []
+
+    def __getattr__(self, name):
+        # Everything except execute() goes straight to the wrapped connection
+        return getattr(self.conn, name)
+
+    def _explain(self, query: str, analyze: bool) -> Optional[str]:
+        from sqlalchemy import text
+
+        prefix = "EXPLAIN ANALYZE" if analyze else "EXPLAIN"
+        try:
+            rows = self.conn.execute(text(f"{prefix} {query}")).fetchall()
+            return "\n".join(str(row[0]) for row in rows)
+        except Exception as e:
+            return f"<{prefix} failed: {e}>"
+
+    def execute(self, statement, *args, **kwargs):
+        """Execute a statement, recording its plan and Trino query stats"""
+        sql = str(statement)
+        query = explainable_query(sql)
+
+        profile = {
+            "source": self.source,
+            "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "sql": normalize_sql(sql),
+            "plan": self._explain(query, analyze=False) if query else None,
+            "analyze_plan": self._explain(query, analyze=True) if query and self.analyze else None,
+        }
+
+        start = time.perf_counter()
+        result = self.conn.execute(statement, *args, **kwargs)
+        cursor = getattr(result, "cursor", None)
+
+        # Query stats are final only after all rows are fetched, so buffer the
+        # result; the caller gets an equivalent, fully materialized Result
+        if getattr(result, "returns_rows", False) and hasattr(result, "freeze"):
+            result = result.freeze()()
+
+        profile["client_time_ms"] = (time.perf_counter() - start) * 1000
+        profile["query_id"] = getattr(cursor, "query_id", None)
+        stats = getattr(cursor, "stats", None) or {}
+        for trino_field, field in STATS_FIELDS.items():
+            profile[field] = stats.get(trino_field)
+
+        self.record(profile)
+        return result
+
+    def record(self, profile: Dict):
+        self.profiles.append(profile)
+        directory = os.path.dirname(self.profile_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.profile_path, "a") as f:
+            f.write(json.dumps(profile) + "\n")
+
+
+def profile_connection(conn, source: str):
+    """
+    Wrap conn in a QueryProfiler if $NYC_TAXI_PROFILE is set, else return it unchanged
+
+    Loaders call this right after connecting, so profiling is opt-in and
+    costs nothing when disabled.
+    """
+    mode = os.environ.get(PROFILE_ENV, "").strip().lower()
+    if mode in ("", "0", "false", "no"):
+        return conn
+    print(f"ℹ Query profiling enabled ({'EXPLAIN ANALYZE' if mode == 'analyze' else 'EXPLAIN'})")
+    return QueryProfiler(conn, source, analyze=(mode == "analyze"))
+
+
+# ============================================
+# Offline Replay
+# ============================================
+
+class _ReplayCursor:
+    def __init__(self, query_id: Optional[str], stats: Dict):
+        self.query_id = query_id
+        self.stats = stats
+
+
+class _ReplayResult:
+    def __init__(self, rows: List, cursor: _ReplayCursor):
+        self._rows = list(rows)
+        self._pos = 0
+        self.cursor = cursor
+        self.returns_rows = bool(rows)
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class ReplayConnection:
+    """
+    Stub connection answering statements from a recorded profile file
+
+    EXPLAIN statements return the recorded plan; other statements return the
+    recorded query ID and stats (and the rows given in the optional "rows"
+    field of a recording). Unknown statements return an empty result.
+    """
+
+    def __init__(self, recording_path: str):
+        self.recordings = {}
+        with open(recording_path) as f:
+            for line in f:
+                if line.strip():
+                    profile = json.loads(line)
+                    self.recordings[profile["sql"]] = profile
+
+        # Index plans by the query they explain
+        self.plans = {}
+        for profile in self.recordings.values():
+            query = explainable_query(profile["sql"])
+            if query:
+                key = normalize_sql(query)
+                self.plans[("EXPLAIN", key)] = profile.get("plan")
+                self.plans[("EXPLAIN ANALYZE", key)] = profile.get("analyze_plan")
+
+    def execute(self, statement, *args, **kwargs):
+        sql = normalize_sql(str(statement))
+
+        for prefix in ("EXPLAIN ANALYZE", "EXPLAIN"):
+            if sql.upper().startswith(prefix + " "):
+                plan = self.plans.get((prefix, sql[len(prefix) + 1:]))
+                rows = [(line,) for line in (plan or "").splitlines()]
+                return _ReplayResult(rows, _ReplayCursor(None, {}))
+
+        profile = self.recordings.get(sql, {})
+        stats = {trino_field: profile.get(field) for trino_field, field in STATS_FIELDS.items()}
+        rows = [tuple(row) for row in profile.get("rows", [])]
+        return _ReplayResult(rows, _ReplayCursor(profile.get("query_id"), stats))
+
+    def close(self):
+        pass
+
+
+# ============================================
+# Reporting
+# ============================================
+
+def load_profiles(profile_path: str) -> List[Dict]:
+    if not os.path.exists(profile_path):
+        return []
+    with open(profile_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def rank_profiles(profiles: List[Dict], by: str = "cpu", top: int = 10,
+                  latest_only: bool = True) -> List[Dict]:
+    """
+    Rank statements by cost
+
+    Args:
+        profiles: Profile records
+        by: One of SORT_KEYS
+        top: Number of statements to return
+        latest_only: Keep only the most recent profile of each statement
+    """
+    field = SORT_KEYS[by]
+    if latest_only:
+        latest = {}
+        for profile in profiles:
+            latest[profile["sql"]] = profile
+        profiles = list(latest.values())
+    return sorted(profiles, key=lambda p: p.get(field) or 0, reverse=True)[:top]
+
+
+def print_report(profiles: List[Dict], by: str, show_plans: bool = False):
+    print(f"\n{'='*70}")
+    print(f"  Most Expensive Statements (by {by})")
+    print(f"{'='*70}")
+    print(f"  {'#':>2}  {'CPU s':>8} {'Wall s':>8} {'Rows in':>12} {'MiB in':>9} {'Peak MiB':>9}  Statement")
+    print("  " + "-"*68)
+    for rank, profile in enumerate(profiles, 1):
+        def num(field, scale=1.0):
+            value = profile.get(field)
+            return value / scale if value is not None else float("nan")
+
+        print(f"  {rank:>2}  {num('cpu_time_ms', 1000):8.2f} {num('wall_time_ms', 1000):8.2f} "
+              f"{num('input_rows'):12,.0f} {num('input_bytes', 2**20):9.1f} "
+              f"{num('peak_memory_bytes', 2**20):9.1f}  {profile['sql'][:60]}")
+        if profile.get("query_id"):
+            print(f"      query_id={profile['query_id']} source={profile.get('source')}")
+        if show_plans and profile.get("plan"):
+            for line in profile["plan"].splitlines():
+                print(f"      | {line}")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Trino query profile report")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    report = subparsers.add_parser("report", help="Rank recorded statements by cost")
+    report.add_argument("--profiles", default=os.path.join(
+        os.environ.get(METRICS_DIR_ENV, DEFAULT_METRICS_DIR), PROFILE_FILE))
+    report.add_argument("--by", choices=sorted(SORT_KEYS), default="cpu")
+    report.add_argument("--top", type=int, default=10)
+    report.add_argument("--all-runs", action="store_true",
+                        help="Rank every recorded run, not just the latest per statement")
+    report.add_argument("--plans", action="store_true", help="Print EXPLAIN plans")
+
+    args = parser.parse_args(argv)
+
+    profiles = load_profiles(args.profiles)
+    if not profiles:
+        print(f"✗ No profiles found in {args.profiles}")
+        return 1
+
+    ranked = rank_profiles(profiles, by=args.by, top=args.top, latest_only=not args.all_runs)
+    print_report(ranked, args.by, show_plans=args.plans)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -162,33 +162,31 @@ GROUP BY Pickup_Location
 ORDER BY total_trips DESC
 LIMIT 20;
 
--- Query 4.2: Top Pickup Locations with Zone Names (requires taxi_zones table)
+-- Query 4.2: Top Pickup Locations with Zone Names (zone columns are denormalized)
 SELECT 
     t.Pickup_Location,
-    z.Zone as zone_name,
-    z.Borough,
+    t.Pickup_Zone as zone_name,
+    t.Pickup_Borough as Borough,
     SUM(t.number) as total_trips,
     CAST(SUM(t.Total_Amount) AS DECIMAL(12,2)) as total_revenue,
     CAST(AVG(t.AVG_Trip_Distance) AS DECIMAL(8,2)) as avg_distance
 FROM nyc_taxi_aggregated t
-LEFT JOIN taxi_zones z ON t.Pickup_Location = z.LocationID
 WHERE t.Pickup_Time >= DATE_FORMAT(CURRENT_DATE - INTERVAL '30' DAY, '%Y-%m-%d %H')
-GROUP BY t.Pickup_Location, z.Zone, z.Borough
+GROUP BY t.Pickup_Location, t.Pickup_Zone, t.Pickup_Borough
 ORDER BY total_trips DESC
 LIMIT 20;
 
 -- Query 4.3: Borough Level Summary
 SELECT 
-    z.Borough,
+    t.Pickup_Borough as Borough,
     SUM(t.number) as total_trips,
     CAST(SUM(t.Total_Amount) AS DECIMAL(12,2)) as total_revenue,
     CAST(SUM(t.Total_Trip_Distance) AS DECIMAL(12,2)) as total_distance,
     CAST(AVG(t.AVG_Total_Amount) AS DECIMAL(8,2)) as avg_fare
 FROM nyc_taxi_aggregated t
-LEFT JOIN taxi_zones z ON t.Pickup_Location = z.LocationID
 WHERE t.Pickup_Time >= DATE_FORMAT(CURRENT_DATE - INTERVAL '30' DAY, '%Y-%m-%d %H')
-    AND z.Borough IS NOT NULL
-GROUP BY z.Borough
+    AND t.Pickup_Borough <> 'Unknown'
+GROUP BY t.Pickup_Borough
 ORDER BY total_trips DESC;
 
 
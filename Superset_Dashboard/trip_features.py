@@ -0,0 +1,200 @@
+"""
+Derived Trip Features Computed Once at Ingest
+Dashboard views used to re-derive the same per-trip values on every query:
+tip percentage as tip_amt / NULLIF(fare_amt, 0) * 100, hour of day through a
+DATE_FORMAT -> SUBSTR -> CAST string round-trip, and so on. This module
+computes them once, as vectorized Arrow kernels, and stores them as columns
+of the converted Parquet files (convert_to_parquet.py) and of the tables the
+loaders write, so queries read a narrow precomputed column instead
+
+    trip_duration_min   dropoff - pickup in minutes (NULL if not positive)
+    avg_speed_mph       trip_distance / duration in hours (NULL if no duration)
+    tip_pct             tip / fare * 100 (NULL when the fare is 0)
+    pickup_hour         0-23
+    pickup_hour_key     hours since 1970-01-01 (time_keys.py)
+    pickup_weekday      1 = Monday ... 7 = Sunday (Trino's day_of_week)
+    is_holiday          pickup date is a US federal holiday (or observed day)
+
+Usage:
+    from trip_features import add_feature_columns, add_trip_features
+    table = add_feature_columns(table)   # pyarrow.Table
+    df = add_trip_features(df)           # pandas.DataFrame
+
+Requirements: pip install pyarrow
+"""
+
+import datetime
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from time_keys import arrow_hour_key
+
+FEATURE_TYPES: Dict[str, pa.DataType] = {
+    "trip_duration_min": pa.float64(),
+    "avg_speed_mph": pa.float64(),
+    "tip_pct": pa.float64(),
+    "pickup_hour": pa.int8(),
+    "pickup_hour_key": pa.int32(),
+    "pickup_weekday": pa.int8(),
+    "is_holiday": pa.bool_(),
+}
+
+# Source column candidates (lower case) across the TLC schema eras
+PICKUP_COLUMNS = ["tpep_pickup_datetime", "lpep_pickup_datetime",
+                  "trip_pickup_datetime", "pickup_datetime"]
+DROPOFF_COLUMNS = ["tpep_dropoff_datetime", "lpep_dropoff_datetime",
+                   "trip_dropoff_datetime", "dropoff_datetime"]
+DISTANCE_COLUMNS = ["trip_distance", "trip_miles"]
+TIP_COLUMNS = ["tip_amount", "tip_amt", "tips"]
+FARE_COLUMNS = ["fare_amount", "fare_amt", "base_passenger_fare"]
+
+
+def _find_column(columns: List[str], candidates: List[str]) -> Optional[str]:
+    lower = {name.lower(): name for name in columns}
+    for candidate in candidates:
+        if candidate in lower:
+            return lower[candidate]
+    return None
+
+
+# ============================================
+# US Federal Holidays
+# ============================================
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> datetime.date:
+    """n-th (1-based) weekday (0 = Monday) of a month; n = -1 for the last"""
+    if n > 0:
+        first = datetime.date(year, month, 1)
+        return first + datetime.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: datetime.date) -> datetime.date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday"""
+    if day.weekday() == 5:
+        return day - datetime.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + datetime.timedelta(days=1)
+    return day
+
+
+def federal_holidays(year: int) -> List[datetime.date]:
+    """US federal holidays of a year, including observed weekdays"""
+    fixed = [datetime.date(year, 1, 1), datetime.date(year, 7, 4),
+             datetime.date(year, 11, 11), datetime.date(year, 12, 25)]
+    if year >= 2021:
+        fixed.append(datetime.date(year, 6, 19))  # Juneteenth
+
+    days = set(fixed) | {_observed(day) for day in fixed}
+    days |= {
+        _nth_weekday(year, 1, 0, 3),    # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),    # Presidents' Day
+        _nth_weekday(year, 5, 0, -1),   # Memorial Day
+        _nth_weekday(year, 9, 0, 1),    # Labor Day
+        _nth_weekday(year, 10, 0, 2),   # Columbus Day
+        _nth_weekday(year, 11, 3, 4),   # Thanksgiving
+    }
+    return sorted(days)
+
+
+# ============================================
+# Features
+# ============================================
+
+def _null(dtype: pa.DataType) -> pa.Scalar:
+    return pa.scalar(None, type=dtype)
+
+
+def _as_float(column) -> pa.ChunkedArray:
+    return pc.cast(column, pa.float64())
+
+
+def compute_features(table: pa.Table) -> Dict[str, pa.ChunkedArray]:
+    """
+    Feature arrays for a trip table; features whose source columns are
+    missing are omitted
+
+    Returns:
+        Feature name -> array aligned with the table's rows
+    """
+    columns = table.column_names
+    pickup_name = _find_column(columns, PICKUP_COLUMNS)
+    if pickup_name is None:
+        return {}
+    pickup = table[pickup_name]
+    features: Dict[str, pa.ChunkedArray] = {}
+
+    dropoff_name = _find_column(columns, DROPOFF_COLUMNS)
+    if dropoff_name is not None:
+        seconds = _as_float(pc.seconds_between(pickup, table[dropoff_name]))
+        positive = pc.greater(seconds, 0)
+        features["trip_duration_min"] = pc.if_else(positive, pc.divide(seconds, 60.0),
+                                                   _null(pa.float64()))
+
+        distance_name = _find_column(columns, DISTANCE_COLUMNS)
+        if distance_name is not None:
+            hours = pc.divide(seconds, 3600.0)
+            speed = pc.divide(_as_float(table[distance_name]), hours)
+            features["avg_speed_mph"] = pc.if_else(positive, speed, _null(pa.float64()))
+
+    tip_name = _find_column(columns, TIP_COLUMNS)
+    fare_name = _find_column(columns, FARE_COLUMNS)
+    if tip_name is not None and fare_name is not None:
+        fare = _as_float(table[fare_name])
+        tip_pct = pc.multiply(pc.divide(_as_float(table[tip_name]), fare), 100.0)
+        features["tip_pct"] = pc.if_else(pc.not_equal(fare, 0.0), tip_pct, _null(pa.float64()))
+
+    features["pickup_hour"] = pc.cast(pc.hour(pickup), pa.int8())
+    features["pickup_hour_key"] = arrow_hour_key(pickup)
+    features["pickup_weekday"] = pc.cast(
+        pc.day_of_week(pickup, count_from_zero=False, week_start=1), pa.int8())
+
+    years = pc.min_max(pc.year(pickup)).as_py()
+    holidays = []
+    if years["min"] is not None:
+        for year in range(years["min"], years["max"] + 1):
+            holidays.extend(federal_holidays(year))
+    pickup_date = pc.cast(pickup, pa.date32())
+    features["is_holiday"] = pc.if_else(
+        pc.is_null(pickup_date), _null(pa.bool_()),
+        pc.is_in(pickup_date, value_set=pa.array(holidays, type=pa.date32())))
+
+    return features
+
+
+def add_feature_columns(table: pa.Table) -> pa.Table:
+    """Append (or replace) the feature columns of an Arrow trip table"""
+    for name, values in compute_features(table).items():
+        values = pc.cast(values, FEATURE_TYPES[name])
+        if name in table.column_names:
+            table = table.set_column(table.column_names.index(name), name, values)
+        else:
+            table = table.append_column(name, values)
+    return table
+
+
+def add_trip_features(df):
+    """
+    pandas wrapper of compute_features(); pickup/dropoff columns must
+    already be datetimes
+
+    Returns:
+        New frame with the feature columns (nullable Int8 / Int32 / boolean dtypes)
+    """
+    import pandas as pd
+
+    sources = [_find_column(list(df.columns), candidates) for candidates in
+               (PICKUP_COLUMNS, DROPOFF_COLUMNS, DISTANCE_COLUMNS, TIP_COLUMNS, FARE_COLUMNS)]
+    sources = [name for name in sources if name is not None]
+    table = pa.Table.from_pandas(df[sources], preserve_index=False)
+
+    pandas_dtypes = {pa.int8(): "Int8", pa.int32(): "Int32", pa.bool_(): "boolean",
+                     pa.float64(): "float64"}
+    columns = {}
+    for name, values in compute_features(table).items():
+        series = pd.Series(values.to_pandas().to_numpy(), index=df.index)
+        columns[name] = series.astype(pandas_dtypes[FEATURE_TYPES[name]])
+    return df.assign(**columns)
@@ -0,0 +1,411 @@
+"""
+File-Level Metadata Catalog for NYC Taxi Trip Files
+Keeps one entry per raw or converted trip file (row count, min/max pickup
+timestamp, set of PULocationIDs, schema version, byte size) in a small local
+SQLite database, so aggregation and ad-hoc jobs can open only the files that
+can contain matching rows instead of every file matching a filename glob
+
+Entries are updated incrementally: a scan only re-reads files whose size or
+modification time changed since they were last catalogued.
+
+Usage:
+    python trip_file_catalog.py scan ~/nyc_taxi_data/raw
+    python trip_file_catalog.py query --taxi-type yellow \\
+        --start "2024-01-10" --end "2024-01-12" --locations 132 138
+    python trip_file_catalog.py list
+
+Configuration (environment):
+    NYC_TAXI_CATALOG   Path of the catalog database (default: ./trip_catalog.sqlite)
+
+Requirements: pip install pyarrow
+"""
+
+import argparse
+import datetime
+import glob
+import os
+import re
+import sqlite3
+import sys
+from typing import Dict, Iterable, List, Optional
+
+CATALOG_ENV = "NYC_TAXI_CATALOG"
+DEFAULT_CATALOG = "trip_catalog.sqlite"
+
+NUM_LOCATIONS = 265
+
+# Schema versions, detected from the (lower-cased) column names
+SCHEMA_SIGNATURES = [
+    # (schema_version, required columns)
+    ("yellow_2009", {"trip_pickup_datetime", "start_lon"}),
+    ("yellow_2010", {"pickup_datetime", "pickup_longitude"}),
+    ("yellow", {"tpep_pickup_datetime", "pulocationid"}),
+    ("yellow_coords", {"tpep_pickup_datetime", "pickup_longitude"}),
+    ("green", {"lpep_pickup_datetime", "pulocationid"}),
+    ("green_coords", {"lpep_pickup_datetime", "pickup_longitude"}),
+    ("fhvhv", {"hvfhs_license_num", "pickup_datetime"}),
+    ("fhv", {"dispatching_base_num", "pickup_datetime"}),
+]
+
+PICKUP_COLUMNS = ["tpep_pickup_datetime", "lpep_pickup_datetime",
+                  "trip_pickup_datetime", "pickup_datetime"]
+LOCATION_COLUMNS = ["pulocationid"]
+
+_FILE_NAME = re.compile(r"(?P<taxi_type>[a-z]+)_tripdata_(?P<year>\d{4})-(?P<month>\d{2})")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trip_files (
+    path            TEXT PRIMARY KEY,
+    file_format     TEXT NOT NULL,
+    taxi_type       TEXT,
+    schema_version  TEXT,
+    file_month      TEXT,
+    byte_size       INTEGER NOT NULL,
+    mtime           REAL NOT NULL,
+    row_count       INTEGER,
+    min_pickup      TEXT,
+    max_pickup      TEXT,
+    min_location    INTEGER,
+    max_location    INTEGER,
+    location_bitmap BLOB,
+    catalogued_at   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trip_files_time ON trip_files (taxi_type, min_pickup, max_pickup);
+"""
+
+
+def print_success(text):
+    print(f"✓ {text}")
+
+
+def print_error(text):
+    print(f"✗ {text}")
+
+
+def print_info(text):
+    print(f"ℹ {text}")
+
+
+def detect_schema_version(columns: Iterable[str]) -> Optional[str]:
+    """Identify the TLC schema era of a file from its column names"""
+    lower = {name.lower() for name in columns}
+    for version, required in SCHEMA_SIGNATURES:
+        if required <= lower:
+            return version
+    return None
+
+
+def _find_column(columns: Iterable[str], candidates: List[str]) -> Optional[str]:
+    lower = {name.lower(): name for name in columns}
+    for candidate in candidates:
+        if candidate in lower:
+            return lower[candidate]
+    return None
+
+
+# ============================================
+# Location Sets
+# ============================================
+
+def locations_to_bitmap(locations: Iterable[int]) -> bytes:
+    """Encode a set of LocationIDs (1..265) as a fixed-size bitmap"""
+    bits = 0
+    for loc in locations:
+        if loc is not None and 0 <= loc <= NUM_LOCATIONS:
+            bits |= 1 << int(loc)
+    return bits.to_bytes((NUM_LOCATIONS + 8) // 8, "little")
+
+
+def bitmap_to_int(bitmap: Optional[bytes]) -> Optional[int]:
+    return int.from_bytes(bitmap, "little") if bitmap is not None else None
+
+
+def bitmap_to_locations(bitmap: Optional[bytes]) -> List[int]:
+    bits = bitmap_to_int(bitmap)
+    if bits is None:
+        return []
+    return [loc for loc in range(NUM_LOCATIONS + 1) if bits >> loc & 1]
+
+
+# ============================================
+# File Statistics
+# ============================================
+
+def _timestamp_to_str(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)[:19]
+
+
+def parquet_file_stats(path: str) -> Dict:
+    """
+    Statistics for a Parquet file
+
+    Row count and pickup range come from the footer (no data read); the
+    location set needs only the PULocationID column.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    columns = pf.schema_arrow.names
+    stats = {"row_count": pf.metadata.num_rows,
+             "schema_version": detect_schema_version(columns)}
+
+    pickup = _find_column(columns, PICKUP_COLUMNS)
+    if pickup is not None:
+        index = columns.index(pickup)
+        mins, maxs = [], []
+        for rg in range(pf.metadata.num_row_groups):
+            col_stats = pf.metadata.row_group(rg).column(index).statistics
+            if col_stats is None or not col_stats.has_min_max:
+                mins = maxs = None
+                break
+            mins.append(col_stats.min)
+            maxs.append(col_stats.max)
+        if mins is None:
+            # No footer statistics: fall back to reading the column
+            column = pf.read(columns=[pickup]).column(0)
+            minmax = pc.min_max(column).as_py()
+            mins, maxs = [minmax["min"]], [minmax["max"]]
+        mins = [m for m in mins if m is not None]
+        maxs = [m for m in maxs if m is not None]
+        stats["min_pickup"] = _timestamp_to_str(min(mins)) if mins else None
+        stats["max_pickup"] = _timestamp_to_str(max(maxs)) if maxs else None
+
+    location = _find_column(columns, LOCATION_COLUMNS)
+    if location is not None:
+        unique = pc.unique(pf.read(columns=[location]).column(0).combine_chunks()).to_pylist()
+        unique = [loc for loc in unique if loc is not None]
+        stats["location_bitmap"] = locations_to_bitmap(unique)
+        stats["min_location"] = min(unique) if unique else None
+        stats["max_location"] = max(unique) if unique else None
+
+    return stats
+
+
+def csv_file_stats(path: str) -> Dict:
+    """Statistics for a CSV file (reads only the pickup and location columns)"""
+    import pyarrow.compute as pc
+    import pyarrow.csv as pv
+
+    with open(path, newline="") as f:
+        columns = [name.strip() for name in f.readline().rstrip("\r\n").split(",")]
+
+    pickup = _find_column(columns, PICKUP_COLUMNS)
+    location = _find_column(columns, LOCATION_COLUMNS)
+    include = [c for c in (pickup, location) if c is not None] or columns[:1]
+
+    table = pv.read_csv(path, convert_options=pv.ConvertOptions(
+        include_columns=include, strings_can_be_null=True))
+    stats = {"row_count": table.num_rows, "schema_version": detect_schema_version(columns)}
+
+    if pickup is not None:
+        minmax = pc.min_max(table[pickup]).as_py()
+        stats["min_pickup"] = _timestamp_to_str(minmax["min"])
+        stats["max_pickup"] = _timestamp_to_str(minmax["max"])
+
+    if location is not None:
+        unique = [loc for loc in pc.unique(table[location].combine_chunks()).to_pylist()
+                  if loc is not None]
+        stats["location_bitmap"] = locations_to_bitmap(unique)
+        stats["min_location"] = min(unique) if unique else None
+        stats["max_location"] = max(unique) if unique else None
+
+    return stats
+
+
+# ============================================
+# Catalog
+# ============================================
+
+class TripFileCatalog:
+    """SQLite-backed catalog of trip files and their statistics"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.environ.get(CATALOG_ENV, DEFAULT_CATALOG)
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def needs_update(self, path: str) -> bool:
+        row = self.conn.execute("SELECT byte_size, mtime FROM trip_files WHERE path = ?",
+                                (path,)).fetchone()
+        if row is None:
+            return True
+        return row["byte_size"] != os.path.getsize(path) or row["mtime"] != os.path.getmtime(path)
+
+    def add_file(self, path: str, force: bool = False) -> bool:
+        """
+        Catalogue one file if it is new or changed
+
+        Returns:
+            True if the entry was (re)computed
+        """
+        path = os.path.abspath(path)
+        if not force and not self.needs_update(path):
+            return False
+
+        file_format = "parquet" if path.endswith(".parquet") else "csv"
+        stats = parquet_file_stats(path) if file_format == "parquet" else csv_file_stats(path)
+
+        match = _FILE_NAME.search(os.path.basename(path))
+        self.conn.execute("""
+            INSERT OR REPLACE INTO trip_files
+                (path, file_format, taxi_type, schema_version, file_month, byte_size, mtime,
+                 row_count, min_pickup, max_pickup, min_location, max_location,
+                 location_bitmap, catalogued_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            path,
+            file_format,
+            match.group("taxi_type") if match else None,
+            stats.get("schema_version"),
+            f"{match.group('year')}-{match.group('month')}" if match else None,
+            os.path.getsize(path),
+            os.path.getmtime(path),
+            stats.get("row_count"),
+            stats.get("min_pickup"),
+            stats.get("max_pickup"),
+            stats.get("min_location"),
+            stats.get("max_location"),
+            stats.get("location_bitmap"),
+            datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        ))
+        self.conn.commit()
+        return True
+
+    def scan(self, paths: Iterable[str], force: bool = False) -> Dict[str, int]:
+        """
+        Catalogue trip files under the given files/directories and drop
+        entries for files that no longer exist
+
+        Returns:
+            Counts of updated, unchanged, failed and removed files
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files += glob.glob(os.path.join(path, "*_tripdata_*.parquet"))
+                files += glob.glob(os.path.join(path, "*_tripdata_*.csv"))
+            else:
+                files.append(path)
+
+        counts = {"updated": 0, "unchanged": 0, "failed": 0, "removed": 0}
+        for path in sorted(files):
+            try:
+                counts["updated" if self.add_file(path, force) else "unchanged"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                print_error(f"Could not catalogue {path}: {e}")
+
+        for row in self.conn.execute("SELECT path FROM trip_files").fetchall():
+            if not os.path.exists(row["path"]):
+                self.conn.execute("DELETE FROM trip_files WHERE path = ?", (row["path"],))
+                counts["removed"] += 1
+        self.conn.commit()
+        return counts
+
+    def entries(self) -> List[Dict]:
+        return [dict(row) for row in
+                self.conn.execute("SELECT * FROM trip_files ORDER BY taxi_type, min_pickup")]
+
+    def select_files(self,
+                     taxi_type: Optional[str] = None,
+                     start: Optional[str] = None,
+                     end: Optional[str] = None,
+                     locations: Optional[Iterable[int]] = None,
+                     prefer_parquet: bool = True) -> List[str]:
+        """
+        Files that can contain rows matching the predicate
+
+        Args:
+            taxi_type: 'yellow', 'green', 'fhv', ... (None = any)
+            start: Inclusive lower bound on pickup time ('YYYY-MM-DD[ HH:MM:SS]')
+            end: Exclusive upper bound on pickup time
+            locations: PULocationIDs of interest (None = any)
+            prefer_parquet: Skip a CSV when its converted Parquet is also catalogued
+
+        Files without the relevant statistics are always included.
+        """
+        sql = "SELECT path, location_bitmap FROM trip_files WHERE 1 = 1"
+        params = []
+        if taxi_type:
+            sql += " AND taxi_type = ?"
+            params.append(taxi_type)
+        if start:
+            sql += " AND (max_pickup IS NULL OR max_pickup >= ?)"
+            params.append(start)
+        if end:
+            sql += " AND (min_pickup IS NULL OR min_pickup < ?)"
+            params.append(end)
+
+        wanted = bitmap_to_int(locations_to_bitmap(locations)) if locations else None
+        paths = []
+        for row in self.conn.execute(sql + " ORDER BY min_pickup", params):
+            bits = bitmap_to_int(row["location_bitmap"])
+            if wanted is not None and bits is not None and not bits & wanted:
+                continue
+            paths.append(row["path"])
+
+        if prefer_parquet:
+            converted = {os.path.splitext(p)[0] for p in paths if p.endswith(".parquet")}
+            paths = [p for p in paths
+                     if p.endswith(".parquet") or os.path.splitext(p)[0] not in converted]
+        return paths
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="NYC taxi trip file catalog")
+    parser.add_argument("--catalog", default=os.environ.get(CATALOG_ENV, DEFAULT_CATALOG))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan = subparsers.add_parser("scan", help="Catalogue new or changed files")
+    scan.add_argument("paths", nargs="+")
+    scan.add_argument("--force", action="store_true")
+
+    query = subparsers.add_parser("query", help="List files that can match a predicate")
+    query.add_argument("--taxi-type")
+    query.add_argument("--start")
+    query.add_argument("--end")
+    query.add_argument("--locations", nargs="+", type=int)
+
+    subparsers.add_parser("list", help="Show all catalogue entries")
+
+    args = parser.parse_args(argv)
+
+    with TripFileCatalog(args.catalog) as catalog:
+        if args.command == "scan":
+            counts = catalog.scan(args.paths, force=args.force)
+            print_success(f"Catalog updated: {counts['updated']} updated, {counts['unchanged']} unchanged, "
+                          f"{counts['removed']} removed, {counts['failed']} failed")
+            return 1 if counts["failed"] else 0
+
+        if args.command == "query":
+            for path in catalog.select_files(args.taxi_type, args.start, args.end, args.locations):
+                print(path)
+            return 0
+
+        for entry in catalog.entries():
+            print(f"{os.path.basename(entry['path']):40s} {entry['schema_version'] or '?':14s} "
+                  f"{entry['row_count'] or 0:>12,} rows  {entry['min_pickup']} .. {entry['max_pickup']}  "
+                  f"{entry['byte_size'] / 2**20:8.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
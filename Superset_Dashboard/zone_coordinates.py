@@ -0,0 +1,113 @@
+"""
+Taxi Zone Coordinates
+Builds taxi_zones_with_coords.csv (LocationID, Borough, Zone, service_zone,
+latitude, longitude) for the zone dimension and map charts. This was the
+process_zones.py heredoc of quick_start_data_pipeline.sh (STEP 5) and the
+Nominatim lookup of Scripts/GeoCodingTaxi.py:
+
+    shapefile  centroids of taxi_zones.shp (needs geopandas; falls back to
+               the NYC center when it is not installed)
+    geocode    Nominatim geocoding of "<Zone> <Borough> USA" (needs geopy;
+               one request per zone, slow and rate-limited)
+
+pandas, geopandas and geopy are imported only by the method that uses them.
+
+Usage:
+    python zone_coordinates.py --zones-dir ~/nyc_taxi_data/zones
+    python zone_coordinates.py --zones-dir ~/nyc_taxi_data/zones --method geocode
+
+Requirements: pip install pandas (geopandas / geopy per method)
+"""
+
+import argparse
+import os
+import sys
+from typing import Optional
+
+from pipeline_metrics import report_rows
+
+LOOKUP_CSV = "taxi+_zone_lookup.csv"
+SHAPEFILE = "taxi_zones.shp"
+OUTPUT_CSV = "taxi_zones_with_coords.csv"
+OUTPUT_COLUMNS = ['LocationID', 'Borough', 'Zone', 'service_zone', 'latitude', 'longitude']
+
+# NYC approximate center, used when no coordinates can be computed
+NYC_CENTER = (40.7128, -74.0060)
+GEOCODER_USER_AGENT = "nyc_taxi_pipeline"
+
+
+def shapefile_zones(zones_dir: str):
+    """Zone lookup with shapefile centroids (NYC center without geopandas)"""
+    import pandas as pd
+
+    zones_csv = pd.read_csv(os.path.join(zones_dir, LOOKUP_CSV))
+    try:
+        import geopandas as gpd
+    except ImportError:
+        print("geopandas not found, using simple centroid calculation")
+        print("Note: Install geopandas for accurate coordinates: pip install geopandas")
+        zones_csv['latitude'], zones_csv['longitude'] = NYC_CENTER
+        return zones_csv[OUTPUT_COLUMNS]
+
+    zones_shp = gpd.read_file(os.path.join(zones_dir, SHAPEFILE))
+    zones_shp['longitude'] = zones_shp.geometry.centroid.x
+    zones_shp['latitude'] = zones_shp.geometry.centroid.y
+    zones_merged = zones_shp.merge(zones_csv, on='LocationID', how='left')
+    return zones_merged[OUTPUT_COLUMNS]
+
+
+def geocoded_zones(zones_dir: str, user_agent: str = GEOCODER_USER_AGENT, timeout: int = 1000):
+    """Zone lookup with Nominatim coordinates (0, 0 for zones it cannot find)"""
+    import pandas as pd
+    from geopy.geocoders import Nominatim
+
+    zones = pd.read_csv(os.path.join(zones_dir, LOOKUP_CSV))
+    geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+    latitudes, longitudes = [], []
+    for zone, borough in zip(zones['Zone'].astype(str), zones['Borough'].astype(str)):
+        location = geolocator.geocode(f"{zone} {borough} USA")
+        print(zone, borough, location)
+        latitudes.append(location.latitude if location else 0.0)
+        longitudes.append(location.longitude if location else 0.0)
+    zones['latitude'] = latitudes
+    zones['longitude'] = longitudes
+    return zones[OUTPUT_COLUMNS]
+
+
+def write_zone_coordinates(zones_dir: str, method: str = "shapefile") -> str:
+    """
+    Write taxi_zones_with_coords.csv into zones_dir
+
+    Raises:
+        ValueError: If the method is unknown
+    """
+    if method == "shapefile":
+        zones = shapefile_zones(zones_dir)
+    elif method == "geocode":
+        zones = geocoded_zones(zones_dir)
+    else:
+        raise ValueError(f"Unknown method {method!r}; expected 'shapefile' or 'geocode'")
+
+    output_path = os.path.join(zones_dir, OUTPUT_CSV)
+    zones.to_csv(output_path, index=False)
+    report_rows(rows_out=len(zones))
+    print(f"Created taxi_zones table with {len(zones)} zones")
+    return output_path
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build taxi_zones_with_coords.csv")
+    parser.add_argument("--zones-dir", default=".", help=f"Directory with {LOOKUP_CSV} (and {SHAPEFILE})")
+    parser.add_argument("--method", choices=["shapefile", "geocode"], default="shapefile")
+    args = parser.parse_args(argv)
+
+    zones_dir = os.path.expanduser(args.zones_dir)
+    if not os.path.exists(os.path.join(zones_dir, LOOKUP_CSV)):
+        print(f"✗ {LOOKUP_CSV} not found in {zones_dir}")
+        return 1
+    write_zone_coordinates(zones_dir, args.method)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())